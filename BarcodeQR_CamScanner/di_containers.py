@@ -1,9 +1,71 @@
 from dependency_injector import containers, providers
 
-from .networking import api_wrappers, codes_consolidation
-from .scanning import image_loggers
+from .networking import api_wrappers, codes_consolidation, outbox, pack_tracing
+from .scanning import (code_reading, code_tracking, decode_pool, decoders, frame_gating,
+                       frame_lookback, frame_sources, image_loggers, stage_metrics)
 from .scanning.pack_recognition import recognizers
 
+_CONFIG_DEFAULTS = {
+    # значения настроек, которых может не быть в ранее созданных config.yaml;
+    # с ними программа работает как до появления этих настроек
+    'scanning': {
+        'capturing': {
+            'using': 'Direct',
+            'Threaded': {'drop_policy': 'latest', 'buffer_size': 4, 'stale_after_sec': 0.5, 'stats_interval_sec': 0},
+            'SharedMemory': {
+                'ring_name': 'camscanner_frames', 'slots': 8, 'width': 1920, 'height': 1080,
+                'stale_after_sec': 0.5, 'stats_interval_sec': 0,
+            },
+        },
+        'recognizing': {
+            'Background': {'snapshot': {'path': None, 'interval_sec': 300}},
+            'Neuronet': {'num_threads': 1, 'min_interval_sec': 0.6, 'stats_interval_sec': 0},
+            'Sensor': {'snmp_timeout_sec': 1, 'snmp_retries': 2},
+        },
+        'decoding': {
+            'backend': {'using': 'Pyzbar', 'OpenCV': {'aruco': False, 'barcodes': True}},
+            'workers': 1,
+            'max_pending': 8,
+            'localization': {'enabled': False, 'padding': 0.15},
+            'cascade': {
+                'variants': ['fixed'], 'expected_count': 1, 'adaptive_block_size': 31, 'upscale': 2.0,
+                'stats_interval_sec': 0,
+            },
+            'gating': {'threshold': 0.0, 'thumbnail_width': 64, 'stats_interval_sec': 0},
+            'tracking': {'enabled': False, 'thumbnail_width': 160, 'min_response': 0.1, 'margin': 0.1},
+        },
+        'lookback': {'frames': 0},
+        'metrics': {'interval_sec': 0},
+        'images_logging': {
+            'SaveImages': {
+                'encoding': 'png', 'png_compression': 3, 'jpeg_quality': 90, 'queue_size': 4,
+                'stats_interval_sec': 0,
+            },
+            'SaveCompressedImages': {
+                'encoding': 'jpg', 'png_compression': 3, 'jpeg_quality': 90, 'queue_size': 4,
+                'stats_interval_sec': 0, 'pack_budget_mb': 8, 'memory_budget_mb': 64, 'disk_quota_mb': 0,
+            },
+            'SaveSegments': {
+                'buff_size': 100, 'sizer': 1.0, 'queue_size': 2, 'stats_interval_sec': 0,
+                'format': 'raw', 'fps': 25, 'fourcc': 'MJPG', 'memory_budget_mb': 256,
+            },
+        },
+    },
+    'networking': {
+        'metrics': {'port': None},
+        'tracing': {'window': 500, 'log_interval_sec': 0},
+        'http': {'pool_size': 8, 'keepalive_sec': 30, 'max_in_flight': 1, 'ordered_codepairs': True},
+        'snmp': {'timeout_sec': 1, 'retries': 2},
+        'outbox': {
+            'using': 'No',
+            'SQLite': {
+                'batch_size': 50, 'backoff_base_sec': 1, 'backoff_max_sec': 60, 'max_attempts': 100,
+                'stats_interval_sec': 0,
+            },
+        },
+    },
+}
+
 
 class ScanningContainer(containers.DeclarativeContainer):
     config = providers.Configuration()
@@ -15,18 +77,25 @@ class ScanningContainer(containers.DeclarativeContainer):
         threshold_score=config.recognizing.Background.threshold_score,
         size_multiplier=config.recognizing.Background.sizer,
         region=config.recognizing.Background.region,
+        snapshot_path=config.recognizing.Background.snapshot.path,
+        snapshot_interval_sec=config.recognizing.Background.snapshot.interval_sec,
     )
 
     _NeuronetPackRecognizer = providers.Factory(
         recognizers.NeuronetPackRecognizer,
         model_path=config.recognizing.Neuronet.model_path,
         threshold_score=config.recognizing.Neuronet.threshold_score,
+        num_threads=config.recognizing.Neuronet.num_threads,
+        min_interval_sec=config.recognizing.Neuronet.min_interval_sec,
+        stats_interval_sec=config.recognizing.Neuronet.stats_interval_sec,
     )
 
     _SensorPackRecognizer = providers.Factory(
         recognizers.SensorPackRecognizer,
         sensor_ip=config.recognizing.Sensor.sensor_ip,
         sensor_key=config.recognizing.Sensor.sensor_const,
+        timeout_sec=config.recognizing.Sensor.snmp_timeout_sec,
+        retries=config.recognizing.Sensor.snmp_retries,
     )
 
     PackRecognizer = providers.Selector(
@@ -42,12 +111,131 @@ class ScanningContainer(containers.DeclarativeContainer):
         path=config.images_logging.SaveImages.path,
         buff_size=config.images_logging.SaveImages.buff_size,
         sizer=config.images_logging.SaveImages.sizer,
+        encoding=config.images_logging.SaveImages.encoding,
+        png_compression=config.images_logging.SaveImages.png_compression,
+        jpeg_quality=config.images_logging.SaveImages.jpeg_quality,
+        queue_size=config.images_logging.SaveImages.queue_size,
+        stats_interval_sec=config.images_logging.SaveImages.stats_interval_sec,
+    )
+
+    _ImagesCompressedSaver = providers.Factory(
+        image_loggers.ImagesCompressedSaver,
+        path=config.images_logging.SaveCompressedImages.path,
+        buff_size=config.images_logging.SaveCompressedImages.buff_size,
+        sizer=config.images_logging.SaveCompressedImages.sizer,
+        encoding=config.images_logging.SaveCompressedImages.encoding,
+        png_compression=config.images_logging.SaveCompressedImages.png_compression,
+        jpeg_quality=config.images_logging.SaveCompressedImages.jpeg_quality,
+        queue_size=config.images_logging.SaveCompressedImages.queue_size,
+        stats_interval_sec=config.images_logging.SaveCompressedImages.stats_interval_sec,
+        pack_budget_mb=config.images_logging.SaveCompressedImages.pack_budget_mb,
+        memory_budget_mb=config.images_logging.SaveCompressedImages.memory_budget_mb,
+        disk_quota_mb=config.images_logging.SaveCompressedImages.disk_quota_mb,
+    )
+
+    _SegmentImagesSaver = providers.Factory(
+        image_loggers.SegmentImagesSaver,
+        path=config.images_logging.SaveSegments.path,
+        buff_size=config.images_logging.SaveSegments.buff_size,
+        sizer=config.images_logging.SaveSegments.sizer,
+        queue_size=config.images_logging.SaveSegments.queue_size,
+        stats_interval_sec=config.images_logging.SaveSegments.stats_interval_sec,
+        segment_format=config.images_logging.SaveSegments.format,
+        fps=config.images_logging.SaveSegments.fps,
+        fourcc=config.images_logging.SaveSegments.fourcc,
+        memory_budget_mb=config.images_logging.SaveSegments.memory_budget_mb,
     )
 
     ImagesSaver = providers.Selector(
         config.images_logging.using,
         No=_FakeImagesSaver,
         SaveImages=_ImagesBufferedSaver,
+        SaveCompressedImages=_ImagesCompressedSaver,
+        SaveSegments=_SegmentImagesSaver,
+    )
+
+    _DirectFrameSource = providers.Factory(frame_sources.DirectFrameSource)
+    _ThreadedFrameSource = providers.Factory(
+        frame_sources.ThreadedFrameSource,
+        drop_policy=config.capturing.Threaded.drop_policy,
+        buffer_size=config.capturing.Threaded.buffer_size,
+        stale_after_sec=config.capturing.Threaded.stale_after_sec,
+        stats_interval_sec=config.capturing.Threaded.stats_interval_sec,
+    )
+
+    _SharedMemoryFrameSource = providers.Factory(
+        frame_sources.SharedMemoryFrameSource,
+        ring_name=config.capturing.SharedMemory.ring_name,
+        slots=config.capturing.SharedMemory.slots,
+        width=config.capturing.SharedMemory.width,
+        height=config.capturing.SharedMemory.height,
+        stale_after_sec=config.capturing.SharedMemory.stale_after_sec,
+        stats_interval_sec=config.capturing.SharedMemory.stats_interval_sec,
+    )
+
+    FrameSource = providers.Selector(
+        config.capturing.using,
+        Direct=_DirectFrameSource,
+        Threaded=_ThreadedFrameSource,
+        SharedMemory=_SharedMemoryFrameSource,
+    )
+    capturing_mode = config.capturing.using
+
+    _PyzbarDecoder = providers.Factory(decoders.PyzbarDecoder)
+    _OpenCVDecoder = providers.Factory(
+        decoders.OpenCVDecoder,
+        aruco=config.decoding.backend.OpenCV.aruco,
+        barcodes=config.decoding.backend.OpenCV.barcodes,
+    )
+
+    CodesDecoder = providers.Selector(
+        config.decoding.backend.using,
+        Pyzbar=_PyzbarDecoder,
+        OpenCV=_OpenCVDecoder,
+    )
+
+    _DecodeCascade = providers.Factory(
+        code_reading.DecodeCascade,
+        variants=config.decoding.cascade.variants,
+        expected_count=config.decoding.cascade.expected_count,
+        adaptive_block_size=config.decoding.cascade.adaptive_block_size,
+        upscale=config.decoding.cascade.upscale,
+        stats_interval_sec=config.decoding.cascade.stats_interval_sec,
+        decoder=CodesDecoder,
+    )
+
+    DecodePool = providers.Factory(
+        decode_pool.CodesDecodePool,
+        workers=config.decoding.workers,
+        max_pending=config.decoding.max_pending,
+        localize=config.decoding.localization.enabled,
+        padding=config.decoding.localization.padding,
+        cascade=_DecodeCascade,
+    )
+
+    FrameGate = providers.Factory(
+        frame_gating.FrameChangeGate,
+        threshold=config.decoding.gating.threshold,
+        thumbnail_width=config.decoding.gating.thumbnail_width,
+        stats_interval_sec=config.decoding.gating.stats_interval_sec,
+    )
+
+    CodeTracker = providers.Factory(
+        code_tracking.CodeTracker,
+        enabled=config.decoding.tracking.enabled,
+        thumbnail_width=config.decoding.tracking.thumbnail_width,
+        min_response=config.decoding.tracking.min_response,
+        margin=config.decoding.tracking.margin,
+    )
+
+    FrameLookback = providers.Factory(
+        frame_lookback.FrameLookback,
+        size=config.lookback.frames,
+    )
+
+    StageMetrics = providers.Factory(
+        stage_metrics.StageMetrics,
+        interval_sec=config.metrics.interval_sec,
     )
 
     video_path = config.video_path
@@ -58,9 +246,30 @@ class ScanningContainer(containers.DeclarativeContainer):
 class NetworkingContainer(containers.DeclarativeContainer):
     config = providers.Configuration()
 
+    _SqliteCodesOutbox = providers.Factory(
+        outbox.SqliteCodesOutbox,
+        path=config.outbox.SQLite.path,
+        batch_size=config.outbox.SQLite.batch_size,
+        backoff_base_sec=config.outbox.SQLite.backoff_base_sec,
+        backoff_max_sec=config.outbox.SQLite.backoff_max_sec,
+        max_attempts=config.outbox.SQLite.max_attempts,
+        stats_interval_sec=config.outbox.SQLite.stats_interval_sec,
+    )
+
+    CodesOutbox = providers.Selector(
+        config.outbox.using,
+        No=providers.Object(None),
+        SQLite=_SqliteCodesOutbox,
+    )
+
     _ApiV1SendCodesAnyway = providers.Factory(
         api_wrappers.ApiV1SendCodesAnyway,
         domain_url=config.commutication.OnlySendCodes.domain,
+        pool_size=config.http.pool_size,
+        keepalive_sec=config.http.keepalive_sec,
+        max_in_flight=config.http.max_in_flight,
+        ordered_codepairs=config.http.ordered_codepairs,
+        outbox=CodesOutbox,
     )
 
     _ApiV1WithShutterDrop = providers.Factory(
@@ -70,6 +279,13 @@ class NetworkingContainer(containers.DeclarativeContainer):
         shutter_key=config.commutication.DropAndSendCodes.shutter_const,
         shutter_before_time_sec=config.commutication.DropAndSendCodes.shutter_wait_before_sec,
         shutter_open_time_sec=config.commutication.DropAndSendCodes.shutter_wait_open_sec,
+        snmp_timeout_sec=config.snmp.timeout_sec,
+        snmp_retries=config.snmp.retries,
+        pool_size=config.http.pool_size,
+        keepalive_sec=config.http.keepalive_sec,
+        max_in_flight=config.http.max_in_flight,
+        ordered_codepairs=config.http.ordered_codepairs,
+        outbox=CodesOutbox,
     )
 
     _ApiV1WithShutterDropAndCodesSending = providers.Factory(
@@ -79,6 +295,13 @@ class NetworkingContainer(containers.DeclarativeContainer):
         shutter_key=config.commutication.DropOnly.shutter_const,
         shutter_before_time_sec=config.commutication.DropAndSendCodes.shutter_wait_before_sec,
         shutter_open_time_sec=config.commutication.DropAndSendCodes.shutter_wait_open_sec,
+        snmp_timeout_sec=config.snmp.timeout_sec,
+        snmp_retries=config.snmp.retries,
+        pool_size=config.http.pool_size,
+        keepalive_sec=config.http.keepalive_sec,
+        max_in_flight=config.http.max_in_flight,
+        ordered_codepairs=config.http.ordered_codepairs,
+        outbox=CodesOutbox,
     )
 
     NetworkApi = providers.Selector(
@@ -95,12 +318,19 @@ class NetworkingContainer(containers.DeclarativeContainer):
         FillPlaceholders=_ResultValidator,
     )
 
+    PackLatencyStats = providers.Factory(
+        pack_tracing.PackLatencyStats,
+        window=config.tracing.window,
+        log_interval_sec=config.tracing.log_interval_sec,
+    )
+
     log_path = config.log_path
     log_level = config.log_level
+    metrics_port = config.metrics.port
 
 
 class ApplicationContainer(containers.DeclarativeContainer):
-    config = providers.Configuration()
+    config = providers.Configuration(default=_CONFIG_DEFAULTS)
 
     networking = providers.Container(
         NetworkingContainer,
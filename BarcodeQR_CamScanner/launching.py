@@ -0,0 +1,46 @@
+"""
+Подготовка к запуску процессов-камер: способ запуска процессов и логгирование.
+"""
+import multiprocessing as mp
+from multiprocessing import forkserver
+from typing import Sequence
+
+from loguru import logger
+
+from .di_containers import ApplicationContainer
+
+__all__ = ['WARM_START_MODULES', 'setup_start_method', 'setup_logging']
+
+WARM_START_MODULES = (
+    'numpy',
+    'cv2',
+    'BarcodeQR_CamScanner.di_containers',
+    'BarcodeQR_CamScanner.scanning.workers',
+)
+"""Модули, заранее импортируемые сервером ``forkserver`` для быстрого запуска процессов-камер"""
+
+
+def setup_start_method(start_method: str = 'fork', *, preload: Sequence[str] = ()) -> None:
+    """
+    Устанавливает способ запуска дочерних процессов (до создания очередей и процессов).
+
+    При ``forkserver`` сразу запускается сервер, который один раз импортирует
+    ``WARM_START_MODULES`` и ``preload`` и создаёт процессы-камеры копированием себя.
+    Процессы (в том числе перезапущенные) не импортируют модули заново и не наследуют
+    состояние главного процесса (потоки, ``eventloop``, соединения).
+    """
+    mp.set_start_method(start_method, force=True)
+    if start_method == 'forkserver':
+        mp.set_forkserver_preload([*WARM_START_MODULES, *preload])
+        forkserver.ensure_running()
+        logger.info(f"Процессы запускаются через forkserver, предзагружены: {[*WARM_START_MODULES, *preload]}")
+
+
+def setup_logging(container: ApplicationContainer) -> None:
+    """
+    Добавляет запись логов в файл согласно конфигурации.
+    Процессы, запущенные не через ``fork``, должны вызывать её сами.
+    """
+    log_path = container.networking.log_path()
+    log_level = container.networking.log_level()
+    logger.add(sink=log_path, level=log_level, rotation='2 MB', compression='zip')
@@ -1,16 +1,48 @@
 """
 Модели для обмена данными между компонентами программы
 """
+import time
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
 
 __all__ = [
-    'CameraProcessEvent', 'CameraPackResult', 'EndScanning', 'PackGoodCodes',
-    'PackBadCodes', 'ValidatedPack',
+    'CameraProcessEvent', 'CameraPackResult', 'CameraStageMetrics', 'EndScanning',
+    'PackGoodCodes', 'PackBadCodes', 'PackTrace', 'ValidatedPack',
 ]
 
 
+@dataclass
+class PackTrace:
+    """
+    Моменты прохождения пачкой этапов обработки (``time.monotonic()``).
+
+    ``time.monotonic()`` общий для всех процессов на машине, поэтому моменты,
+    отмеченные в процессе-камере и в главном процессе, можно сравнивать.
+
+    Этапы по порядку:
+        - ``left_frame`` - пачка ушла из кадра
+        - ``decoded`` - коды пачки дочитаны, событие отдано процессом-камерой
+        - ``queued`` - событие положено в мультипроцессную очередь
+        - ``dequeued`` - событие получено главным процессом
+        - ``validated`` - пачка провалидирована
+        - ``committed`` - коды пачки записаны в локальную очередь на отправку (если она используется)
+        - ``sent`` - коды пачки отправлены на сервер
+        - ``drop_requested`` - запрошен сброс пачки заслонкой
+    """
+    marks: dict[str, float] = field(default_factory=dict)
+
+    def mark(self, hop: str) -> None:
+        """Отмечает прохождение этапа ``hop``"""
+        self.marks[hop] = time.monotonic()
+
+    def elapsed(self, from_hop: str, to_hop: str) -> Optional[float]:
+        """Время между этапами в секундах, либо ``None``, если какой-то из них не отмечен"""
+        if from_hop not in self.marks or to_hop not in self.marks:
+            return None
+        return self.marks[to_hop] - self.marks[from_hop]
+
+
 @dataclass
 class CameraProcessEvent:
     """События, создаваемые при обработке видео"""
@@ -39,6 +71,7 @@ class CameraPackResult(CameraProcessEvent):
     codepairs: list[dict[str, str]] = field(default_factory=list)
     expected_codes_count: int = 2
     workmode: str = 'auto'
+    trace: PackTrace = field(default_factory=PackTrace)
 
     def __repr__(self) -> str:
         if self.start_time is not None:
@@ -53,11 +86,28 @@ class CameraPackResult(CameraProcessEvent):
         return f"<{self.__class__.__name__} {time_interval} {self.codepairs}>"
 
 
+@dataclass
+class CameraStageMetrics(CameraProcessEvent):
+    """
+    Метрики стадий обработки видео за последний интервал времени.
+
+    Гистограммы задержек хранятся как кол-во замеров в каждом интервале
+    ``bucket_bounds`` (последний элемент - замеры больше последней границы).
+    Счётчики - прирост за интервал.
+    """
+    interval_sec: float = 0.0
+    bucket_bounds: list[float] = field(default_factory=list)
+    histograms: dict[str, list[int]] = field(default_factory=dict)
+    sums_sec: dict[str, float] = field(default_factory=dict)
+    counters: dict[str, int] = field(default_factory=dict)
+
+
 @dataclass
 class ValidatedPack:
     """
     Базовый класс для всех провалидированных результатов
     """
+    trace: PackTrace = field(default_factory=PackTrace)
 
 
 @dataclass
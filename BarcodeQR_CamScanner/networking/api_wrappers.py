@@ -10,11 +10,14 @@ from abc import ABCMeta
 from typing import Optional
 
 import aiohttp
-import pysnmp.hlapi as snmp
 from loguru import logger
 
-from ..models import PackGoodCodes, PackBadCodes
+from .codes_submission import CodepairRejected, CodepairsSubmitter, SendStatus
+from .outbox import OutboxCodepair, SqliteCodesOutbox
+from .shutter_scheduling import ShutterScheduler, ShutterWindow
+from ..models import PackGoodCodes, PackBadCodes, ValidatedPack
 from ..scanning.code_reading import CodeType
+from ..snmp_client import get_snmp_client
 
 
 class BaseNetworkingApi(metaclass=abc.ABCMeta):
@@ -30,6 +33,13 @@ class BaseNetworkingApi(metaclass=abc.ABCMeta):
     async def notify_about_bad_pack(self, pack: PackBadCodes) -> None:
         """Уведомить, что прошла некорректная пачка"""
 
+    def drop_bad_pack(self, pack: PackBadCodes) -> None:
+        """
+        Сразу запланировать сброс некорректной пачки, если обёртка сбрасывает пачки.
+        Вызывается при получении результата валидации, до постановки пачки в очередь отправки,
+        поэтому не должен ждать сетевых запросов.
+        """
+
     @abc.abstractmethod
     async def get_workmode(self) -> Optional[str]:
         """Получить текущий режим работы системы"""
@@ -38,6 +48,21 @@ class BaseNetworkingApi(metaclass=abc.ABCMeta):
     async def get_expected_codes_count(self) -> Optional[int]:
         """Получить текущее ожидаемое кол-во кодов"""
 
+    async def start(self) -> None:
+        """Подготовить соединения (вызывается при запуске ``eventloop``)"""
+
+    async def close(self) -> None:
+        """Закрыть соединения (вызывается при остановке ``eventloop``)"""
+
+    def get_metrics(self) -> dict[str, float]:
+        """Текущие значения метрик сетевого взаимодействия"""
+        return {}
+
+    @property
+    def is_ordered(self) -> bool:
+        """Должны ли результаты по пачкам отправляться строго в порядке их прохождения"""
+        return True
+
 
 class BaseApiV1(BaseNetworkingApi, metaclass=ABCMeta):
     """
@@ -48,13 +73,104 @@ class BaseApiV1(BaseNetworkingApi, metaclass=ABCMeta):
         - некорректных пачках
         - получения ожидаемого количества кодов
         - получения текущего режима обработки
+
+    Все запросы идут через одну долгоживущую сессию ``aiohttp`` с пулом
+    keep-alive соединений и кэшем DNS, которая создаётся в ``start``
+    (или при первом запросе) и закрывается в ``close``.
+    Если ``ordered_codepairs``, пачки отправляются по очереди, а пары кодов пачки - по порядку
+    (как и раньше). Иначе пачки и пары кодов пачки отправляются одновременно,
+    но не более ``max_in_flight`` запросов сразу (см. ``CodepairsSubmitter``).
+
+    Если задан ``outbox``, пары кодов сначала записываются в него, а отправляются
+    отдельной задачей с повторами при ошибках (с ключом идемпотентности
+    в заголовке ``Idempotency-Key``), поэтому не теряются при недоступности бэкенда.
+
+    Parameters:
+        domain_url: адрес бэкенда
+        request_timeout_sec: таймаут одного запроса
+        pool_size: максимальное кол-во одновременных соединений с бэкендом
+        keepalive_sec: сколько держать открытым неиспользуемое соединение
+        max_in_flight: максимальное кол-во одновременно отправляемых пар кодов
+        ordered_codepairs: отправлять пачки и пары кодов пачки строго по порядку
+        outbox: локальная очередь неотправленных пар кодов (``None`` - отправлять сразу)
     """
     _REQUEST_TIMEOUT_SEC: float
+    _RETRYABLE_STATUSES = (408, 429)
+    """коды ошибок запроса, при которых отправку пары кодов стоит повторить"""
     _domain: str
+    _session: Optional[aiohttp.ClientSession]
 
-    def __init__(self, *, domain_url: str, request_timeout_sec: float = 2):
+    def __init__(
+            self,
+            *,
+            domain_url: str,
+            request_timeout_sec: float = 2,
+            pool_size: int = 8,
+            keepalive_sec: float = 30,
+            max_in_flight: int = 1,
+            ordered_codepairs: bool = True,
+            outbox: Optional[SqliteCodesOutbox] = None,
+    ):
         self._domain = domain_url
         self._REQUEST_TIMEOUT_SEC = request_timeout_sec
+        self._POOL_SIZE = pool_size
+        self._KEEPALIVE_SEC = keepalive_sec
+        self._session = None
+        self._ORDERED = ordered_codepairs
+        self._submitter = CodepairsSubmitter(
+            self._send_codepair,
+            max_in_flight=max_in_flight,
+            ordered=ordered_codepairs,
+        )
+        self._outbox = outbox
+        self._outbox_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._get_session()
+        if self._outbox is not None and self._outbox_task is None:
+            self._outbox_task = asyncio.get_running_loop().create_task(
+                self._outbox.drain_forever(self._submit_outbox_codepairs)
+            )
+
+    async def close(self) -> None:
+        if self._outbox_task is not None:
+            self._outbox_task.cancel()
+            try:
+                await self._outbox_task
+            except asyncio.CancelledError:
+                pass
+            self._outbox_task = None
+            self._outbox.close()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия для всех запросов (создаётся при первом обращении)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._POOL_SIZE,
+                keepalive_timeout=self._KEEPALIVE_SEC,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @property
+    def is_ordered(self) -> bool:
+        return self._ORDERED
+
+    def get_metrics(self) -> dict[str, float]:
+        return {
+            'codepairs_in_flight': self._submitter.in_flight,
+            'codepairs_queued': self._submitter.queued,
+            'codepairs_sent_total': self._submitter.sent,
+            'codepairs_failed_total': self._submitter.failed,
+            **({} if self._outbox is None else {
+                'outbox_pending': self._outbox.get_pending_count(),
+                'outbox_dead': self._outbox.get_dead_count(),
+            }),
+        }
 
     async def notify_about_good_pack(self, pack: PackGoodCodes) -> None:
         """
@@ -62,8 +178,7 @@ class BaseApiV1(BaseNetworkingApi, metaclass=ABCMeta):
 
         (Отправляет корректные коды бэкенду)
         """
-        for codes in pack.codepairs:
-            await self._send_codepair(codes[CodeType.QR_CODE], codes[CodeType.BARCODE])
+        await self._send_codepairs(pack)
 
     @abc.abstractmethod
     async def notify_about_bad_pack(self, pack: PackBadCodes) -> None:
@@ -83,12 +198,11 @@ class BaseApiV1(BaseNetworkingApi, metaclass=ABCMeta):
 
         logger.debug('Получение данных о текущем режиме записи')
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                        url=workmode_mapping,
-                        timeout=self._REQUEST_TIMEOUT_SEC
-                ) as resp:
-                    json_data = await resp.json()
+            async with self._get_session().get(
+                    url=workmode_mapping,
+                    timeout=self._REQUEST_TIMEOUT_SEC
+            ) as resp:
+                json_data = await resp.json()
             workmode = str(json_data['work_mode'])
             return workmode
         except Exception as e:
@@ -107,21 +221,42 @@ class BaseApiV1(BaseNetworkingApi, metaclass=ABCMeta):
 
         logger.debug("Получение данных об ожидаемом кол-ве QR-кодов")
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                        url=qr_count_mapping,
-                        timeout=self._REQUEST_TIMEOUT_SEC
-                ) as resp:
-                    json_data = await resp.json()
+            async with self._get_session().get(
+                    url=qr_count_mapping,
+                    timeout=self._REQUEST_TIMEOUT_SEC
+            ) as resp:
+                json_data = await resp.json()
             packs_in_block = int(json_data['params']['multipacks_after_pintset'])
             return packs_in_block
         except Exception as e:
             logger.error("Ошибка при попытке получить от сервера ожидаемое кол-во пачек")
             logger.opt(exception=e)
 
-    async def _send_codepair(self, qr_code: str, barcode: str) -> None:
+    async def _send_codepairs(self, pack: ValidatedPack) -> None:
+        """
+        Отправляет на сервер все пары кодов пачки,
+        либо записывает их в ``outbox`` для последующей отправки
+        """
+        codepairs = [(codes[CodeType.QR_CODE], codes[CodeType.BARCODE]) for codes in pack.codepairs]
+        if self._outbox is not None:
+            self._outbox.put(codepairs)
+            pack.trace.mark('committed')
+        else:
+            await self._submitter.submit(codepairs)
+            pack.trace.mark('sent')
+
+    async def _submit_outbox_codepairs(self, codepairs: list[OutboxCodepair]) -> list[SendStatus]:
+        """Отправляет пары кодов одной пачки из ``outbox``"""
+        return await self._submitter.submit(
+            (codepair.qr_code, codepair.barcode, codepair.idempotency_key)
+            for codepair in codepairs
+        )
+
+    async def _send_codepair(self, qr_code: str, barcode: str, idempotency_key: Optional[str] = None) -> None:
         """
         Отправляет пару из QR- и штрихкода на сервер.
+        При ошибке или ответе с кодом ошибки выбрасывает исключение,
+        при ответе с кодом ошибки запроса (4xx, кроме 408 и 429) - ``CodepairRejected``.
         """
         success_pack_mapping = f'http://{self._domain}/api/v1_0/new_pack_after_pintset'
 
@@ -133,27 +268,30 @@ class BaseApiV1(BaseNetworkingApi, metaclass=ABCMeta):
             'barcode': barcode,
         }
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.put(
-                        url=success_pack_mapping,
-                        json=json4send,
-                        timeout=self._REQUEST_TIMEOUT_SEC,
-                ):
-                    pass
-        except Exception as e:
-            logger.error("Ошибка при попытке отправки пары кодов на сервер")
-            logger.opt(exception=e)
+        headers = None if idempotency_key is None else {'Idempotency-Key': idempotency_key}
+        async with self._get_session().put(
+                url=success_pack_mapping,
+                json=json4send,
+                headers=headers,
+                timeout=self._REQUEST_TIMEOUT_SEC,
+        ) as resp:
+            # тело ответа дочитывается, чтобы соединение вернулось в пул
+            await resp.read()
+            if 400 <= resp.status < 500 and resp.status not in self._RETRYABLE_STATUSES:
+                raise CodepairRejected(f"{resp.status} {resp.reason}")
+            resp.raise_for_status()
 
 
 class BaseApiV1WithShutter(BaseApiV1, metaclass=ABCMeta):
-    # TODO: переписать smnp запросы на асинхронные.
-    #  Для этого посмотреть в сторону pysnmp.hlapi.asyncio
+    """
+    API-обёртка со сбросом пачек заслонкой.
+
+    Заслонка управляется SNMP-запросами через ``SnmpClient`` (в отдельном потоке,
+    не блокируя ``eventloop``) с таймаутом ``snmp_timeout_sec`` и ``snmp_retries`` повторами.
+    """
     SHUTTER_BEFORE_TIME_SEC: float
     SHUTTER_OPEN_TIME_SEC: float
     SHUTTER_PORT = 161
-    SHUTTER_ON = snmp.Integer(1)
-    SHUTTER_OFF = snmp.Integer(0)
 
     def __init__(
             self,
@@ -162,74 +300,96 @@ class BaseApiV1WithShutter(BaseApiV1, metaclass=ABCMeta):
             shutter_key: str,
             shutter_before_time_sec: float = 8,
             shutter_open_time_sec: float = 25,
+            snmp_timeout_sec: float = 1,
+            snmp_retries: int = 2,
             **kwargs,
     ):
         super().__init__(**kwargs)
+        self.SHUTTER_ON = 1
+        self.SHUTTER_OFF = 0
+
         self.shutter_ip = shutter_ip
-        self.shutter_identity = snmp.ObjectIdentity(shutter_key)
+        self.shutter_key = shutter_key
         self.SHUTTER_BEFORE_TIME_SEC = shutter_before_time_sec
         self.SHUTTER_OPEN_TIME_SEC = shutter_open_time_sec
 
-        self.snmp_community_string = 'public'
-        self.snmp_engine = snmp.SnmpEngine()
-        self.snmp_cummunity_data = snmp.CommunityData(self.snmp_community_string)
-        self.snmp_transport_target = snmp.UdpTransportTarget((self.shutter_ip, self.SHUTTER_PORT))
+        self._snmp_client = get_snmp_client(
+            shutter_ip,
+            port=self.SHUTTER_PORT,
+            timeout_sec=snmp_timeout_sec,
+            retries=snmp_retries,
+        )
+
+        self._shutter = ShutterScheduler(
+            self._send_shutter_open,
+            self._send_shutter_close,
+            before_sec=shutter_before_time_sec,
+            open_sec=shutter_open_time_sec,
+        )
+
+    @property
+    def is_shutter_open(self) -> bool:
+        return self._shutter.is_open
+
+    async def start(self) -> None:
+        await super().start()
+        self._shutter.start()
+
+    async def close(self) -> None:
+        await self._shutter.close()
+        await asyncio.to_thread(self._snmp_client.close)
+        await super().close()
+
+    def get_metrics(self) -> dict[str, float]:
+        return {
+            **super().get_metrics(),
+            'shutter_open': int(self._shutter.is_open),
+            'shutter_windows_scheduled': len(self._shutter.get_schedule()),
+        }
 
-        self.is_shutter_open = False
-        self.shutter_close_time = time.monotonic()
+    def get_shutter_schedule(self) -> list[ShutterWindow]:
+        """Текущее и предстоящие окна открытия заслонки (``time.monotonic()``)"""
+        return self._shutter.get_schedule()
 
-    async def _drop_pack(self) -> None:
+    def drop_bad_pack(self, pack: PackBadCodes) -> None:
         """
-        Асинхронно ждёт, открывает сброс пачёк и через некоторое время закрывает его.
-        Если ещё до закрытия заслонки на сброс была отправлена
-        новая группа пачек, то заслонка остаётся в открытом состоянии.
+        Планирует открытие сброса пачек через ``SHUTTER_BEFORE_TIME_SEC`` на ``SHUTTER_OPEN_TIME_SEC``
+        и сразу возвращает управление. Если ещё до закрытия заслонки на сброс была отправлена
+        новая группа пачек, то заслонка остаётся в открытом состоянии (см. ``ShutterScheduler``).
+
+        Предупреждает, если решение о сбросе принято так поздно после ухода пачки из кадра,
+        что пачка успеет пройти заслонку до её открытия.
         """
-        awake_time = self.SHUTTER_BEFORE_TIME_SEC + self.SHUTTER_OPEN_TIME_SEC
-        self.shutter_close_time = time.monotonic() + awake_time
-        await asyncio.sleep(self.SHUTTER_BEFORE_TIME_SEC)
-        if not self.is_shutter_open:
-            logger.info("Открыта заслонка - начало сброса пачек")
-            self.is_shutter_open = True
-            self._send_shutter_open()
-        await asyncio.sleep(self.SHUTTER_OPEN_TIME_SEC)
-        if self.is_shutter_open and time.monotonic() > self.shutter_close_time - 1e-3:
-            self.is_shutter_open = False
-            logger.info("Закрыта заслонка - окончание сброса пачек")
-            self._send_shutter_close()
-
-    def _send_shutter_open(self) -> None:
+        pack.trace.mark('drop_requested')
+        decision_latency_sec = pack.trace.elapsed('left_frame', 'drop_requested')
+        if decision_latency_sec is not None and decision_latency_sec >= self.SHUTTER_BEFORE_TIME_SEC:
+            logger.warning(f"Решение о сбросе пачки принято через {decision_latency_sec:.2f} с "
+                           f"после её ухода из кадра - больше времени до открытия заслонки "
+                           f"({self.SHUTTER_BEFORE_TIME_SEC} с), пачка может быть не сброшена")
+
+        window = self._shutter.request_drop(pack.trace.marks['drop_requested'])
+        logger.debug(f"Сброс пачки запланирован, заслонка открыта с {window.open_time:.1f} "
+                     f"по {window.close_time:.1f} (сейчас {time.monotonic():.1f})")
+
+    async def _send_shutter_open(self) -> None:
         """
         Отправляет запрос на опускание заслонки - начало сброса бракованных пачек.
         """
-        logger.debug("Запрос на открытие сброса")
+        logger.info("Открыта заслонка - начало сброса пачек")
         try:
-            snmp.setCmd(
-                self.snmp_engine,
-                self.snmp_cummunity_data,
-                self.snmp_transport_target,
-                snmp.ContextData(),
-                snmp.ObjectType(self.shutter_identity, self.SHUTTER_ON),
-            )
+            await self._snmp_client.set(self.shutter_key, self.SHUTTER_ON)
         except Exception as e:
-            logger.error("Ошибка при отправлении запроса на открытие сброса")
-            logger.opt(exception=e)
+            logger.error(f"Ошибка при отправлении запроса на открытие сброса: {e}")
 
-    def _send_shutter_close(self) -> None:
+    async def _send_shutter_close(self) -> None:
         """
         Отправляет запрос на поднятие заслонки - прекращение сброса пачек.
         """
-        logger.debug("Запрос на закрытие сброса")
+        logger.info("Закрыта заслонка - окончание сброса пачек")
         try:
-            snmp.setCmd(
-                self.snmp_engine,
-                self.snmp_cummunity_data,
-                self.snmp_transport_target,
-                snmp.ContextData(),
-                snmp.ObjectType(self.shutter_identity, self.SHUTTER_OFF),
-            )
+            await self._snmp_client.set(self.shutter_key, self.SHUTTER_OFF)
         except Exception as e:
-            logger.error("Ошибка при отправлении запроса на закрытие сброса")
-            logger.opt(exception=e)
+            logger.error(f"Ошибка при отправлении запроса на закрытие сброса: {e}")
 
 
 class ApiV1SendCodesAnyway(BaseApiV1):
@@ -242,8 +402,7 @@ class ApiV1SendCodesAnyway(BaseApiV1):
         """
         Отправляет некорректные коды бэкенду в надежде, что он их сбросит сам
         """
-        for codes in pack.codepairs:
-            await self._send_codepair(codes[CodeType.QR_CODE], codes[CodeType.BARCODE])
+        await self._send_codepairs(pack)
 
 
 class ApiV1WithShutterDrop(BaseApiV1WithShutter):
@@ -252,9 +411,8 @@ class ApiV1WithShutterDrop(BaseApiV1WithShutter):
     """
     async def notify_about_bad_pack(self, pack: PackBadCodes) -> None:
         """
-        Сбрасывает пачки заслонкой, не извещая о них сервер
+        Сервер о некорректных пачках не извещается - пачка уже сброшена в ``drop_bad_pack``
         """
-        await self._drop_pack()
 
 
 class ApiV1WithShutterDropAndCodesSending(BaseApiV1WithShutter):
@@ -265,8 +423,7 @@ class ApiV1WithShutterDropAndCodesSending(BaseApiV1WithShutter):
     """
     async def notify_about_bad_pack(self, pack: PackBadCodes) -> None:
         """
-        Отправляет некорректные коды бэкенду и сбрасывает пачки заслонкой
+        Отправляет некорректные коды бэкенду (пачка уже сброшена в ``drop_bad_pack``,
+        до отправки кодов, чтобы сброс не зависел от задержек бэкенда)
         """
-        for codes in pack.codepairs:
-            await self._send_codepair(codes[CodeType.QR_CODE], codes[CodeType.BARCODE])
-        await self._drop_pack()
+        await self._send_codepairs(pack)
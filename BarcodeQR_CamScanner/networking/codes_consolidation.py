@@ -59,6 +59,8 @@ class ResultValidator(BaseResultConsolidationQueue):
         Если оно совпадает с ожидаемым, то возращает ``PackGoodCodes`` с кодами.
         Если количество кодов меньше ожидаемого, то вместо недостающих кодов
         добавляются заглушки и возвращается ``PackBadCodes`` с ошибкой.
+
+        Трассировка пачки (``trace``) переносится в результат с отметкой ``validated``.
         """
         processed = []
 
@@ -75,7 +77,8 @@ class ResultValidator(BaseResultConsolidationQueue):
                     logger.warning(f"Считанное количество кодов ({real_count}) "
                                    f"превышает ожидаемое ({expected_count})")
                 logger.info(f"Пачка {pack} помечена корректной")
-                processed.append(PackGoodCodes(codepairs=pack.codepairs))
+                pack.trace.mark('validated')
+                processed.append(PackGoodCodes(codepairs=pack.codepairs, trace=pack.trace))
                 continue
 
             logger.info(f"Ожидалось {pack.expected_codes_count} пар кодов, "
@@ -91,7 +94,8 @@ class ResultValidator(BaseResultConsolidationQueue):
             logger.info(f"Недостающие {missed_qrcodes_count} кодов были заполнены заглушками")
             logger.info(f"Пачка {pack} помечена некорректной")
 
-            processed.append(PackBadCodes(codepairs=pack.codepairs))
+            pack.trace.mark('validated')
+            processed.append(PackBadCodes(codepairs=pack.codepairs, trace=pack.trace))
 
         self._queue.clear()
         return processed
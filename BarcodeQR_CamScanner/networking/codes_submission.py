@@ -0,0 +1,103 @@
+"""
+Отправка пар кодов бэкенду с ограниченным числом одновременных запросов.
+"""
+import asyncio
+from enum import Enum
+from typing import Awaitable, Callable, Iterable
+
+from loguru import logger
+
+__all__ = ['CodepairRejected', 'SendStatus', 'CodepairsSubmitter']
+
+
+class CodepairRejected(Exception):
+    """Бэкенд отверг пару кодов (ошибка запроса) - повторная отправка не поможет"""
+
+
+class SendStatus(str, Enum):
+    """
+    Результат отправки пары кодов
+    """
+    SENT = 'sent'
+    """Пара принята бэкендом"""
+    FAILED = 'failed'
+    """Временная ошибка (нет связи, таймаут, ошибка сервера) - отправку можно повторить"""
+    REJECTED = 'rejected'
+    """Пара отвергнута бэкендом (``CodepairRejected``) - повторять отправку бессмысленно"""
+    SKIPPED = 'skipped'
+    """Пара не отправлялась, т.к. не удалось отправить предыдущую пару пачки"""
+
+
+class CodepairsSubmitter:
+    """
+    Отправляет пары кодов пачек, держа одновременно не более ``max_in_flight`` запросов.
+
+    Если ``ordered``, пары одной пачки отправляются строго по порядку - следующая после
+    ответа на предыдущую, а после первой временной ошибки остальные пары пачки
+    не отправляются. Иначе пары одной пачки тоже отправляются одновременно.
+
+    Parameters:
+        send_codepair: отправка одной пары (аргументы - элементы пары),
+            при неудаче выбрасывает исключение (``CodepairRejected``, если пара отвергнута)
+        max_in_flight: максимальное кол-во одновременных запросов
+        ordered: сохранять порядок отправки пар внутри пачки
+    """
+    def __init__(
+            self,
+            send_codepair: Callable[..., Awaitable[None]],
+            *,
+            max_in_flight: int = 1,
+            ordered: bool = True,
+    ):
+        self._send_codepair = send_codepair
+        self._ORDERED = ordered
+        self._window = asyncio.Semaphore(max(1, max_in_flight))
+        self.in_flight = 0
+        """кол-во отправляемых сейчас пар"""
+        self.queued = 0
+        """кол-во пар, ожидающих места в окне отправки"""
+        self.sent = 0
+        """кол-во успешно отправленных пар (с момента запуска)"""
+        self.failed = 0
+        """кол-во неудачных попыток отправки пар, включая отвергнутые пары (с момента запуска)"""
+
+    async def submit(self, codepairs: Iterable[tuple]) -> list[SendStatus]:
+        """
+        Отправляет пары кодов одной пачки и ждёт окончания их отправки.
+
+        Returns:
+            результат отправки каждой пары
+        """
+        codepairs = list(codepairs)
+        self.queued += len(codepairs)
+        if not self._ORDERED:
+            return list(await asyncio.gather(*(self._send(codepair) for codepair in codepairs)))
+
+        statuses = []
+        for codepair in codepairs:
+            status = await self._send(codepair)
+            statuses.append(status)
+            if status is SendStatus.FAILED:
+                break
+        skipped = len(codepairs) - len(statuses)
+        self.queued -= skipped
+        return statuses + [SendStatus.SKIPPED] * skipped
+
+    async def _send(self, codepair: tuple) -> SendStatus:
+        async with self._window:
+            self.queued -= 1
+            self.in_flight += 1
+            try:
+                await self._send_codepair(*codepair)
+                self.sent += 1
+                return SendStatus.SENT
+            except CodepairRejected as e:
+                self.failed += 1
+                logger.error(f"Сервер отверг пару кодов {codepair[:2]}: {e}")
+                return SendStatus.REJECTED
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Ошибка при попытке отправки пары кодов {codepair[:2]} на сервер: {e!r}")
+                return SendStatus.FAILED
+            finally:
+                self.in_flight -= 1
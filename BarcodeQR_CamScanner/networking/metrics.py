@@ -0,0 +1,99 @@
+"""
+Сбор метрик стадий обработки от процессов-камер и их отдача в текстовом формате Prometheus.
+"""
+from collections import Counter, defaultdict
+from typing import Callable, Optional
+
+from aiohttp import web
+from loguru import logger
+
+from ..models import CameraStageMetrics
+
+__all__ = ['CameraMetricsRegistry', 'start_metrics_server']
+
+
+class CameraMetricsRegistry:
+    """
+    Накопленные (с момента запуска) гистограммы задержек и счётчики
+    по каждому процессу-камере (``worker_id``) и стадии обработки,
+    а также текущие метрики сетевого взаимодействия, если задан ``network_metrics``.
+    """
+    def __init__(self, *, network_metrics: Optional[Callable[[], dict[str, float]]] = None):
+        self._network_metrics = network_metrics
+        self._bucket_bounds: list[float] = []
+        self._histograms: dict[tuple[int, str], list[int]] = {}
+        self._sums_sec: Counter[tuple[int, str]] = Counter()
+        self._counters: dict[int, Counter[str]] = defaultdict(Counter)
+
+    def update(self, event: CameraStageMetrics) -> None:
+        """Добавляет метрики, полученные от процесса-камеры"""
+        if self._bucket_bounds != event.bucket_bounds:
+            if self._bucket_bounds:
+                logger.warning('Границы гистограмм метрик изменились, '
+                               'накопленные гистограммы сброшены')
+                self._histograms.clear()
+                self._sums_sec.clear()
+            self._bucket_bounds = list(event.bucket_bounds)
+
+        for stage, histogram in event.histograms.items():
+            key = (event.worker_id, stage)
+            total = self._histograms.setdefault(key, [0] * len(histogram))
+            for index, value in enumerate(histogram):
+                total[index] += value
+            self._sums_sec[key] += event.sums_sec.get(stage, 0.0)
+        self._counters[event.worker_id].update(event.counters)
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus"""
+        lines = [
+            '# HELP camscanner_stage_latency_seconds Длительность стадий обработки видео',
+            '# TYPE camscanner_stage_latency_seconds histogram',
+        ]
+        for (worker_id, stage), histogram in sorted(self._histograms.items()):
+            labels = f'worker_id="{worker_id}",stage="{stage}"'
+            cumulative = 0
+            for bound, value in zip(self._bucket_bounds, histogram):
+                cumulative += value
+                lines.append(f'camscanner_stage_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            count = sum(histogram)
+            lines.append(f'camscanner_stage_latency_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'camscanner_stage_latency_seconds_sum{{{labels}}} '
+                         f'{self._sums_sec[(worker_id, stage)]:.6f}')
+            lines.append(f'camscanner_stage_latency_seconds_count{{{labels}}} {count}')
+
+        lines += [
+            '# HELP camscanner_camera_events_total Счётчики событий процессов-камер',
+            '# TYPE camscanner_camera_events_total counter',
+        ]
+        for worker_id, counters in sorted(self._counters.items()):
+            for name, value in sorted(counters.items()):
+                lines.append(f'camscanner_camera_events_total{{worker_id="{worker_id}",counter="{name}"}} {value}')
+
+        if self._network_metrics is not None:
+            for name, value in sorted(self._network_metrics().items()):
+                metric_type = 'counter' if name.endswith('_total') else 'gauge'
+                lines.append(f'# TYPE camscanner_{name} {metric_type}')
+                lines.append(f'camscanner_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+async def start_metrics_server(
+        registry: CameraMetricsRegistry,
+        *,
+        host: str = '127.0.0.1',
+        port: int = 9108,
+) -> web.AppRunner:
+    """
+    Запускает HTTP-сервер, отдающий метрики по адресу ``/metrics``.
+    Сервер работает в текущем ``eventloop``.
+    """
+    async def handle_metrics(_: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f'Метрики процессов-камер доступны по адресу http://{host}:{port}/metrics')
+    return runner
@@ -0,0 +1,247 @@
+"""
+Локальная очередь (outbox) пар кодов, ещё не принятых бэкендом.
+
+Пары кодов провалидированной пачки сразу записываются в SQLite (режим WAL)
+и удаляются только после успешной отправки, поэтому не теряются ни при
+недоступности бэкенда, ни при перезапуске программы. Пары, отвергнутые бэкендом
+или так и не отправленные за ``max_attempts`` попыток, переносятся в таблицу
+``dead_codepairs``, откуда их можно разобрать вручную.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from typing import Awaitable, Callable, Iterable, NamedTuple, Optional
+
+from loguru import logger
+
+from .codes_submission import SendStatus
+
+__all__ = ['OutboxCodepair', 'SqliteCodesOutbox']
+
+
+class OutboxCodepair(NamedTuple):
+    """
+    Пара кодов, ожидающая отправки
+    """
+    id: int
+    pack_key: str
+    """общий для всех пар одной пачки ключ"""
+    qr_code: str
+    barcode: str
+    idempotency_key: str
+    """ключ, одинаковый при всех повторных попытках отправки пары"""
+    attempts: int
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS codepairs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pack_key TEXT NOT NULL,
+    qr_code TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0
+);
+DROP INDEX IF EXISTS codepairs_next_attempt;
+CREATE TABLE IF NOT EXISTS dead_codepairs (
+    id INTEGER PRIMARY KEY,
+    pack_key TEXT NOT NULL,
+    qr_code TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    died REAL NOT NULL
+);
+'''
+
+
+class SqliteCodesOutbox:
+    """
+    Очередь пар кодов в файле SQLite.
+
+    ``put`` сразу фиксирует пары кодов пачки на диске, а ``drain_forever``
+    (отдельная задача ``eventloop``) отправляет их по одной пачке в порядке записи,
+    беря из очереди до ``batch_size`` пар за раз, и удаляет принятые бэкендом.
+
+    Порядок отправки сохраняется: пока не отправлена самая старая пара, следующие
+    не отправляются. Пара с временной ошибкой повторяется с экспоненциально растущей
+    паузой от ``backoff_base_sec`` до ``backoff_max_sec``, а после ``max_attempts``
+    неудачных попыток переносится в ``dead_codepairs``, освобождая очередь.
+    Отвергнутые бэкендом пары (``SendStatus.REJECTED``) переносятся туда сразу.
+
+    Parameters:
+        path: путь к файлу базы
+        batch_size: сколько пар брать из очереди за один раз
+        backoff_base_sec: пауза перед первой повторной попыткой
+        backoff_max_sec: максимальная пауза между попытками
+        max_attempts: после скольких неудачных попыток перестать отправлять пару (0 - без ограничения)
+        stats_interval_sec: периодичность логгирования размера очереди (0 - не логгировать)
+    """
+    def __init__(
+            self,
+            *,
+            path: str,
+            batch_size: int = 50,
+            backoff_base_sec: float = 1,
+            backoff_max_sec: float = 60,
+            max_attempts: int = 100,
+            stats_interval_sec: float = 600,
+    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # в режиме WAL при NORMAL данные не теряются при падении процесса
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+        self._BATCH_SIZE = batch_size
+        self._BACKOFF_BASE_SEC = backoff_base_sec
+        self._BACKOFF_MAX_SEC = backoff_max_sec
+        self._MAX_ATTEMPTS = max_attempts
+        self._STATS_INTERVAL_SEC = stats_interval_sec
+        self._logged_time = time.monotonic()
+        self._has_new = asyncio.Event()
+
+        pending = self.get_pending_count()
+        if pending:
+            logger.info(f"В очереди {path!r} остались неотправленные пары кодов: {pending}")
+
+    def put(self, codepairs: Iterable[tuple[str, str]]) -> None:
+        """Записывает пары кодов одной пачки в очередь"""
+        pack_key = uuid.uuid4().hex
+        now = time.time()
+        with self._db:
+            self._db.execute('BEGIN')
+            self._db.executemany(
+                'INSERT INTO codepairs (pack_key, qr_code, barcode, idempotency_key, created) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(pack_key, qr_code, barcode, uuid.uuid4().hex, now) for qr_code, barcode in codepairs],
+            )
+        self._has_new.set()
+
+    def get_pending_count(self) -> int:
+        """Кол-во пар кодов в очереди"""
+        return self._db.execute('SELECT COUNT(*) FROM codepairs').fetchone()[0]
+
+    def get_dead_count(self) -> int:
+        """Кол-во пар кодов, которые перестали отправляться"""
+        return self._db.execute('SELECT COUNT(*) FROM dead_codepairs').fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+    async def drain_forever(
+            self,
+            submit: Callable[[list[OutboxCodepair]], Awaitable[list[SendStatus]]],
+    ) -> None:
+        """
+        Бесконечно отправляет пары кодов из очереди через ``submit``,
+        который возвращает результат отправки каждой пары.
+        Пары одной пачки передаются в ``submit`` вместе и в порядке записи,
+        пачки - по одной в порядке записи.
+        """
+        while True:
+            self._has_new.clear()
+            batch = self._get_due_batch()
+            if not batch:
+                await self._wait_next(self._get_next_attempt_delay())
+                continue
+
+            packs: dict[str, list[OutboxCodepair]] = {}
+            for codepair in batch:
+                packs.setdefault(codepair.pack_key, []).append(codepair)
+            for codepairs in packs.values():
+                statuses = await submit(codepairs)
+                self._complete(codepairs, statuses)
+                if SendStatus.FAILED in statuses:
+                    # следующие пачки ждут повторной отправки этой
+                    break
+            self._log_stats()
+
+    def _get_due_batch(self) -> list[OutboxCodepair]:
+        """Самые старые пары кодов - до первой, время повтора которой ещё не наступило"""
+        rows = self._db.execute(
+            'SELECT id, pack_key, qr_code, barcode, idempotency_key, attempts, next_attempt FROM codepairs '
+            'ORDER BY id LIMIT ?',
+            (self._BATCH_SIZE,),
+        ).fetchall()
+        now = time.time()
+        batch = []
+        for *row, next_attempt in rows:
+            if next_attempt > now:
+                break
+            batch.append(OutboxCodepair(*row))
+        return batch
+
+    def _get_next_attempt_delay(self) -> Optional[float]:
+        """Через сколько можно отправлять самую старую пару (``None`` - очередь пуста)"""
+        row = self._db.execute('SELECT next_attempt FROM codepairs ORDER BY id LIMIT 1').fetchone()
+        return None if row is None else max(0.0, row[0] - time.time())
+
+    async def _wait_next(self, timeout_sec: Optional[float]) -> None:
+        """Ждёт новых пар кодов, но не дольше ``timeout_sec`` (``None`` - без ограничения)"""
+        try:
+            await asyncio.wait_for(self._has_new.wait(), timeout_sec)
+        except asyncio.TimeoutError:
+            pass
+
+    def _complete(self, codepairs: list[OutboxCodepair], statuses: list[SendStatus]) -> None:
+        """
+        Удаляет отправленные пары, переносит в ``dead_codepairs`` отвергнутые
+        и исчерпавшие попытки и откладывает повтор остальных неудачных
+        """
+        sent, dead, failed = [], [], []
+        for codepair, status in zip(codepairs, statuses):
+            if status is SendStatus.SENT:
+                sent.append(codepair)
+            elif status is SendStatus.REJECTED:
+                dead.append((codepair, 'rejected'))
+            elif status is SendStatus.FAILED:
+                if 0 < self._MAX_ATTEMPTS <= codepair.attempts + 1:
+                    dead.append((codepair, 'max_attempts'))
+                else:
+                    failed.append(codepair)
+
+        now = time.time()
+        with self._db:
+            self._db.execute('BEGIN')
+            self._db.executemany(
+                'INSERT INTO dead_codepairs '
+                '(id, pack_key, qr_code, barcode, idempotency_key, created, attempts, reason, died) '
+                'SELECT id, pack_key, qr_code, barcode, idempotency_key, created, attempts + 1, ?, ? '
+                'FROM codepairs WHERE id = ?',
+                [(reason, now, codepair.id) for codepair, reason in dead],
+            )
+            self._db.executemany(
+                'DELETE FROM codepairs WHERE id = ?',
+                [(codepair.id,) for codepair in sent] + [(codepair.id,) for codepair, _ in dead],
+            )
+            self._db.executemany(
+                'UPDATE codepairs SET attempts = ?, next_attempt = ? WHERE id = ?',
+                [
+                    (codepair.attempts + 1, now + self._get_backoff_sec(codepair.attempts), codepair.id)
+                    for codepair in failed
+                ],
+            )
+        for codepair, reason in dead:
+            logger.error(f"Пара кодов {(codepair.qr_code, codepair.barcode)} больше не будет отправляться "
+                         f"({reason}, попыток: {codepair.attempts + 1}), она перенесена в dead_codepairs")
+
+    def _get_backoff_sec(self, attempts: int) -> float:
+        return min(self._BACKOFF_MAX_SEC, self._BACKOFF_BASE_SEC * 2 ** min(attempts, 32))
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if self._STATS_INTERVAL_SEC <= 0 or now - self._logged_time < self._STATS_INTERVAL_SEC:
+            return
+        self._logged_time = now
+        logger.info(f"Неотправленных пар кодов в очереди: {self.get_pending_count()}, "
+                    f"перестали отправляться: {self.get_dead_count()}")
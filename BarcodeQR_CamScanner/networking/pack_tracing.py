@@ -0,0 +1,76 @@
+"""
+Статистика задержек прохождения пачками этапов обработки.
+"""
+import time
+from collections import deque
+
+from loguru import logger
+
+from ..models import PackTrace
+
+__all__ = ['PACK_HOPS', 'PackLatencyStats']
+
+PACK_HOPS = ('left_frame', 'decoded', 'queued', 'dequeued', 'validated', 'committed', 'sent', 'drop_requested')
+"""
+Этапы обработки пачки (см. ``PackTrace``). Порядок прохождения зависит от пути пачки:
+например, сброс заслонкой запрашивается до отправки кодов, поэтому задержки
+считаются в порядке фактических моментов отметки этапов.
+"""
+
+
+class PackLatencyStats:
+    """
+    Хранит задержки последних ``window`` пачек на каждом этапе (от предыдущего по времени
+    отмеченного этапа) и полную задержку от первого до последнего отмеченного этапа.
+    Раз в ``log_interval_sec`` логгирует перцентили задержек.
+
+    Parameters:
+        window: кол-во последних пачек, по которым считаются перцентили
+        log_interval_sec: периодичность логгирования (0 - не логгировать)
+    """
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, *, window: int = 500, log_interval_sec: float = 0):
+        self._WINDOW = window
+        self._LOG_INTERVAL_SEC = log_interval_sec
+        self._logged_time = time.monotonic()
+        self._latencies: dict[str, deque[float]] = {}
+
+    def add(self, trace: PackTrace) -> None:
+        """Учитывает трассировку обработанной пачки"""
+        # при равных моментах сохраняется порядок PACK_HOPS
+        hops = sorted((hop for hop in PACK_HOPS if hop in trace.marks), key=trace.marks.__getitem__)
+        for from_hop, to_hop in zip(hops, hops[1:]):
+            self._add_latency(to_hop, trace.elapsed(from_hop, to_hop))
+        if len(hops) > 1:
+            self._add_latency('total', trace.elapsed(hops[0], hops[-1]))
+        self._log_stats()
+
+    def get_percentiles(self) -> dict[str, dict[int, float]]:
+        """Перцентили задержек (в секундах) по каждому этапу"""
+        percentiles = {}
+        for hop, latencies in self._latencies.items():
+            ordered = sorted(latencies)
+            percentiles[hop] = {
+                percent: ordered[min(len(ordered) - 1, len(ordered) * percent // 100)]
+                for percent in self.PERCENTILES
+            }
+        return percentiles
+
+    def _add_latency(self, hop: str, latency_sec: float) -> None:
+        latencies = self._latencies.get(hop)
+        if latencies is None:
+            latencies = self._latencies[hop] = deque(maxlen=self._WINDOW)
+        latencies.append(latency_sec)
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if self._LOG_INTERVAL_SEC <= 0 or now - self._logged_time < self._LOG_INTERVAL_SEC:
+            return
+        self._logged_time = now
+        hops_stats = ', '.join(
+            f"{hop}: " + '/'.join(f"{value * 1000:.0f}" for value in percentiles.values())
+            for hop, percentiles in self.get_percentiles().items()
+        )
+        percents = '/'.join(f'p{percent}' for percent in self.PERCENTILES)
+        logger.info(f"Задержки этапов обработки пачек ({percents}, мс): {hops_stats}")
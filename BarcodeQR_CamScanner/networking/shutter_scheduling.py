@@ -0,0 +1,130 @@
+"""
+Расписание открытия заслонки сброса пачек.
+"""
+import asyncio
+import bisect
+import time
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+__all__ = ['ShutterWindow', 'ShutterScheduler']
+
+
+class ShutterWindow(NamedTuple):
+    """
+    Интервал, в течение которого заслонка должна быть открыта (``time.monotonic()``)
+    """
+    open_time: float
+    close_time: float
+
+
+class ShutterScheduler:
+    """
+    Открывает и закрывает заслонку по расписанию в отдельной задаче ``eventloop``.
+
+    ``request_drop`` сразу возвращает управление, добавляя в расписание окно
+    ``[now + before_sec, now + before_sec + open_sec]``. Пересекающиеся и соприкасающиеся
+    окна объединяются, поэтому при частых сбросах заслонка не закрывается между ними.
+    Задача расписания спит до ближайшего момента открытия или закрытия.
+
+    Parameters:
+        open_shutter: открытие заслонки
+        close_shutter: закрытие заслонки
+        before_sec: через сколько после запроса сброса открывать заслонку
+        open_sec: сколько держать заслонку открытой
+    """
+    def __init__(
+            self,
+            open_shutter: Callable[[], Awaitable[None]],
+            close_shutter: Callable[[], Awaitable[None]],
+            *,
+            before_sec: float,
+            open_sec: float,
+    ):
+        self._open_shutter = open_shutter
+        self._close_shutter = close_shutter
+        self._BEFORE_SEC = before_sec
+        self._OPEN_SEC = open_sec
+        self._windows: list[ShutterWindow] = []
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.is_open = False
+
+    def request_drop(self, request_time: Optional[float] = None) -> ShutterWindow:
+        """
+        Планирует открытие заслонки для сброса пачки.
+
+        Returns:
+            окно открытия заслонки, в которое попал сброс (с учётом объединения)
+        """
+        if request_time is None:
+            request_time = time.monotonic()
+        open_time = request_time + self._BEFORE_SEC
+        window = self._add_window(ShutterWindow(open_time, open_time + self._OPEN_SEC))
+        self._changed.set()
+        return window
+
+    def get_schedule(self) -> list[ShutterWindow]:
+        """Текущее (если заслонка открыта) и предстоящие окна открытия заслонки"""
+        return list(self._windows)
+
+    def start(self) -> None:
+        """Запускает задачу расписания в текущем ``eventloop``"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run_forever())
+
+    async def close(self) -> None:
+        """Останавливает задачу расписания и закрывает заслонку, если она открыта"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._windows.clear()
+        if self.is_open:
+            self.is_open = False
+            await self._close_shutter()
+
+    def _add_window(self, window: ShutterWindow) -> ShutterWindow:
+        """Добавляет окно в упорядоченное расписание, объединяя его с пересекающимися"""
+        index = bisect.bisect_left(self._windows, window)
+        if index > 0 and self._windows[index - 1].close_time >= window.open_time:
+            index -= 1
+        open_time, close_time = window
+        end = index
+        while end < len(self._windows) and self._windows[end].open_time <= close_time:
+            open_time = min(open_time, self._windows[end].open_time)
+            close_time = max(close_time, self._windows[end].close_time)
+            end += 1
+        merged = ShutterWindow(open_time, close_time)
+        self._windows[index:end] = [merged]
+        return merged
+
+    async def _run_forever(self) -> None:
+        while True:
+            self._changed.clear()
+            if not self._windows:
+                await self._changed.wait()
+                continue
+
+            now = time.monotonic()
+            window = self._windows[0]
+            if not self.is_open and now >= window.open_time:
+                self.is_open = True
+                await self._open_shutter()
+                continue
+            if self.is_open and now >= window.close_time:
+                self._windows.pop(0)
+                if self._windows and self._windows[0].open_time <= now:
+                    # следующее окно уже началось - заслонка остаётся открытой
+                    continue
+                self.is_open = False
+                await self._close_shutter()
+                continue
+
+            deadline = window.close_time if self.is_open else window.open_time
+            try:
+                await asyncio.wait_for(self._changed.wait(), deadline - now)
+            except asyncio.TimeoutError:
+                pass
@@ -2,12 +2,17 @@ import abc
 import asyncio
 import multiprocessing as mp
 from queue import Empty
+from typing import Optional
 
+from aiohttp import web
 from loguru import logger
 
 from .api_wrappers import BaseNetworkingApi
 from .codes_consolidation import BaseResultConsolidationQueue
-from ..models import ValidatedPack, PackGoodCodes, PackBadCodes, CameraPackResult
+from .metrics import CameraMetricsRegistry, start_metrics_server
+from .pack_tracing import PackLatencyStats
+from ..models import ValidatedPack, PackGoodCodes, PackBadCodes, CameraPackResult, CameraStageMetrics
+from ..shared_state import SharedScanningState
 
 
 class BaseAsyncWorker(metaclass=abc.ABCMeta):
@@ -19,16 +24,41 @@ class BaseAsyncWorker(metaclass=abc.ABCMeta):
     def _setup_eventloop(self) -> None:
         """Устанавливает стартовые задачи во внутренний ``eventloop``"""
 
+    async def _on_start(self) -> None:
+        """Подготовка ресурсов перед запуском ``eventloop``"""
+
+    async def _on_stop(self) -> None:
+        """Освобождение ресурсов после остановки ``eventloop``"""
+
     def run_forever(self) -> None:
-        """Запускает внутренний ``eventloop`` на бесконечное выполнение"""
-        self._loop.run_forever()
+        """
+        Запускает внутренний ``eventloop`` на бесконечное выполнение.
+        Ресурсы освобождаются и при остановке по ``KeyboardInterrupt``.
+        """
+        self._loop.run_until_complete(self._on_start())
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.run_until_complete(self._on_stop())
 
 
 class AsyncMainWorker(BaseAsyncWorker):
     """
     Асинхронный обработчик для событий с одной камеры.
     Читает и обрабатывает события, отправленные через мультипроцессную очередь.
-    Регулярно обновляет режим работы и ожидаемое количество кодов.
+    Регулярно обновляет режим работы и ожидаемое количество кодов
+    и сообщает их процессам-камерам через ``shared_state``.
+
+    Если указан ``metrics_port``, то метрики стадий обработки, присылаемые
+    процессами-камерами, отдаются по адресу ``http://127.0.0.1:<metrics_port>/metrics``.
+
+    Задержки прохождения пачками этапов обработки собираются в ``latency_stats``.
+
+    Результаты по пачкам отправляются отдельно от чтения очереди, чтобы отправка
+    не задерживала его. Сброс некорректной пачки планируется сразу при получении
+    результата валидации, не дожидаясь отправки результатов по предыдущим пачкам. Если API-обёртка требует порядка (``api.is_ordered``),
+    пачки отправляет по очереди одна задача, иначе каждая пачка отправляется
+    в своей задаче (одновременность запросов ограничивается самой API-обёрткой).
     """
     _api: BaseNetworkingApi
     _queue: mp.Queue
@@ -43,13 +73,27 @@ class AsyncMainWorker(BaseAsyncWorker):
             consolidator: BaseResultConsolidationQueue,
             expected_codes_count: int = 2,
             workmode: str = 'auto',
+            shared_state: SharedScanningState = None,
+            metrics_port: Optional[int] = None,
+            latency_stats: PackLatencyStats = None,
     ):
+        self._metrics_port = metrics_port
+        self._metrics = CameraMetricsRegistry(network_metrics=api.get_metrics)
+        self._metrics_runner: Optional[web.AppRunner] = None
+        self._sending_tasks: set[asyncio.Task] = set()
+        self._ordered_packs: Optional[asyncio.Queue] = asyncio.Queue() if api.is_ordered else None
+        self._ordered_sending_task: Optional[asyncio.Task] = None
+        self._latency_stats = PackLatencyStats() if latency_stats is None else latency_stats
         super().__init__()
         self._api = api
         self._queue = queue
         self._consolidator = consolidator
         self._expected_codes_count = expected_codes_count
         self._workmode = workmode
+        self._shared_state = shared_state
+        if shared_state is not None:
+            shared_state.expected_codes_count = expected_codes_count
+            shared_state.workmode = workmode
 
     def _setup_eventloop(self) -> None:
         """
@@ -59,6 +103,28 @@ class AsyncMainWorker(BaseAsyncWorker):
         """
         self._loop.create_task(self._endless_keep_actual_state())
         self._loop.create_task(self._endless_handle_queue_events())
+        if self._ordered_packs is not None:
+            self._ordered_sending_task = self._loop.create_task(self._endless_send_ordered_packs())
+
+    async def _on_start(self) -> None:
+        await self._api.start()
+        if self._metrics_port is not None:
+            self._metrics_runner = await start_metrics_server(self._metrics, port=self._metrics_port)
+
+    async def _on_stop(self) -> None:
+        if self._ordered_sending_task is not None and not self._ordered_sending_task.done():
+            if not self._ordered_packs.empty():
+                logger.info(f"Ожидание отправки результатов по {self._ordered_packs.qsize()} пачкам")
+            # задача отправки дообрабатывает уже поставленные пачки и завершается
+            self._ordered_packs.put_nowait(None)
+            await asyncio.gather(self._ordered_sending_task, return_exceptions=True)
+        if self._sending_tasks:
+            logger.info(f"Ожидание отправки результатов по {len(self._sending_tasks)} пачкам")
+            await asyncio.gather(*self._sending_tasks, return_exceptions=True)
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+            self._metrics_runner = None
+        await self._api.close()
 
     async def _endless_keep_actual_state(self) -> None:
         """
@@ -76,18 +142,46 @@ class AsyncMainWorker(BaseAsyncWorker):
         """
         while True:
             try:
-                raw_pack: CameraPackResult = self._queue.get_nowait()
-                logger.debug(f"Получены данные от процесса-камеры: {raw_pack}")
-                raw_pack.expected_codes_count = self._expected_codes_count
-                raw_pack.workmode = self._workmode
-                self._consolidator.enqueue(raw_pack)
+                event = self._queue.get_nowait()
             except Empty:
-                pass
+                event = None
+
+            if isinstance(event, CameraPackResult):
+                event.trace.mark('dequeued')
+                logger.debug(f"Получены данные от процесса-камеры: {event}")
+                event.expected_codes_count = self._expected_codes_count
+                event.workmode = self._workmode
+                self._consolidator.enqueue(event)
+            elif isinstance(event, CameraStageMetrics):
+                self._metrics.update(event)
+            elif event is not None:
+                logger.warning(f"Неизвестное событие от процесса-камеры: {event}")
             validated = self._consolidator.get_processed_latest()
             for pack in validated:
-                await self._send_codes(pack)
+                if isinstance(pack, PackBadCodes):
+                    self._api.drop_bad_pack(pack)
+                if self._ordered_packs is not None:
+                    self._ordered_packs.put_nowait(pack)
+                    continue
+                task = self._loop.create_task(self._send_codes(pack))
+                self._sending_tasks.add(task)
+                task.add_done_callback(self._sending_tasks.discard)
             await asyncio.sleep(0.05)
 
+    async def _endless_send_ordered_packs(self) -> None:
+        """
+        Отправляет результаты по пачкам по одной в порядке их поступления
+        (до получения ``None`` при остановке).
+        """
+        while True:
+            pack = await self._ordered_packs.get()
+            if pack is None:
+                break
+            try:
+                await self._send_codes(pack)
+            except Exception as e:
+                logger.error(f"Ошибка при отправке результата по пачке {pack}: {e!r}")
+
     async def _update_workmode(self) -> None:
         """
         Запрашивает режим работы с сервера и сохраняет его.
@@ -98,6 +192,8 @@ class AsyncMainWorker(BaseAsyncWorker):
             logger.info('Режим работы обновлён: '
                         f'{self._workmode!r}->{new_workmode!r}')
             self._workmode = new_workmode
+            if self._shared_state is not None:
+                self._shared_state.workmode = new_workmode
 
     async def _update_codes_count(self) -> None:
         """
@@ -109,6 +205,8 @@ class AsyncMainWorker(BaseAsyncWorker):
             logger.info('Кол-во кодов обновлено: '
                         f'{new_codes_count!r}->{self._expected_codes_count!r}')
             self._expected_codes_count = new_codes_count
+            if self._shared_state is not None:
+                self._shared_state.expected_codes_count = new_codes_count
 
     async def _send_codes(self, pack: ValidatedPack) -> None:
         """
@@ -120,3 +218,5 @@ class AsyncMainWorker(BaseAsyncWorker):
             await self._api.notify_about_bad_pack(pack)
         else:
             logger.error(f"Неподдерживаемый результат обработки: {pack}")
+            return
+        self._latency_stats.add(pack.trace)
@@ -0,0 +1,22 @@
+"""
+Сведения о ресурсах, занятых процессом.
+"""
+import resource
+import sys
+
+__all__ = ['get_peak_rss_mb', 'HEAVY_MODULES', 'get_loaded_heavy_modules']
+
+HEAVY_MODULES = ('tensorflow', 'tflite_runtime', 'skimage', 'pysnmp')
+"""Тяжёлые модули, которые должны импортироваться только при выборе использующего их компонента"""
+
+
+def get_peak_rss_mb() -> float:
+    """Пиковый размер резидентной памяти процесса (МБ)"""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # в macOS - байты, в Linux - килобайты
+    return peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def get_loaded_heavy_modules() -> list[str]:
+    """Тяжёлые модули, уже импортированные в текущем процессе"""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
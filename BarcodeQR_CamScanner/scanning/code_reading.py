@@ -1,36 +1,242 @@
 """
 Инструментарий для чтения QR- и штрихкодов с изображений.
 """
+import threading
+import time
 from collections import defaultdict
+from dataclasses import dataclass
 from enum import Enum
-from typing import Union
+from typing import Optional, Sequence, Union
 
 import cv2
 import numpy as np
-from pyzbar import pyzbar
+from loguru import logger
 
+from .decoders import BaseCodesDecoder, CodeType, DecodedCode, PyzbarDecoder
 from .image_utils import get_resized
 
-__all__ = ['CodeType', 'get_codes_from_image']
+__all__ = [
+    'CodeType', 'DecodedCode', 'PreprocessVariant', 'VariantStats', 'DecodeCascade',
+    'get_codes_from_image', 'read_codes', 'group_codes', 'find_code_regions',
+]
 
+_Rect = tuple[int, int, int, int]
 
-class CodeType(str, Enum):
+
+class PreprocessVariant(str, Enum):
+    """
+    Вариант предобработки изображения перед чтением кодов
+    """
+    FIXED = 'fixed'
+    """Бинаризация с фиксированным порогом 100"""
+    RAW = 'raw'
+    """Изображение в оттенках серого без изменений"""
+    OTSU = 'otsu'
+    """Бинаризация с порогом Оцу"""
+    ADAPTIVE = 'adaptive'
+    """Адаптивная бинаризация по окрестности каждого пикселя"""
+    UPSCALED = 'upscaled'
+    """Увеличение изображения и бинаризация с порогом Оцу"""
+
+
+@dataclass
+class VariantStats:
+    """
+    Статистика варианта предобработки в каскаде.
+
+    Attributes:
+        attempts: кол-во кадров, к которым применялся вариант
+        hits: кол-во кадров, на которых вариант нашёл новые коды
+        codes: кол-во найденных вариантом новых кодов
+    """
+    attempts: int = 0
+    hits: int = 0
+    codes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / max(self.attempts, 1)
+
+    def __str__(self) -> str:
+        return f"{self.hits}/{self.attempts} ({self.hit_rate:.1%}), кодов: {self.codes}"
+
+
+class DecodeCascade:
     """
-    Тип кода, считанного камерой
+    Каскад чтения кодов: варианты предобработки применяются по порядку
+    (от самого дешёвого), пока не будут найдены все ожидаемые коды.
+
+    Каждый следующий вариант читает только то, что ещё не прочитано:
+    области уже найденных кодов закрашиваются белым.
+    Уже известные коды (``known``) не учитываются при проверке, найдено ли всё ожидаемое:
+    каскад останавливается, только когда найдено достаточно новых кодов.
+
+    Parameters:
+        variants: названия вариантов предобработки (см. ``PreprocessVariant``) в порядке применения
+        expected_count: сколько новых QR-кодов и штрихкодов ожидается на кадре,
+            если ``decode`` не передано ожидаемое кол-во
+        adaptive_block_size: размер окрестности для ``adaptive`` (нечётное число)
+        upscale: множитель увеличения для ``upscaled``
+        stats_interval_sec: периодичность логгирования статистики (0 - не логгировать)
+        decoder: бэкенд чтения кодов (по умолчанию - ``pyzbar``)
+
+    Attributes:
+        stats: статистика попаданий для каждого варианта
     """
-    QR_CODE = 'QRCODE'
-    BARCODE = 'EAN13'
+    stats: dict[str, VariantStats]
+
+    def __init__(
+            self,
+            variants: Sequence[str] = (PreprocessVariant.FIXED, ),
+            *,
+            expected_count: int = 1,
+            adaptive_block_size: int = 31,
+            upscale: float = 2.0,
+            stats_interval_sec: float = 0,
+            decoder: BaseCodesDecoder = None,
+    ):
+        self._decoder = PyzbarDecoder() if decoder is None else decoder
+        self._VARIANTS = tuple(PreprocessVariant(variant) for variant in variants)
+        self._EXPECTED_COUNT = expected_count
+        self._ADAPTIVE_BLOCK_SIZE = adaptive_block_size | 1
+        self._UPSCALE = upscale
+        self._STATS_INTERVAL_SEC = stats_interval_sec
+        self._stats_logged_time = time.monotonic()
+        self._stats_lock = threading.Lock()
+        self.stats = {variant.value: VariantStats() for variant in self._VARIANTS}
+
+    def decode(
+            self,
+            crops: list[np.ndarray],
+            known: Sequence[DecodedCode] = (),
+            offsets: Sequence[tuple[int, int]] = None,
+            expected: Optional[tuple[int, int]] = None,
+    ) -> list[DecodedCode]:
+        """
+        Читает коды с одноканальных изображений (кадра или его областей).
+        Изображения не изменяются.
+
+        Args:
+            crops: изображения для чтения
+            known: уже прочитанные коды, которые видны на изображениях (их области
+                должны быть закрашены заранее). Повторно не возвращаются.
+            offsets: смещения ``(x, y)`` изображений (областей) относительно всего кадра
+            expected: сколько ещё не прочитанных QR-кодов и штрихкодов нужно найти
+                (по умолчанию - ``expected_count`` каждого типа)
+
+        Returns:
+            новые коды без повторов в порядке чтения с положением на кадре
+        """
+        offsets = [(0, 0)] * len(crops) if offsets is None else offsets
+        expected = (self._EXPECTED_COUNT, self._EXPECTED_COUNT) if expected is None else expected
+        found: list[DecodedCode] = []
+        found_keys = [(code.type, code.data) for code in known]
+        masked_rects: list[list[_Rect]] = [[] for _ in crops]
+        for variant in self._VARIANTS:
+            if self._is_satisfied(found, expected):
+                break
+            new_codes_count = 0
+            for crop, rects, (offset_x, offset_y) in zip(crops, masked_rects, offsets):
+                prepared, scale = self._prepare(variant, crop, rects)
+                for decoded in self._decoder.decode(prepared):
+                    x, y, w, h = (int(v / scale) for v in decoded.rect)
+                    rects.append((x, y, w, h))
+                    key = (decoded.type, decoded.data)
+                    if key not in found_keys:
+                        found_keys.append(key)
+                        found.append(DecodedCode(*key, (x + offset_x, y + offset_y, w, h)))
+                        new_codes_count += 1
+            self._update_stats(variant, new_codes_count)
+        return found
+
+    def _prepare(
+            self,
+            variant: PreprocessVariant,
+            grayscaled: np.ndarray,
+            masked_rects: list[_Rect],
+    ) -> tuple[np.ndarray, float]:
+        """
+        Применяет вариант предобработки, предварительно закрашивая уже прочитанные области.
+
+        Returns:
+            подготовленное изображение и множитель его размера относительно исходного
+        """
+        if masked_rects:
+            grayscaled = grayscaled.copy()
+            for x, y, w, h in masked_rects:
+                grayscaled[max(y, 0):y + h, max(x, 0):x + w] = 255
+
+        if variant is PreprocessVariant.FIXED:
+            return cv2.threshold(grayscaled, 100, 255, cv2.THRESH_BINARY)[1], 1.0
+        if variant is PreprocessVariant.RAW:
+            return grayscaled, 1.0
+        if variant is PreprocessVariant.OTSU:
+            return cv2.threshold(grayscaled, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1], 1.0
+        if variant is PreprocessVariant.ADAPTIVE:
+            return cv2.adaptiveThreshold(
+                grayscaled, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                self._ADAPTIVE_BLOCK_SIZE, 10,
+            ), 1.0
+        upscaled = cv2.resize(grayscaled, None, fx=self._UPSCALE, fy=self._UPSCALE,
+                              interpolation=cv2.INTER_CUBIC)
+        cv2.threshold(upscaled, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU, upscaled)
+        return upscaled, self._UPSCALE
+
+    @staticmethod
+    def _is_satisfied(found: Sequence[DecodedCode], expected: tuple[int, int]) -> bool:
+        """Найдены ли все ожидаемые новые QR-коды и штрихкоды"""
+        qr_count = sum(code.type == CodeType.QR_CODE for code in found)
+        barcode_count = sum(code.type == CodeType.BARCODE and len(code.data) >= 13 for code in found)
+        expected_qr_count, expected_barcode_count = expected
+        return qr_count >= expected_qr_count and barcode_count >= expected_barcode_count
+
+    def _update_stats(self, variant: PreprocessVariant, new_codes_count: int) -> None:
+        with self._stats_lock:
+            stats = self.stats[variant.value]
+            stats.attempts += 1
+            stats.hits += new_codes_count > 0
+            stats.codes += new_codes_count
+
+            now = time.monotonic()
+            if self._STATS_INTERVAL_SEC > 0 and now - self._stats_logged_time > self._STATS_INTERVAL_SEC:
+                self._stats_logged_time = now
+                logger.info("Статистика каскада чтения кодов: " + ", ".join(
+                    f"{name}: {variant_stats}" for name, variant_stats in self.stats.items()))
+
+
+_default_cascade = None
+
+
+def _get_default_cascade() -> DecodeCascade:
+    """Каскад по умолчанию (создаётся при первом использовании)"""
+    global _default_cascade
+    if _default_cascade is None:
+        _default_cascade = DecodeCascade()
+    return _default_cascade
 
 
 def get_codes_from_image(
         image: np.ndarray,
         sizer: float = None,
+        *,
+        localize: bool = False,
+        padding: float = 0.15,
+        cascade: DecodeCascade = None,
 ) -> defaultdict[Union[str, CodeType], list[str]]:
     """
     Возращает QR-коды и штрих-коды прочитанные с данного изображения.
 
     Без повторений (хотя их никогда и нет).
 
+    Args:
+        image: BGR-изображение
+        sizer: множитель размера изображения перед чтением
+        localize: читать коды только в областях, похожих на коды (см. ``find_code_regions``).
+            Если таких областей нет или в них ничего не прочитано, то читается всё изображение.
+        padding: отступ вокруг найденных областей (доля от размера области)
+        cascade: варианты предобработки изображения перед чтением
+            (по умолчанию - бинаризация с фиксированным порогом)
+
     Returns:
         codes: словарь с штрих и QR-кодами
 
@@ -38,23 +244,166 @@ def get_codes_from_image(
         >>> get_codes_from_image(image)
         { 'QRCODE': ['some_text_data'], 'EAN13': ['12341234'], }
     """
-    codes: defaultdict[str, list[str]] = defaultdict(list)
+    decoded_codes = read_codes(image, sizer, localize=localize, padding=padding, cascade=cascade)
+    return group_codes(decoded_codes)
 
-    resized = image if sizer is None else get_resized(image, sizer=sizer)
 
-    grayscaled: np.ndarray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
-    cv2.threshold(grayscaled, 100, 255, cv2.THRESH_BINARY, grayscaled)
-
-    decoded_values = [decoded for decoded in pyzbar.decode(grayscaled)
-                      if decoded.data != b'']
+def group_codes(decoded_codes: Sequence[DecodedCode]) -> defaultdict[Union[str, CodeType], list[str]]:
+    """
+    Группирует прочитанные коды по типу, отбрасывая повторы и слишком короткие штрихкоды.
+    """
+    codes: defaultdict[str, list[str]] = defaultdict(list)
 
-    for decoded in decoded_values:
-        code_data: str = bytes.decode(decoded.data, encoding='utf-8', errors='ignore')
-        if code_data in codes[decoded.type]:
+    for decoded in decoded_codes:
+        if decoded.data in codes[decoded.type]:
             continue
-        codes[decoded.type].append(code_data)
+        codes[decoded.type].append(decoded.data)
 
     # TODO: уточнить насколько актуальны эти телодвижения
     codes[CodeType.BARCODE] = [code for code in codes[CodeType.BARCODE]
                                if len(code) >= 13]
     return codes
+
+
+def read_codes(
+        image: np.ndarray,
+        sizer: float = None,
+        *,
+        localize: bool = False,
+        padding: float = 0.15,
+        cascade: DecodeCascade = None,
+        known: Sequence[DecodedCode] = (),
+        expected: Optional[tuple[int, int]] = None,
+) -> list[DecodedCode]:
+    """
+    Читает коды с изображения вместе с их положением на нём.
+
+    Аргументы совпадают с ``get_codes_from_image``, кроме:
+        known: уже прочитанные коды с их положением на данном изображении.
+            Их области не читаются повторно.
+        expected: сколько ещё не прочитанных QR-кодов и штрихкодов нужно найти (см. ``DecodeCascade.decode``)
+
+    Returns:
+        новые прочитанные коды с положением на исходном (не масштабированном) изображении
+    """
+    cascade = _get_default_cascade() if cascade is None else cascade
+
+    resized = image if sizer is None else get_resized(image, sizer=sizer)
+    scale = 1.0 if sizer is None else sizer
+
+    grayscaled: np.ndarray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+    for code in known:
+        x, y, w, h = (int(v * scale) for v in code.rect)
+        grayscaled[max(y, 0):y + h, max(x, 0):x + w] = 255
+
+    regions = find_code_regions(grayscaled, padding=padding) if localize else []
+    decoded_codes = []
+    if regions:
+        crops = [grayscaled[y:y + h, x:x + w] for x, y, w, h in regions]
+        offsets = [(x, y) for x, y, _, _ in regions]
+        decoded_codes = cascade.decode(crops, known, offsets, expected)
+    if not decoded_codes:
+        # областей нет, либо они оказались ложными - читаем весь кадр
+        decoded_codes = cascade.decode([grayscaled], known, None, expected)
+    if sizer is not None:
+        decoded_codes = [code._replace(rect=tuple(int(v / scale) for v in code.rect))
+                         for code in decoded_codes]
+    return decoded_codes
+
+
+def find_code_regions(grayscaled: np.ndarray, *, padding: float = 0.15) -> list[_Rect]:
+    """
+    Ищет на изображении области, в которых вероятно находятся коды:
+    квадраты с вложенными квадратами (поисковые узоры QR-кодов)
+    и области с сильным горизонтальным градиентом (штрихкоды).
+
+    Использует только дешёвую морфологию и контуры ``cv2``.
+
+    Args:
+        grayscaled: одноканальное изображение
+        padding: отступ вокруг найденных областей (доля от размера области)
+
+    Returns:
+        непересекающиеся прямоугольники ``(x, y, w, h)`` с отступами
+    """
+    height, width = grayscaled.shape[:2]
+    min_side = max(8, min(height, width) // 50)
+
+    rects = _find_qr_finder_patterns(grayscaled, min_side=min_side)
+    rects += _find_barcode_like_regions(grayscaled, min_side=min_side)
+
+    padded = []
+    for x, y, w, h in rects:
+        pad_x, pad_y = int(w * padding), int(h * padding)
+        x1, y1 = max(x - pad_x, 0), max(y - pad_y, 0)
+        x2, y2 = min(x + w + pad_x, width), min(y + h + pad_y, height)
+        padded.append((x1, y1, x2 - x1, y2 - y1))
+    return _merge_overlapping(padded)
+
+
+def _find_qr_finder_patterns(grayscaled: np.ndarray, *, min_side: int) -> list[_Rect]:
+    """
+    Ищет поисковые узоры QR-кодов (квадрат в квадрате в квадрате).
+    Каждый узор расширяется до размера QR-кода, который мог бы его содержать.
+    """
+    _, binary = cv2.threshold(grayscaled, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    contours, hierarchy = cv2.findContours(binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return []
+    hierarchy = hierarchy[0]
+
+    rects = []
+    for i, contour in enumerate(contours):
+        child = hierarchy[i][2]
+        if child < 0 or hierarchy[child][2] < 0:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        if min(w, h) < min_side or not 0.7 < w / h < 1.4:
+            continue
+        # поисковый узор - 7 модулей, а QR-код - от 21 модуля
+        rects.append((x - 2 * w, y - 2 * h, 5 * w, 5 * h))
+    return rects
+
+
+def _find_barcode_like_regions(grayscaled: np.ndarray, *, min_side: int) -> list[_Rect]:
+    """
+    Ищет области с вертикальными штрихами: сильный градиент по горизонтали
+    и слабый по вертикали, замкнутые морфологией в сплошные пятна.
+    """
+    grad_x = cv2.Sobel(grayscaled, cv2.CV_16S, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(grayscaled, cv2.CV_16S, 0, 1, ksize=3)
+    gradient = cv2.convertScaleAbs(cv2.subtract(cv2.convertScaleAbs(grad_x), cv2.convertScaleAbs(grad_y)))
+    gradient = cv2.blur(gradient, (9, 9))
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (21, 7))
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    binary = cv2.erode(binary, None, iterations=4)
+    binary = cv2.dilate(binary, None, iterations=4)
+
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    rects = [cv2.boundingRect(contour) for contour in contours]
+    return [rect for rect in rects if min(rect[2:]) >= min_side]
+
+
+def _merge_overlapping(rects: list[_Rect]) -> list[_Rect]:
+    """
+    Объединяет пересекающиеся прямоугольники в описывающие их прямоугольники
+    """
+    merged = list(rects)
+    is_changed = True
+    while is_changed:
+        is_changed = False
+        result = []
+        for x, y, w, h in merged:
+            for i, (mx, my, mw, mh) in enumerate(result):
+                if x < mx + mw and mx < x + w and y < my + mh and my < y + h:
+                    x1, y1 = min(x, mx), min(y, my)
+                    x2, y2 = max(x + w, mx + mw), max(y + h, my + mh)
+                    result[i] = (x1, y1, x2 - x1, y2 - y1)
+                    is_changed = True
+                    break
+            else:
+                result.append((x, y, w, h))
+        merged = result
+    return merged
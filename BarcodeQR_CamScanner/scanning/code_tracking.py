@@ -0,0 +1,160 @@
+"""
+Отслеживание уже прочитанных кодов между кадрами одной пачки.
+"""
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+
+from .code_reading import DecodedCode
+
+__all__ = ['CodeTracker']
+
+
+class CodeTracker:
+    """
+    Запоминает, где на кадре находились прочитанные коды, и следит за ними на следующих кадрах,
+    чтобы области уже прочитанных кодов не читались повторно.
+
+    Пачка на конвейере движется целиком, поэтому движение оценивается одним сдвигом
+    между соседними кадрами (``cv2.phaseCorrelate`` по уменьшенным копиям).
+    Сдвиг ищется только в области, которая изменилась между кадрами: иначе неподвижный
+    фон, занимающий большую часть кадра, давал бы сдвиг около нуля при движущейся пачке,
+    и области прочитанных кодов оставались бы на месте, закрывая новые коды.
+    Для каждого кадра хранится накопленный сдвиг от начала пачки, поэтому положение
+    кода, прочитанного на любом из предыдущих кадров, пересчитывается на текущий кадр,
+    даже если результат чтения пришёл с опозданием (при чтении в несколько потоков).
+
+    Если сдвиг оценить не удалось, то все прочитанные ранее коды забываются.
+
+    Parameters:
+        enabled: отслеживать ли коды (иначе ``get_visible`` всегда возвращает пустой список)
+        thumbnail_width: ширина уменьшенной копии кадра для оценки движения
+        min_response: минимальная уверенность ``cv2.phaseCorrelate`` (от 0.0 до 1.0)
+        margin: запас вокруг области кода (доля от размера), покрывающий ошибку оценки движения
+    """
+    _MOTION_THRESHOLD = 12
+    """Минимальное изменение яркости пикселя уменьшенной копии, считающееся движением"""
+    _MIN_MOTION_SIDE = 8
+    """Минимальный размер изменившейся области (в пикселях уменьшенной копии) для оценки сдвига"""
+    _MOTION_PADDING = 8
+    """Отступ вокруг изменившейся области, чтобы окно Ханнинга не гасило её края"""
+    _offsets: list[Optional[tuple[float, float]]]
+    _tracked: list[tuple[int, DecodedCode]]
+
+    def __init__(
+            self,
+            *,
+            enabled: bool = False,
+            thumbnail_width: int = 160,
+            min_response: float = 0.1,
+            margin: float = 0.1,
+    ):
+        self._ENABLED = enabled
+        self._THUMBNAIL_WIDTH = thumbnail_width
+        self._MIN_RESPONSE = min_response
+        self._MARGIN = margin
+        self._window = None
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Забывает все коды и движение (вызывается в начале каждой пачки)
+        """
+        self._offsets = []
+        self._segment_start = 0
+        self._tracked = []
+        self._last_thumbnail = None
+
+    def advance(self, image: np.ndarray) -> int:
+        """
+        Оценивает сдвиг нового кадра относительно предыдущего.
+
+        Returns:
+            номер кадра в пачке, по которому получают и добавляют коды этого кадра
+        """
+        frame_index = len(self._offsets)
+        if not self._ENABLED:
+            self._offsets.append(None)
+            return frame_index
+
+        height, width = image.shape[:2]
+        scale = width / self._THUMBNAIL_WIDTH
+        thumbnail_size = (self._THUMBNAIL_WIDTH, max(1, int(height / scale)))
+        thumbnail = cv2.resize(image, thumbnail_size, interpolation=cv2.INTER_AREA)
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        thumbnail = thumbnail.astype(np.float32)
+
+        if self._last_thumbnail is None or self._last_thumbnail.shape != thumbnail.shape:
+            self._segment_start = frame_index
+            self._offsets.append((0.0, 0.0))
+        else:
+            (dx, dy), response = self._estimate_shift(self._last_thumbnail, thumbnail)
+            if response < self._MIN_RESPONSE:
+                # движение не определено - прочитанные ранее коды больше нельзя найти
+                self._segment_start = frame_index
+                self._offsets.append((0.0, 0.0))
+            else:
+                last_x, last_y = self._offsets[-1]
+                self._offsets.append((last_x + dx * scale, last_y + dy * scale))
+        self._last_thumbnail = thumbnail
+        return frame_index
+
+    def _estimate_shift(
+            self,
+            last_thumbnail: np.ndarray,
+            thumbnail: np.ndarray,
+    ) -> tuple[tuple[float, float], float]:
+        """
+        Оценивает сдвиг по области, изменившейся между уменьшенными копиями кадров.
+
+        Returns:
+            сдвиг ``(dx, dy)`` в пикселях уменьшенной копии и уверенность оценки
+        """
+        moved = cv2.absdiff(last_thumbnail, thumbnail) > self._MOTION_THRESHOLD
+        moved = cv2.morphologyEx(moved.astype(np.uint8), cv2.MORPH_OPEN, None)
+        x, y, w, h = cv2.boundingRect(moved)
+        if min(w, h) < self._MIN_MOTION_SIDE:
+            # ничего заметно не сдвинулось
+            return (0.0, 0.0), 1.0
+        height, width = thumbnail.shape
+        x1, y1 = max(x - self._MOTION_PADDING, 0), max(y - self._MOTION_PADDING, 0)
+        x2, y2 = min(x + w + self._MOTION_PADDING, width), min(y + h + self._MOTION_PADDING, height)
+        if self._window is None or self._window.shape != (y2 - y1, x2 - x1):
+            self._window = cv2.createHanningWindow((x2 - x1, y2 - y1), cv2.CV_32F)
+        return cv2.phaseCorrelate(last_thumbnail[y1:y2, x1:x2], thumbnail[y1:y2, x1:x2], self._window)
+
+    def add(self, frame_index: int, codes: Sequence[DecodedCode]) -> None:
+        """
+        Запоминает коды, прочитанные с кадра ``frame_index``
+        """
+        if not self._ENABLED or frame_index < self._segment_start:
+            return
+        self._tracked += [(frame_index, code) for code in codes]
+
+    def get_visible(self, frame_index: int, image_shape: Sequence[int]) -> list[DecodedCode]:
+        """
+        Возвращает прочитанные коды с их положением на кадре ``frame_index``.
+        Коды, ушедшие за пределы кадра, не возвращаются.
+        """
+        if not self._ENABLED or frame_index < self._segment_start:
+            return []
+
+        height, width = image_shape[:2]
+        current_x, current_y = self._offsets[frame_index]
+        visible = []
+        for code_frame_index, code in self._tracked:
+            if code_frame_index < self._segment_start:
+                continue
+            code_x, code_y = self._offsets[code_frame_index]
+            x, y, w, h = code.rect
+            x, y = x + current_x - code_x, y + current_y - code_y
+            if x < 0 or y < 0 or x + w > width or y + h > height:
+                # код частично или полностью вне кадра
+                continue
+            margin_x, margin_y = w * self._MARGIN, h * self._MARGIN
+            x1, y1 = max(int(x - margin_x), 0), max(int(y - margin_y), 0)
+            x2, y2 = min(int(x + w + margin_x), width), min(int(y + h + margin_y), height)
+            visible.append(code._replace(rect=(x1, y1, x2 - x1, y2 - y1)))
+        return visible
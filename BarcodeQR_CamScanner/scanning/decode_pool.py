@@ -0,0 +1,133 @@
+"""
+Пул потоков для параллельного чтения кодов с нескольких кадров одной пачки.
+"""
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Optional, Sequence, Union
+
+import numpy as np
+
+from .code_reading import CodeType, DecodeCascade, DecodedCode, group_codes, read_codes
+
+__all__ = ['CodesDecodePool', 'DecodedFrame']
+
+
+@dataclass
+class DecodedFrame:
+    """
+    Результат чтения кодов с одного кадра.
+
+    Attributes:
+        tag: произвольная метка кадра, переданная в ``submit``
+        codes: словарь с штрих и QR-кодами (как у ``get_codes_from_image``)
+        decoded: новые прочитанные коды с их положением на кадре
+        cpu_time_sec: процессорное время, потраченное на чтение
+    """
+    tag: Any = None
+    codes: defaultdict[Union[str, CodeType], list[str]] = field(default_factory=lambda: defaultdict(list))
+    decoded: list[DecodedCode] = field(default_factory=list)
+    cpu_time_sec: float = 0.0
+
+
+class CodesDecodePool:
+    """
+    Читает коды с кадров в нескольких потоках и возвращает результаты
+    строго в порядке добавления кадров.
+
+    ``pyzbar`` и ``cv2`` отпускают GIL, поэтому потоки читают коды параллельно.
+    При ``workers=1`` коды читаются сразу в вызывающем потоке.
+
+    Parameters:
+        workers: кол-во потоков чтения кодов
+        max_pending: максимальное кол-во кадров, ожидающих чтения.
+            При переполнении ``submit`` ждёт чтения самого старого кадра.
+        localize: читать коды только в найденных областях кадра
+            (см. ``code_reading.find_code_regions``)
+        padding: отступ вокруг найденных областей
+        cascade: варианты предобработки кадра перед чтением кодов
+    """
+    _pending: deque[Future]
+
+    def __init__(
+            self,
+            *,
+            workers: int = 1,
+            max_pending: int = 8,
+            localize: bool = False,
+            padding: float = 0.15,
+            cascade: DecodeCascade = None,
+    ):
+        self._read_codes = partial(read_codes, localize=localize, padding=padding, cascade=cascade)
+        self._WORKERS = max(workers, 1)
+        self._MAX_PENDING = max(max_pending, self._WORKERS)
+        self._executor = None
+        if self._WORKERS > 1:
+            self._executor = ThreadPoolExecutor(self._WORKERS, thread_name_prefix='codes-decoder')
+        self._pending = deque()
+        self._ready = deque()
+
+    def submit(
+            self,
+            image: np.ndarray,
+            *,
+            tag: Any = None,
+            known: Sequence[DecodedCode] = (),
+            expected: Optional[tuple[int, int]] = None,
+    ) -> None:
+        """
+        Добавляет кадр на чтение кодов.
+        Кадр не должен изменяться до получения результата.
+
+        Args:
+            image: кадр
+            tag: метка кадра, возвращаемая вместе с результатом
+            known: уже прочитанные коды с их положением на кадре (не читаются повторно)
+            expected: сколько ещё не прочитанных QR-кодов и штрихкодов нужно найти
+        """
+        if self._executor is None:
+            self._ready.append(self._decode(image, tag, known, expected))
+            return
+        if len(self._pending) >= self._MAX_PENDING:
+            self._ready.append(self._pending.popleft().result())
+        self._pending.append(self._executor.submit(self._decode, image, tag, known, expected))
+
+    def _decode(
+            self,
+            image: np.ndarray,
+            tag: Any,
+            known: Sequence[DecodedCode],
+            expected: Optional[tuple[int, int]],
+    ) -> DecodedFrame:
+        start_time = time.thread_time()
+        decoded = self._read_codes(image, known=known, expected=expected)
+        cpu_time_sec = time.thread_time() - start_time
+        return DecodedFrame(tag=tag, codes=group_codes(decoded), decoded=decoded, cpu_time_sec=cpu_time_sec)
+
+    def get_ready(self) -> list[DecodedFrame]:
+        """
+        Возвращает уже прочитанные результаты, не нарушая порядок кадров
+        (результат кадра не вернётся раньше результатов предыдущих кадров).
+        """
+        while self._pending and self._pending[0].done():
+            self._ready.append(self._pending.popleft().result())
+        ready = list(self._ready)
+        self._ready.clear()
+        return ready
+
+    def get_all(self) -> list[DecodedFrame]:
+        """
+        Дожидается чтения всех добавленных кадров и возвращает результаты по порядку.
+        """
+        while self._pending:
+            self._ready.append(self._pending.popleft().result())
+        return self.get_ready()
+
+    def close(self) -> None:
+        """
+        Останавливает потоки чтения
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
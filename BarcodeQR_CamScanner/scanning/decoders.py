@@ -0,0 +1,156 @@
+"""
+Библиотеки (бэкенды) для чтения QR- и штрихкодов с подготовленных изображений.
+"""
+import abc
+import threading
+from enum import Enum
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+__all__ = [
+    'CodeType', 'DecodedCode', 'BaseCodesDecoder',
+    'PyzbarDecoder', 'OpenCVDecoder', 'is_opencv_barcode_available',
+]
+
+_Rect = tuple[int, int, int, int]
+
+
+class CodeType(str, Enum):
+    """
+    Тип кода, считанного камерой
+    """
+    QR_CODE = 'QRCODE'
+    BARCODE = 'EAN13'
+
+
+class DecodedCode(NamedTuple):
+    """
+    Код, прочитанный с изображения, и его положение ``(x, y, w, h)`` на изображении
+    """
+    type: str
+    data: str
+    rect: _Rect
+
+
+class BaseCodesDecoder(metaclass=abc.ABCMeta):
+    """
+    Базовый абстрактный класс для всех бэкендов чтения кодов
+    """
+
+    @abc.abstractmethod
+    def decode(self, grayscaled: np.ndarray) -> list[DecodedCode]:
+        """
+        Читает все коды с одноканального изображения.
+        Может вызываться одновременно из нескольких потоков.
+        """
+
+
+class PyzbarDecoder(BaseCodesDecoder):
+    """
+    Чтение QR- и штрихкодов через ``pyzbar`` (``zbar``)
+    """
+    def __init__(self):
+        # pyzbar при импорте загружает библиотеку zbar - только если выбран этот бэкенд
+        from pyzbar import pyzbar
+        self._pyzbar = pyzbar
+
+    def decode(self, grayscaled: np.ndarray) -> list[DecodedCode]:
+        return [
+            DecodedCode(
+                decoded.type,
+                bytes.decode(decoded.data, encoding='utf-8', errors='ignore'),
+                tuple(decoded.rect),
+            )
+            for decoded in self._pyzbar.decode(grayscaled)
+            if decoded.data != b''
+        ]
+
+
+def _get_barcode_detector_factory():
+    """
+    Возвращает класс детектора штрихкодов OpenCV, если он есть в установленной версии:
+    ``cv2.barcode.BarcodeDetector`` (OpenCV >= 4.8) или ``cv2.barcode_BarcodeDetector`` (contrib)
+    """
+    barcode_module = getattr(cv2, 'barcode', None)
+    factory = getattr(barcode_module, 'BarcodeDetector', None)
+    return factory if factory is not None else getattr(cv2, 'barcode_BarcodeDetector', None)
+
+
+def is_opencv_barcode_available() -> bool:
+    """Есть ли детектор штрихкодов в установленной версии OpenCV"""
+    return _get_barcode_detector_factory() is not None
+
+
+class OpenCVDecoder(BaseCodesDecoder):
+    """
+    Чтение QR-кодов через ``cv2.QRCodeDetector`` (или ``cv2.QRCodeDetectorAruco``)
+    и штрихкодов через детектор штрихкодов OpenCV.
+
+    Детекторы OpenCV не потокобезопасны, поэтому у каждого потока свои экземпляры.
+
+    Parameters:
+        qr_codes: читать QR-коды
+        aruco: использовать ``cv2.QRCodeDetectorAruco`` (OpenCV >= 4.8)
+        barcodes: читать штрихкоды
+    """
+    # типы штрихкодов OpenCV: строки в новых версиях, перечисление в contrib-версиях
+    _BARCODE_TYPES = {'EAN_13': CodeType.BARCODE.value, 2: CodeType.BARCODE.value}
+
+    def __init__(self, *, qr_codes: bool = True, aruco: bool = False, barcodes: bool = True):
+        if aruco and not hasattr(cv2, 'QRCodeDetectorAruco'):
+            raise RuntimeError("cv2.QRCodeDetectorAruco недоступен в установленной версии OpenCV")
+        if barcodes and not is_opencv_barcode_available():
+            raise RuntimeError("Детектор штрихкодов недоступен в установленной версии OpenCV")
+        self._QR_CODES = qr_codes
+        self._ARUCO = aruco
+        self._BARCODES = barcodes
+        self._local = threading.local()
+
+    def decode(self, grayscaled: np.ndarray) -> list[DecodedCode]:
+        decoded = []
+        if self._QR_CODES:
+            decoded += self._decode_qr_codes(grayscaled)
+        if self._BARCODES:
+            decoded += self._decode_barcodes(grayscaled)
+        return decoded
+
+    def _decode_qr_codes(self, grayscaled: np.ndarray) -> list[DecodedCode]:
+        detector = getattr(self._local, 'qr_detector', None)
+        if detector is None:
+            detector = cv2.QRCodeDetectorAruco() if self._ARUCO else cv2.QRCodeDetector()
+            self._local.qr_detector = detector
+
+        is_found, decoded_info, points, _ = detector.detectAndDecodeMulti(grayscaled)
+        if not is_found or points is None:
+            return []
+        return [
+            DecodedCode(CodeType.QR_CODE.value, data, _get_bounding_rect(corners))
+            for data, corners in zip(decoded_info, points)
+            if data
+        ]
+
+    def _decode_barcodes(self, grayscaled: np.ndarray) -> list[DecodedCode]:
+        detector = getattr(self._local, 'barcode_detector', None)
+        if detector is None:
+            detector = _get_barcode_detector_factory()()
+            self._local.barcode_detector = detector
+
+        if hasattr(detector, 'detectAndDecodeWithType'):
+            is_found, decoded_info, decoded_types, points = detector.detectAndDecodeWithType(grayscaled)
+        else:
+            is_found, decoded_info, decoded_types, points = detector.detectAndDecode(grayscaled)
+        if not is_found or points is None:
+            return []
+        return [
+            DecodedCode(self._BARCODE_TYPES.get(code_type, str(code_type)), data,
+                        _get_bounding_rect(corners))
+            for data, code_type, corners in zip(decoded_info, decoded_types, points)
+            if data
+        ]
+
+
+def _get_bounding_rect(corners: np.ndarray) -> _Rect:
+    """Прямоугольник, описывающий углы кода"""
+    return tuple(cv2.boundingRect(np.asarray(corners, dtype=np.float32).reshape(-1, 1, 2)))
@@ -0,0 +1,80 @@
+"""
+Отсев кадров, с которых нет смысла повторно читать коды.
+"""
+import time
+
+import cv2
+import numpy as np
+from loguru import logger
+
+__all__ = ['FrameChangeGate']
+
+
+class FrameChangeGate:
+    """
+    Пропускает на чтение кодов только кадры, заметно отличающиеся от последнего прочитанного.
+
+    Кадры сравниваются по уменьшенным копиям в оттенках серого:
+    если средняя попиксельная разница меньше порога, то кадр считается
+    повтором (например, конвейер стоит) и коды с него не читаются.
+
+    Parameters:
+        threshold: средняя разница яркости (от 0.0 до 1.0), ниже которой кадр пропускается.
+            При 0 пропускаются все кадры.
+        thumbnail_width: ширина уменьшенной копии кадра для сравнения
+        stats_interval_sec: периодичность логгирования статистики (0 - не логгировать)
+
+    Attributes:
+        checked: кол-во проверенных кадров
+        skipped: кол-во кадров, с которых не пришлось читать коды
+    """
+    checked: int
+    skipped: int
+
+    def __init__(self, *, threshold: float = 0.0, thumbnail_width: int = 64, stats_interval_sec: float = 0):
+        self._THRESHOLD = threshold * 255
+        self._THUMBNAIL_WIDTH = thumbnail_width
+        self._STATS_INTERVAL_SEC = stats_interval_sec
+        self._stats_logged_time = time.monotonic()
+        self._last_thumbnail = None
+        self.checked = 0
+        self.skipped = 0
+
+    def is_changed(self, image: np.ndarray) -> bool:
+        """
+        Проверяет, отличается ли кадр от последнего пропущенного на чтение.
+        Если отличается, то кадр запоминается как последний прочитанный.
+        """
+        if self._THRESHOLD <= 0:
+            return True
+
+        self.checked += 1
+        self._log_stats()
+
+        height, width = image.shape[:2]
+        thumbnail_size = (self._THUMBNAIL_WIDTH, max(1, height * self._THUMBNAIL_WIDTH // width))
+        thumbnail = cv2.resize(image, thumbnail_size, interpolation=cv2.INTER_AREA)
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+
+        if self._last_thumbnail is not None and self._last_thumbnail.shape == thumbnail.shape:
+            difference = cv2.norm(thumbnail, self._last_thumbnail, cv2.NORM_L1) / thumbnail.size
+            if difference < self._THRESHOLD:
+                self.skipped += 1
+                return False
+
+        self._last_thumbnail = thumbnail
+        return True
+
+    def reset(self) -> None:
+        """
+        Забывает последний прочитанный кадр (следующий кадр будет прочитан в любом случае)
+        """
+        self._last_thumbnail = None
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if self._STATS_INTERVAL_SEC > 0 and now - self._stats_logged_time > self._STATS_INTERVAL_SEC:
+            self._stats_logged_time = now
+            logger.info(f"Пропущено чтений кодов с неизменившихся кадров: "
+                        f"{self.skipped} из {self.checked}")
@@ -0,0 +1,65 @@
+"""
+Хранение последних кадров перед появлением пачки.
+"""
+from typing import Optional
+
+import cv2
+import numpy as np
+
+__all__ = ['FrameLookback']
+
+
+class FrameLookback:
+    """
+    Кольцевой буффер последних ``size`` уменьшенных кадров, на которых пачка ещё не была распознана.
+
+    Распознавателю нужно несколько кадров подряд, чтобы заметить пачку, поэтому первые
+    кадры пачки (часто с лучшим видом кодов) иначе не читаются и не логгируются.
+    При появлении пачки кадры из буффера отдаются на чтение и логгирование.
+
+    Кадры уменьшаются сразу в заранее выделенный массив, поэтому на каждый кадр
+    не выделяется память. Буффер очищается при каждом ``pop_all``.
+
+    ``size`` должен быть меньше кол-ва кадров между пачками, иначе в буффер
+    попадут кадры с уходящей предыдущей пачкой.
+
+    Parameters:
+        size: кол-во хранимых кадров (0 - не хранить)
+        sizer: во сколько раз уменьшать кадры (как перед чтением кодов)
+    """
+    _frames: Optional[np.ndarray]
+
+    def __init__(self, *, size: int = 0, sizer: float = 0.5):
+        self._SIZE = size
+        self._SIZER = sizer
+        self._frames = None
+        self._next_index = 0
+        self._count = 0
+
+    def push(self, image: np.ndarray) -> None:
+        """
+        Запоминает уменьшенную копию кадра, вытесняя самый старый
+        """
+        if self._SIZE <= 0:
+            return
+        height, width = (int(v * self._SIZER) for v in image.shape[:2])
+        shape = (self._SIZE, height, width) + image.shape[2:]
+        if self._frames is None or self._frames.shape != shape or self._frames.dtype != image.dtype:
+            self._frames = np.empty(shape, dtype=image.dtype)
+            self._next_index = 0
+            self._count = 0
+
+        cv2.resize(image, (width, height), dst=self._frames[self._next_index])
+        self._next_index = (self._next_index + 1) % self._SIZE
+        self._count = min(self._count + 1, self._SIZE)
+
+    def pop_all(self) -> list[np.ndarray]:
+        """
+        Возвращает копии хранимых кадров (от старых к новым) и очищает буффер
+        """
+        if self._count == 0:
+            return []
+        first_index = (self._next_index - self._count) % self._SIZE
+        frames = [self._frames[(first_index + i) % self._SIZE].copy() for i in range(self._count)]
+        self._count = 0
+        return frames
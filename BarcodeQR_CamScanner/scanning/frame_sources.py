@@ -0,0 +1,320 @@
+"""
+Источники кадров для обработки видео.
+
+Читают изображения из видеопотока (файла, url'а камеры и т.п.)
+и отдают их циклу обработки из ``video_processing``.
+"""
+import abc
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Iterable, Optional
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from .shared_frames import SharedFrameRing
+
+__all__ = [
+    'DropPolicy', 'FrameSourceStats', 'BaseFrameSource',
+    'DirectFrameSource', 'ThreadedFrameSource', 'SharedMemoryFrameSource',
+]
+
+
+class DropPolicy(str, Enum):
+    """
+    Политика отбрасывания кадров, которые не успевает обработать цикл обработки
+    """
+    LATEST = 'latest'
+    """Хранить только самый новый кадр"""
+    FIFO = 'fifo'
+    """Хранить ограниченную очередь кадров, отбрасывая самые старые"""
+
+
+@dataclass
+class FrameSourceStats:
+    """
+    Счётчики источника кадров.
+
+    Задержка - время от захвата кадра до его передачи на обработку.
+    """
+    grabbed: int = 0
+    processed: int = 0
+    dropped: int = 0
+    stale: int = 0
+    latency_sum_sec: float = 0.0
+    latency_max_sec: float = 0.0
+
+    @property
+    def latency_avg_sec(self) -> float:
+        return self.latency_sum_sec / max(self.processed, 1)
+
+    def add_latency(self, latency_sec: float, stale_after_sec: float) -> None:
+        """Учитывает задержку очередного переданного на обработку кадра"""
+        self.processed += 1
+        self.latency_sum_sec += latency_sec
+        self.latency_max_sec = max(self.latency_max_sec, latency_sec)
+        if latency_sec > stale_after_sec:
+            self.stale += 1
+
+    def __str__(self) -> str:
+        return (f"захвачено: {self.grabbed}, обработано: {self.processed}, "
+                f"отброшено: {self.dropped}, устаревших: {self.stale}, "
+                f"задержка ср./макс.: {self.latency_avg_sec * 1000:.1f}/"
+                f"{self.latency_max_sec * 1000:.1f} мс")
+
+
+class BaseFrameSource(metaclass=abc.ABCMeta):
+    """
+    Базовый класс для всех источников кадров.
+
+    Attributes:
+        stats: счётчики захваченных, отброшенных и устаревших кадров
+    """
+    stats: FrameSourceStats
+
+    def __init__(self, *, stale_after_sec: float = 0.5, stats_interval_sec: float = 0):
+        self.stats = FrameSourceStats()
+        self._STALE_AFTER_SEC = stale_after_sec
+        self._STATS_INTERVAL_SEC = stats_interval_sec
+        self._stats_logged_time = time.monotonic()
+
+    @abc.abstractmethod
+    def get_frames(self, video_url: str, *, auto_reconnect: bool) -> Iterable[np.ndarray]:
+        """
+        Генератор, возвращающий последовательность изображений из видео.
+        Если ``auto_reconnect=True``, то при потере соединения или окончании
+        видеофайла переподключается к источнику.
+        """
+
+    def _on_frame_passed(self, grab_time: float) -> None:
+        """
+        Учитывает задержку кадра, захваченного в момент ``grab_time`` (``time.monotonic``),
+        и при необходимости логгирует накопленную статистику.
+        """
+        now = time.monotonic()
+        self.stats.add_latency(now - grab_time, self._STALE_AFTER_SEC)
+        if self._STATS_INTERVAL_SEC > 0 and now - self._stats_logged_time > self._STATS_INTERVAL_SEC:
+            self._stats_logged_time = now
+            self._log_stats()
+
+    def _log_stats(self) -> None:
+        """Логгирует накопленную статистику источника"""
+        logger.info(f"Статистика захвата кадров: {self.stats}")
+
+
+class DirectFrameSource(BaseFrameSource):
+    """
+    Источник, читающий кадры в том же потоке, в котором они обрабатываются.
+
+    Пока кадр обрабатывается, новые кадры копятся в буффере ``cv2.VideoCapture``.
+    """
+    def get_frames(self, video_url: str, *, auto_reconnect: bool) -> Iterable[np.ndarray]:
+        cap = cv2.VideoCapture(video_url)
+        try:
+            while True:
+                is_exists, image = cap.read()
+                if not is_exists:
+                    if not auto_reconnect:
+                        break
+
+                    # переподключение
+                    cap.release()
+                    cap.open(video_url)
+                    continue
+
+                self.stats.grabbed += 1
+                self._on_frame_passed(time.monotonic())
+                yield image
+        finally:
+            cap.release()
+
+
+class ThreadedFrameSource(BaseFrameSource):
+    """
+    Источник, читающий кадры в отдельном потоке.
+
+    Поток-захватчик непрерывно вычитывает видео, не давая буфферу ``cv2.VideoCapture``
+    заполняться устаревшими кадрами, а циклу обработки отдаются самые свежие кадры.
+
+    Parameters:
+        drop_policy: ``latest`` - отдавать только последний кадр,
+            ``fifo`` - отдавать кадры по порядку из очереди размера ``buffer_size``
+        buffer_size: размер очереди кадров для ``fifo``
+        stale_after_sec: задержка, после которой кадр считается устаревшим
+        stats_interval_sec: периодичность логгирования статистики (0 - не логгировать)
+    """
+    def __init__(
+            self,
+            *,
+            drop_policy: str = DropPolicy.LATEST,
+            buffer_size: int = 4,
+            stale_after_sec: float = 0.5,
+            stats_interval_sec: float = 0,
+    ):
+        super().__init__(stale_after_sec=stale_after_sec, stats_interval_sec=stats_interval_sec)
+        self._DROP_POLICY = DropPolicy(drop_policy)
+        buffer_size = 1 if self._DROP_POLICY is DropPolicy.LATEST else max(buffer_size, 1)
+        self._buffer: deque[tuple[float, np.ndarray]] = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._is_finished = False
+
+    def get_frames(self, video_url: str, *, auto_reconnect: bool) -> Iterable[np.ndarray]:
+        self._stop_event.clear()
+        self._is_finished = False
+        grabber = threading.Thread(
+            target=self._grab_frames,
+            args=(video_url, auto_reconnect),
+            name='frame-grabber',
+            daemon=True,
+        )
+        grabber.start()
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._buffer or self._is_finished)
+                    if not self._buffer:
+                        break
+                    grab_time, image = self._buffer.popleft()
+                self._on_frame_passed(grab_time)
+                yield image
+        finally:
+            self._stop_event.set()
+            grabber.join()
+
+    def _grab_frames(self, video_url: str, auto_reconnect: bool) -> None:
+        """
+        Метод для запуска в отдельном потоке.
+        Читает кадры и складывает их в буффер, отбрасывая не успевшие обработаться.
+        """
+        cap = cv2.VideoCapture(video_url)
+        try:
+            while not self._stop_event.is_set():
+                is_exists, image = cap.read()
+                if not is_exists:
+                    if not auto_reconnect:
+                        break
+
+                    # переподключение
+                    cap.release()
+                    cap.open(video_url)
+                    continue
+
+                grab_time = time.monotonic()
+                with self._condition:
+                    self.stats.grabbed += 1
+                    if len(self._buffer) == self._buffer.maxlen:
+                        self.stats.dropped += 1
+                    self._buffer.append((grab_time, image))
+                    self._condition.notify()
+        finally:
+            cap.release()
+            with self._condition:
+                self._is_finished = True
+                self._condition.notify()
+
+
+class SharedMemoryFrameSource(BaseFrameSource):
+    """
+    Источник, получающий кадры от отдельного процесса захвата через
+    кольцевой буффер в разделяемой памяти (``SharedFrameRing``).
+
+    Процесс захвата вызывает ``capture_forever`` и никогда не ждёт обработчика,
+    а процесс обработки через ``get_frames`` получает самый свежий кадр
+    прямо из слота буффера без сериализации и копирования.
+
+    Parameters:
+        ring_name: имя блока разделяемой памяти (должно совпадать у захвата и обработчика)
+        slots: кол-во слотов в буффере (не меньше 2)
+        width: ширина кадров в буффере (кадры другого размера масштабируются)
+        height: высота кадров в буффере
+        stale_after_sec: задержка, после которой кадр считается устаревшим
+        stats_interval_sec: периодичность логгирования статистики (0 - не логгировать)
+    """
+    _POLL_INTERVAL_SEC = 0.002
+    _ring: Optional[SharedFrameRing]
+
+    def __init__(
+            self,
+            *,
+            ring_name: str,
+            slots: int = 8,
+            width: int = 1920,
+            height: int = 1080,
+            stale_after_sec: float = 0.5,
+            stats_interval_sec: float = 0,
+    ):
+        super().__init__(stale_after_sec=stale_after_sec, stats_interval_sec=stats_interval_sec)
+        self._RING_NAME = ring_name
+        self._SLOTS = max(slots, 2)
+        self._SHAPE = (height, width, 3)
+        self._ring = None
+
+    def capture_forever(self, video_url: str, *, auto_reconnect: bool) -> None:
+        """
+        Метод для запуска в процессе захвата.
+        Создаёт кольцевой буффер и пишет в него все кадры из видео.
+        """
+        ring = SharedFrameRing(self._RING_NAME, slots=self._SLOTS, shape=self._SHAPE, create=True)
+        frame_size = self._SHAPE[1::-1]
+        try:
+            for image in DirectFrameSource().get_frames(video_url, auto_reconnect=auto_reconnect):
+                grab_time = time.monotonic()
+                slot, frame = ring.get_slot_for_write()
+                if image.shape == frame.shape:
+                    np.copyto(frame, image)
+                else:
+                    cv2.resize(image, frame_size, dst=frame)
+                ring.commit(slot, grab_time)
+        finally:
+            ring.finish()
+            ring.close()
+
+    def get_frames(self, video_url: str, *, auto_reconnect: bool) -> Iterable[np.ndarray]:
+        """
+        Возвращает самые свежие кадры из буффера.
+        Кадр - представление слота буффера, он остаётся неизменным только до запроса следующего.
+
+        ``video_url`` и ``auto_reconnect`` используются процессом захвата.
+        """
+        self._ring = self._attach_ring()
+        last_seq = 0
+        try:
+            while True:
+                acquired = self._ring.acquire_latest()
+                if acquired is None:
+                    if self._ring.is_finished:
+                        break
+                    time.sleep(self._POLL_INTERVAL_SEC)
+                    continue
+                seq, grab_time, image = acquired
+                self.stats.grabbed += seq - last_seq
+                self.stats.dropped += seq - last_seq - 1
+                last_seq = seq
+                self._on_frame_passed(grab_time)
+                yield image
+                if not self._ring.release():
+                    logger.warning(f"Кадр {seq} перезаписан процессом захвата во время обработки")
+        finally:
+            self._ring.release()
+            self._ring.close()
+            self._ring = None
+
+    def _attach_ring(self) -> SharedFrameRing:
+        """
+        Подключается к буфферу, дожидаясь его создания процессом захвата
+        """
+        while True:
+            try:
+                return SharedFrameRing(self._RING_NAME, slots=self._SLOTS, shape=self._SHAPE)
+            except FileNotFoundError:
+                time.sleep(0.5)
+
+    def _log_stats(self) -> None:
+        super()._log_stats()
+        if self._ring is not None:
+            logger.info(f"Статистика буффера кадров: {self._ring.get_stats()}")
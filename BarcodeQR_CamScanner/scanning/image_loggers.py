@@ -9,11 +9,19 @@
 """
 import abc
 import os
+import queue
+import shutil
+import threading
+import time
 from datetime import datetime
+from enum import Enum
+from typing import NamedTuple, Optional
 
 import cv2
 import numpy as np
+from loguru import logger
 
+from . import segments
 from .image_utils import get_resized
 
 
@@ -24,9 +32,10 @@ class BaseImagesLogger(metaclass=abc.ABCMeta):
     с видео на диск для дальнейшего анализа.
     """
     @abc.abstractmethod
-    def add(self, image: np.ndarray) -> None:
+    def add(self, image: np.ndarray, *, score: Optional[float] = None) -> None:
         """
-        Добавляет изображение в буффер лога
+        Добавляет изображение в буффер лога.
+        ``score`` - оценка распознавателя пачек для этого изображения (если есть).
         """
 
     @abc.abstractmethod
@@ -41,13 +50,19 @@ class BaseImagesLogger(metaclass=abc.ABCMeta):
         Удаляет изображения из буффера
         """
 
+    def set_codes(self, codes: list[str]) -> None:
+        """
+        Сообщает коды, прочитанные с пачки, изображения которой в буффере.
+        Вызывается перед ``save``, по умолчанию коды не сохраняются.
+        """
+
 
 class FakeImagesSaver(BaseImagesLogger):
     """
     Логгер изображений, который ничего никогда не логгирует.
     Заглушка для обработки видео без сохранения изображений.
     """
-    def add(self, image: np.ndarray) -> None:
+    def add(self, image: np.ndarray, *, score: Optional[float] = None) -> None:
         pass
 
     def save(self) -> None:
@@ -57,32 +72,420 @@ class FakeImagesSaver(BaseImagesLogger):
         pass
 
 
+_MB = 1024 * 1024
+
+
+class ImageEncoding(str, Enum):
+    """
+    Формат сохраняемых изображений
+    """
+    PNG = 'png'
+    JPEG = 'jpg'
+
+
 class ImagesBufferedSaver(BaseImagesLogger):
     """
     Логгер, сохраняющий изображения с определёнными именами в заданную папку.
     Количество изображений для каждой пачки лимитировано размером буффера.
 
+    Изображения кодируются и пишутся на диск в отдельном потоке, чтобы ``save``
+    не останавливал обработку видео. Если поток записи не успевает и в очереди
+    уже ``queue_size`` пачек, то изображения новой пачки не сохраняются
+    (их кол-во учитывается в ``dropped``).
+
     Использовать с осторожностью! Не следит за переполнением диска!
+
+    Parameters:
+        path: папка для сохранения изображений
+        buff_size: максимальное кол-во изображений с одной пачки
+        sizer: во сколько раз уменьшать изображения перед сохранением
+        encoding: формат изображений (``png`` или ``jpg``)
+        png_compression: степень сжатия PNG (от 0 до 9)
+        jpeg_quality: качество JPEG (от 0 до 100)
+        queue_size: кол-во пачек, ожидающих записи (0 - писать прямо в ``save``)
+        stats_interval_sec: периодичность логгирования статистики записи (0 - не логгировать)
+
+    Attributes:
+        saved: кол-во записанных изображений
+        dropped: кол-во изображений, не записанных из-за переполнения очереди
     """
-    def __init__(self, path: str, *, buff_size: int = 50, sizer: float = 1.0):
+    saved: int
+    dropped: int
+
+    def __init__(
+            self,
+            path: str,
+            *,
+            buff_size: int = 50,
+            sizer: float = 1.0,
+            encoding: str = ImageEncoding.PNG,
+            png_compression: int = 3,
+            jpeg_quality: int = 90,
+            queue_size: int = 4,
+            stats_interval_sec: float = 0,
+    ):
         self._path = path
         self._BUFFER_SIZE = buff_size
         self._buffer = list()
         self._SIZER = sizer
+        self._ENCODING = ImageEncoding(encoding)
+        if self._ENCODING is ImageEncoding.PNG:
+            self._ENCODE_PARAMS = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+        else:
+            self._ENCODE_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self._STATS_INTERVAL_SEC = stats_interval_sec
+        self._stats_logged_time = time.monotonic()
+        self.saved = 0
+        self.dropped = 0
+        self._saved_packs = 0
 
-    def add(self, image: np.ndarray) -> None:
+        self._queue = None
+        if queue_size > 0:
+            self._queue = queue.Queue(maxsize=queue_size)
+            threading.Thread(target=self._write_forever, name='images-writer', daemon=True).start()
+
+    def add(self, image: np.ndarray, *, score: Optional[float] = None) -> None:
         if len(self._buffer) < self._BUFFER_SIZE:
             if self._SIZER is not None:
                 image = get_resized(image, sizer=self._SIZER)
             self._buffer.append(image)
 
     def save(self) -> None:
-        foldername = datetime.now().strftime('%y-%m-%d_%H-%M-%S')
-        folderpath = os.path.join(self._path, foldername)
-        os.makedirs(folderpath, exist_ok=True)
-        for i, image in enumerate(self._buffer, 1):
-            filepath = os.path.join(folderpath, f'{i:03}.png')
-            cv2.imwrite(filepath, image)
+        # буффер передаётся на запись целиком, а для следующей пачки заводится новый
+        images, self._buffer = self._buffer, list()
+        self._hand_off(self._get_folderpath(), images, len(images))
 
     def clear(self) -> None:
         self._buffer.clear()
+
+    def flush(self) -> None:
+        """
+        Ждёт записи всех изображений, переданных потоку записи
+        """
+        if self._queue is not None:
+            self._queue.join()
+
+    def _get_folderpath(self) -> str:
+        """Папка для изображений очередной пачки"""
+        # с миллисекундами и номером пачки, чтобы пачки, сохранённые почти одновременно,
+        # не перезаписывали друг друга (сортировка по имени остаётся сортировкой по времени)
+        self._saved_packs += 1
+        foldername = datetime.now().strftime('%y-%m-%d_%H-%M-%S-%f')[:-3] + f'_{self._saved_packs:06}'
+        return os.path.join(self._path, foldername)
+
+    def _hand_off(self, folderpath: str, pack: object, images_count: int) -> bool:
+        """
+        Передаёт изображения пачки на запись: в поток записи или, если его нет, пишет сразу.
+
+        Returns:
+            ``False``, если изображения не сохранятся из-за переполнения очереди
+        """
+        if self._queue is None:
+            self._write(folderpath, pack)
+            return True
+        try:
+            self._queue.put_nowait((folderpath, pack))
+        except queue.Full:
+            self.dropped += images_count
+            logger.warning(f"Запись изображений не успевает, не сохранено {images_count} изображений "
+                           f"(всего {self.dropped})")
+            return False
+        return True
+
+    def _write_forever(self) -> None:
+        """
+        Метод для запуска в отдельном потоке.
+        Записывает на диск изображения пачек из очереди.
+        """
+        while True:
+            folderpath, pack = self._queue.get()
+            try:
+                self._write(folderpath, pack)
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении изображений в {folderpath!r}")
+                logger.opt(exception=e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, folderpath: str, images: list[np.ndarray]) -> None:
+        os.makedirs(folderpath, exist_ok=True)
+        for i, image in enumerate(images, 1):
+            filepath = os.path.join(folderpath, f'{i:03}.{self._ENCODING.value}')
+            cv2.imwrite(filepath, image, self._ENCODE_PARAMS)
+            self.saved += 1
+        self._log_stats()
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if self._STATS_INTERVAL_SEC <= 0 or now - self._stats_logged_time < self._STATS_INTERVAL_SEC:
+            return
+        self._stats_logged_time = now
+        logger.info(f"Сохранено изображений: {self.saved}, не сохранено из-за переполнения очереди: "
+                    f"{self.dropped}")
+
+
+class SegmentFormat(str, Enum):
+    """
+    Формат сегмента с кадрами пачки
+    """
+    RAW = 'raw'
+    VIDEO = 'video'
+
+
+class SegmentImagesSaver(ImagesBufferedSaver):
+    """
+    Логгер, сохраняющий кадры пачки одним файлом-сегментом в папку ``path``
+    (вместо отдельного файла на каждый кадр).
+
+    ``raw`` - несжатые кадры с заголовком (``.camseg``), в котором хранятся время получения кадров,
+    оценки распознавателя и прочитанные с пачки коды; читается без копирования через
+    ``segments.read_segment`` (в том числе бенчмарком ``benchmarks.replay``).
+    ``video`` - видео ``cv2.VideoWriter`` (``.avi``) с теми же сведениями в ``.json`` рядом.
+
+    Кадры хранятся несжатыми до записи, поэтому кадры текущей и ожидающих записи пачек
+    занимают не больше ``memory_budget_mb``: не поместившиеся кадры не сохраняются.
+
+    Parameters:
+        segment_format: ``raw`` или ``video``
+        fps: частота кадров видео
+        fourcc: кодек видео
+        memory_budget_mb: память под кадры текущей и ожидающих записи пачек
+        (остальные - как у ``ImagesBufferedSaver``)
+    """
+    def __init__(
+            self,
+            path: str,
+            *,
+            segment_format: str = SegmentFormat.RAW,
+            fps: float = 25,
+            fourcc: str = 'MJPG',
+            memory_budget_mb: float = 256,
+            **kwargs,
+    ):
+        super().__init__(path, **kwargs)
+        self._SEGMENT_FORMAT = SegmentFormat(segment_format)
+        self._FPS = fps
+        self._FOURCC = fourcc
+        self._MEMORY_BUDGET_BYTES = int(memory_budget_mb * _MB)
+        self._timestamps: list[float] = []
+        self._scores: list[Optional[float]] = []
+        self._codes: list[str] = []
+        self._lock = threading.Lock()
+        self._pack_bytes = 0
+        self._queued_bytes = 0
+
+    def add(self, image: np.ndarray, *, score: Optional[float] = None) -> None:
+        if len(self._buffer) >= self._BUFFER_SIZE:
+            return
+        if self._SIZER is not None:
+            image = get_resized(image, sizer=self._SIZER)
+        with self._lock:
+            if self._pack_bytes + self._queued_bytes + image.nbytes > self._MEMORY_BUDGET_BYTES:
+                self.dropped += 1
+                return
+        self._pack_bytes += image.nbytes
+        self._buffer.append(image)
+        self._timestamps.append(time.time())
+        self._scores.append(score)
+
+    def set_codes(self, codes: list[str]) -> None:
+        self._codes = list(codes)
+
+    def save(self) -> None:
+        if not self._buffer:
+            return
+        pack = (self._buffer, self._timestamps, self._scores, self._codes)
+        pack_bytes = self._pack_bytes
+        self._buffer, self._timestamps, self._scores, self._codes = [], [], [], []
+        with self._lock:
+            self._pack_bytes = 0
+            self._queued_bytes += pack_bytes
+        if not self._hand_off(self._get_folderpath(), pack, len(pack[0])):
+            with self._lock:
+                self._queued_bytes -= pack_bytes
+
+    def clear(self) -> None:
+        super().clear()
+        self._timestamps.clear()
+        self._scores.clear()
+        self._codes = []
+        self._pack_bytes = 0
+
+    def _write(self, folderpath: str, pack: tuple) -> None:
+        images, timestamps, scores, codes = pack
+        try:
+            os.makedirs(self._path, exist_ok=True)
+            segment_info = dict(timestamps=timestamps, scores=scores, codes=codes, sizer=self._SIZER or 1.0)
+            if self._SEGMENT_FORMAT is SegmentFormat.RAW:
+                segments.write_raw_segment(folderpath + segments.RAW_SEGMENT_EXTENSION, images, **segment_info)
+            else:
+                segments.write_video_segment(folderpath + segments.VIDEO_SEGMENT_EXTENSION, images,
+                                             fps=self._FPS, fourcc=self._FOURCC, **segment_info)
+        finally:
+            with self._lock:
+                self._queued_bytes -= sum(image.nbytes for image in images)
+        self.saved += len(images)
+        self._log_stats()
+
+
+class ImagesStorageUsage(NamedTuple):
+    """
+    Память и место на диске, занятые сохраняемыми изображениями (в байтах)
+    """
+    pack_bytes: int
+    """изображения текущей пачки"""
+    queued_bytes: int
+    """изображения пачек, ожидающих записи"""
+    memory_budget_bytes: int
+    disk_bytes: Optional[int]
+    """папка с сохранёнными изображениями (``None``, если ещё не подсчитано)"""
+    disk_quota_bytes: int
+
+
+class ImagesCompressedSaver(ImagesBufferedSaver):
+    """
+    Логгер, сохраняющий изображения как ``ImagesBufferedSaver``, но с ограничением памяти и диска.
+
+    Изображения кодируются (PNG/JPEG) сразу в ``add`` и складываются в заранее выделенный
+    буффер размера ``pack_budget_mb``. Изображения, не поместившиеся в него, не сохраняются.
+    Пачки, ожидающие записи, вместе с текущей пачкой занимают не больше ``memory_budget_mb``,
+    иначе новая пачка не сохраняется.
+
+    Если размер папки ``path`` превышает ``disk_quota_mb``, то после записи очередной пачки
+    удаляются самые старые папки с пачками.
+
+    Parameters:
+        pack_budget_mb: память под закодированные изображения одной пачки
+        memory_budget_mb: память под изображения текущей и ожидающих записи пачек
+        disk_quota_mb: максимальный размер папки ``path`` (0 - не ограничивать)
+        (остальные - как у ``ImagesBufferedSaver``)
+    """
+    def __init__(
+            self,
+            path: str,
+            *,
+            pack_budget_mb: float = 8,
+            memory_budget_mb: float = 64,
+            disk_quota_mb: float = 0,
+            **kwargs,
+    ):
+        super().__init__(path, **kwargs)
+        self._arena = np.empty(int(pack_budget_mb * _MB), dtype=np.uint8)
+        self._arena_used = 0
+        self._frames: list[tuple[int, int]] = []
+        """Положение ``(offset, size)`` изображений текущей пачки в буффере"""
+        self._MEMORY_BUDGET_BYTES = max(int(memory_budget_mb * _MB), self._arena.nbytes)
+        self._DISK_QUOTA_BYTES = int(disk_quota_mb * _MB)
+        self._lock = threading.Lock()
+        self._queued_bytes = 0
+        self._disk_bytes = None
+
+    def add(self, image: np.ndarray, *, score: Optional[float] = None) -> None:
+        if len(self._frames) >= self._BUFFER_SIZE:
+            return
+        if self._SIZER is not None:
+            image = get_resized(image, sizer=self._SIZER)
+        is_encoded, encoded = cv2.imencode(f'.{self._ENCODING.value}', image, self._ENCODE_PARAMS)
+        if not is_encoded:
+            return
+        size = encoded.size
+        if self._arena_used + size > self._arena.size:
+            self.dropped += 1
+            return
+        self._arena[self._arena_used:self._arena_used + size] = encoded.ravel()
+        self._frames.append((self._arena_used, size))
+        self._arena_used += size
+
+    def save(self) -> None:
+        if not self._frames:
+            return
+        pack_bytes = self._arena_used
+        with self._lock:
+            if self._queued_bytes + pack_bytes + self._arena.nbytes > self._MEMORY_BUDGET_BYTES:
+                self.dropped += len(self._frames)
+                logger.warning(f"Превышен бюджет памяти на изображения, не сохранено "
+                               f"{len(self._frames)} изображений (всего {self.dropped})")
+                return
+            self._queued_bytes += pack_bytes
+
+        # одна копия всех изображений пачки - буффер сразу переиспользуется следующей пачкой
+        pack = (self._arena[:pack_bytes].tobytes(), list(self._frames))
+        if not self._hand_off(self._get_folderpath(), pack, len(self._frames)):
+            with self._lock:
+                self._queued_bytes -= pack_bytes
+
+    def clear(self) -> None:
+        self._arena_used = 0
+        self._frames.clear()
+
+    def get_usage(self) -> ImagesStorageUsage:
+        """
+        Текущие занятые память и место на диске
+        """
+        return ImagesStorageUsage(
+            pack_bytes=self._arena_used,
+            queued_bytes=self._queued_bytes,
+            memory_budget_bytes=self._MEMORY_BUDGET_BYTES,
+            disk_bytes=self._disk_bytes,
+            disk_quota_bytes=self._DISK_QUOTA_BYTES,
+        )
+
+    def _write(self, folderpath: str, pack: tuple[bytes, list[tuple[int, int]]]) -> None:
+        payload, frames = pack
+        try:
+            if self._disk_bytes is None:
+                self._disk_bytes = _get_folder_size(self._path)
+            os.makedirs(folderpath, exist_ok=True)
+            for i, (offset, size) in enumerate(frames, 1):
+                filepath = os.path.join(folderpath, f'{i:03}.{self._ENCODING.value}')
+                with open(filepath, 'wb') as file:
+                    file.write(payload[offset:offset + size])
+                self.saved += 1
+            self._disk_bytes += len(payload)
+        finally:
+            with self._lock:
+                self._queued_bytes -= len(payload)
+        self._evict_old(keep=folderpath)
+        self._log_stats()
+
+    def _evict_old(self, *, keep: str) -> None:
+        """
+        Удаляет самые старые папки с пачками, пока размер ``path`` больше квоты
+        """
+        if self._DISK_QUOTA_BYTES <= 0 or self._disk_bytes <= self._DISK_QUOTA_BYTES:
+            return
+        # имена папок - время сохранения, поэтому сортировка по имени - от старых к новым
+        folderpaths = sorted(
+            entry.path for entry in os.scandir(self._path)
+            if entry.is_dir() and entry.path != keep
+        )
+        for folderpath in folderpaths:
+            if self._disk_bytes <= self._DISK_QUOTA_BYTES:
+                break
+            folder_size = _get_folder_size(folderpath)
+            shutil.rmtree(folderpath, ignore_errors=True)
+            self._disk_bytes -= folder_size
+            logger.info(f"Превышена квота диска на изображения, удалена папка {folderpath!r}")
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if self._STATS_INTERVAL_SEC <= 0 or now - self._stats_logged_time < self._STATS_INTERVAL_SEC:
+            return
+        self._stats_logged_time = now
+        usage = self.get_usage()
+        logger.info(f"Сохранено изображений: {self.saved}, не сохранено: {self.dropped}, "
+                    f"память: {(usage.pack_bytes + usage.queued_bytes) / _MB:.1f}"
+                    f"/{usage.memory_budget_bytes / _MB:.1f} МБ, "
+                    f"диск: {(usage.disk_bytes or 0) / _MB:.1f}/{usage.disk_quota_bytes / _MB:.1f} МБ")
+
+
+def _get_folder_size(path: str) -> int:
+    """Суммарный размер файлов в папке (включая вложенные)"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
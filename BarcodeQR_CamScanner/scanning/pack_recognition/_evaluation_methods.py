@@ -2,17 +2,22 @@
 Различные метрики для определения и аппроксимации всего, что может происходить на камерах.
 """
 from functools import reduce
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import cv2
 import numpy as np
-from skimage.metrics import structural_similarity as ssim
-from tensorflow.lite.python.interpreter import Interpreter
 
 from ..image_utils import get_normalized_sum
 
+if TYPE_CHECKING:
+    from tensorflow.lite.python.interpreter import Interpreter
 
-def get_neuronet_score(interpreter: Interpreter, image: np.ndarray) -> float:
+
+def get_neuronet_score(
+        interpreter: 'Interpreter',
+        image: np.ndarray,
+        input_layer: np.ndarray = None,
+) -> float:
     """
     Оценка наличия пачки на изображении, полученная от нейросети
 
@@ -20,7 +25,9 @@ def get_neuronet_score(interpreter: Interpreter, image: np.ndarray) -> float:
 
     Args:
         interpreter: интерпретатор с уже загруженной и обученной нейросетью
-        image: изображение, которое нужно проверить
+        image: изображение, которое нужно проверить (BGR)
+        input_layer: заранее выделенный входной тензор ``float32`` формы ``(1, H, W, 3)``,
+            в который записывается изображение (иначе выделяется новый)
 
     Returns:
         показатель движения на изображении
@@ -31,11 +38,12 @@ def get_neuronet_score(interpreter: Interpreter, image: np.ndarray) -> float:
 
     input_size = tuple(input_detail['shape'][[2, 1]])
 
-    image = cv2.resize(image, input_size)
-    cv2.cvtColor(image, cv2.COLOR_BGR2RGB, image)
-
-    input_layer = np.expand_dims(image, axis=0)
-    input_layer = input_layer.astype('float32') * (1 / 255)
+    if image.shape[1::-1] != input_size:
+        image = cv2.resize(image, input_size)
+    if input_layer is None:
+        input_layer = np.empty((1, *image.shape), dtype=np.float32)
+    # BGR -> RGB и нормализация сразу во входной тензор, без промежуточных массивов
+    np.multiply(image[..., ::-1], 1 / 255, out=input_layer[0], casting='unsafe')
 
     interpreter.set_tensor(input_detail['index'], input_layer)
     interpreter.invoke()
@@ -79,6 +87,9 @@ def get_reverse_ssim_score(img1: np.ndarray, img2: np.ndarray) -> float:
         показатель несхожести двух изображений
             от 0.0 (идентичны) до 1.0 (полностью несхожи)
     """
+    # scikit-image долго импортируется - только при использовании
+    from skimage.metrics import structural_similarity as ssim
+
     score = ssim(img1, img2)
     return 1.0 - score
 
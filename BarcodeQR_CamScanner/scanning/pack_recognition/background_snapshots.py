@@ -0,0 +1,73 @@
+"""
+Сохранение и загрузка выученного фона ``BSPackRecognizer`` между перезапусками.
+"""
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+from loguru import logger
+
+__all__ = ['BackgroundSnapshot', 'save_background_snapshot', 'load_background_snapshot']
+
+
+class BackgroundSnapshot(NamedTuple):
+    """
+    Фон (``getBackgroundImage`` у MOG2), последние кадры без пачки и условия, при которых они получены
+    """
+    background: np.ndarray
+    """фон выбранной области кадра после уменьшения"""
+    frame_shape: tuple[int, ...]
+    """размер полного кадра камеры"""
+    region: tuple[float, float, float, float]
+    sizer: float
+    frames: Optional[np.ndarray] = None
+    """последние кадры без пачки (выбранная область после уменьшения), по ним восстанавливается разброс фона"""
+
+    def is_compatible(self, frame_shape: tuple[int, ...], region: tuple, sizer: float) -> bool:
+        """Подходит ли фон для кадров размера ``frame_shape`` и заданных области и уменьшения"""
+        return (
+            tuple(self.frame_shape) == tuple(frame_shape)
+            and np.allclose(self.region, region)
+            and abs(self.sizer - sizer) < 1e-4
+        )
+
+
+def save_background_snapshot(path: str, snapshot: BackgroundSnapshot) -> None:
+    """
+    Сохраняет фон в сжатый ``.npz``. Файл заменяется целиком,
+    поэтому при падении процесса во время записи остаётся предыдущий фон.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez_compressed(
+            file,
+            background=snapshot.background,
+            frame_shape=np.array(snapshot.frame_shape),
+            region=np.array(snapshot.region),
+            sizer=np.array(snapshot.sizer),
+            **({} if snapshot.frames is None else {'frames': snapshot.frames}),
+        )
+    os.replace(tmp_path, path)
+
+
+def load_background_snapshot(path: str) -> Optional[BackgroundSnapshot]:
+    """
+    Загружает сохранённый фон, либо возвращает ``None``, если его нет или он повреждён
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            return BackgroundSnapshot(
+                background=data['background'],
+                frame_shape=tuple(int(v) for v in data['frame_shape']),
+                region=tuple(float(v) for v in data['region']),
+                sizer=float(data['sizer']),
+                frames=data['frames'] if 'frames' in data.files else None,
+            )
+    except Exception as e:
+        logger.warning(f"Не удалось загрузить сохранённый фон {path!r}: {e}")
+        return None
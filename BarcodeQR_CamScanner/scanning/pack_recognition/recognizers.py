@@ -9,15 +9,23 @@
     - и т.п.
 """
 import abc
-from typing import Optional
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Optional
 
 import cv2
 import numpy as np
-import pysnmp.hlapi as snmp
-from tensorflow.lite.python.interpreter import Interpreter
+from loguru import logger
 
 from ._evaluation_methods import (get_neuronet_score, get_mog2_foreground_score)
+from .background_snapshots import BackgroundSnapshot, load_background_snapshot, save_background_snapshot
 from ..image_utils import get_resized
+from ...snmp_client import get_snmp_client
+
+if TYPE_CHECKING:
+    from tensorflow.lite.python.interpreter import Interpreter
 
 __all__ = [
     'BaseRecognizer', 'NeuronetPackRecognizer',
@@ -25,10 +33,26 @@ __all__ = [
 ]
 
 
+def _get_interpreter_class() -> type:
+    """
+    Класс интерпретатора TF-Lite. Импортируется только при создании распознавателя:
+    предпочтительно из лёгкого ``tflite_runtime``, иначе - из ``tensorflow``.
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite.python.interpreter import Interpreter
+    return Interpreter
+
+
 class BaseRecognizer(metaclass=abc.ABCMeta):
     """
     Базовый абстрактный класс для всех распознавателей с изображений
+
+    Attributes:
+        last_score: последняя оценка изображения (``None``, если распознаватель её не даёт)
     """
+    last_score: Optional[float] = None
 
     @abc.abstractmethod
     def is_recognized(self, image: np.ndarray) -> bool:
@@ -41,43 +65,136 @@ class NeuronetPackRecognizer(BaseRecognizer):
     """
     Определитель наличия пачки на изображении. Получает предсказания от нейросети.
 
-    **Осторожно: очень медленно работает**
+    Нейросеть работает медленно (сотни мс на кадр), поэтому предсказания делаются в отдельном
+    потоке: ``is_recognized`` сразу возвращает последний полученный результат, а кадр
+    (уменьшенный до входа нейросети) передаёт потоку, только если тот свободен и с окончания
+    предыдущего предсказания прошло не меньше ``min_interval_sec``. Остальные кадры
+    не уменьшаются и в нейросеть не попадают.
 
     Parameters:
         model_path: путь к ``TF-Lite Flatbuffer`` файлу
         threshold_score: пороговое значение для активации критерия
+        num_threads: кол-во потоков интерпретатора TF-Lite
+        min_interval_sec: минимальная пауза между предсказаниями (0 - предсказывать без пауз)
+        stats_interval_sec: периодичность логгирования времени предсказаний (0 - не логгировать)
 
     Attributes:
         _THRESHOLD_SCORE: пороговое значение, меньше которого
             ``is_recognized`` будет возвращать ``False``
+        inferences: кол-во сделанных предсказаний
+        skipped: кол-во кадров, не попавших в нейросеть
     """
     _THRESHOLD_SCORE: float
-    _interpreter: Interpreter
+    _interpreter: 'Interpreter'
+    _LATENCY_WINDOW = 100
 
-    def __init__(self, *, model_path: str, threshold_score: float = 0.6):
+    def __init__(
+            self,
+            *,
+            model_path: str,
+            threshold_score: float = 0.6,
+            num_threads: int = 1,
+            min_interval_sec: float = 0,
+            stats_interval_sec: float = 0,
+    ):
         self._THRESHOLD_SCORE = threshold_score
-        self._interpreter = Interpreter(model_path=model_path)
+        self._MIN_INTERVAL_SEC = min_interval_sec
+        self._interpreter = _get_interpreter_class()(model_path=model_path, num_threads=num_threads)
         self._interpreter.allocate_tensors()
-        self._SKIPFRAME_MOD = 15
-        self._skipframe_counter = self._SKIPFRAME_MOD + 1
+        input_shape = self._interpreter.get_input_details()[0]['shape']
+        self._INPUT_SIZE = (int(input_shape[2]), int(input_shape[1]))
+        self._input_layer = np.empty(tuple(input_shape), dtype=np.float32)
+        """Входной тензор, переиспользуемый для всех предсказаний"""
         self._recognized = False
 
+        self._STATS_INTERVAL_SEC = stats_interval_sec
+        self._stats_logged_time = time.monotonic()
+        self._latencies: deque[float] = deque(maxlen=self._LATENCY_WINDOW)
+        self.inferences = 0
+        self.skipped = 0
+
+        self._condition = threading.Condition()
+        self._pending: Optional[np.ndarray] = None
+        self._is_busy = False
+        """Делается ли сейчас предсказание"""
+        self._next_inference_time = 0.0
+        """Не раньше какого момента (``time.monotonic()``) передавать потоку следующий кадр"""
+        threading.Thread(target=self._predict_forever, name='neuronet-recognizer', daemon=True).start()
+
     def is_recognized(self, image: np.ndarray) -> bool:
-        self._skipframe_counter = (self._skipframe_counter + 1) % self._SKIPFRAME_MOD
-        if self._skipframe_counter == 0:
-            self._recognized = self._has_pack(image)
+        with self._condition:
+            is_ready = (not self._is_busy and self._pending is None
+                        and time.monotonic() >= self._next_inference_time)
+        if not is_ready:
+            self.skipped += 1
+            return self._recognized
+
+        # копия, уменьшенная до входа нейросети, - исходный кадр может быть переиспользован источником
+        resized = cv2.resize(image, self._INPUT_SIZE)
+        with self._condition:
+            self._pending = resized
+            self._condition.notify()
         return self._recognized
 
+    def _predict_forever(self) -> None:
+        """
+        Метод для запуска в отдельном потоке.
+        Делает предсказания по переданным кадрам.
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None)
+                image, self._pending = self._pending, None
+                self._is_busy = True
+            try:
+                start = time.perf_counter()
+                self._recognized = self._has_pack(image)
+                self._latencies.append(time.perf_counter() - start)
+                self.inferences += 1
+                self._log_stats()
+            except Exception as e:
+                logger.error("Ошибка при распознавании пачки нейросетью")
+                logger.opt(exception=e)
+            finally:
+                with self._condition:
+                    self._is_busy = False
+                    self._next_inference_time = time.monotonic() + self._MIN_INTERVAL_SEC
+
     def _has_pack(self, image: np.ndarray):
-        score = get_neuronet_score(self._interpreter, image)
-        return score > self._THRESHOLD_SCORE
+        score = get_neuronet_score(self._interpreter, image, self._input_layer)
+        self.last_score = float(score)
+        return bool(score > self._THRESHOLD_SCORE)
+
+    def _log_stats(self) -> None:
+        now = time.monotonic()
+        if self._STATS_INTERVAL_SEC <= 0 or now - self._stats_logged_time < self._STATS_INTERVAL_SEC:
+            return
+        self._stats_logged_time = now
+        latencies = sorted(self._latencies)
+        logger.info(f"Нейросеть: предсказаний {self.inferences}, пропущено кадров {self.skipped}, "
+                    f"время предсказания (мс) p50: {latencies[len(latencies) // 2] * 1000:.0f}, "
+                    f"p90: {latencies[len(latencies) * 9 // 10] * 1000:.0f}, "
+                    f"max: {latencies[-1] * 1000:.0f}")
 
 
 class BSPackRecognizer(BaseRecognizer):
     """
     Распознаватель пачек, посредством сравнения с фоном.
     Усредняет несколько последних результатов распознавания и даёт результат на их основании.
+
+    Если указан ``snapshot_path``, то выученный фон раз в ``snapshot_interval_sec``
+    (пока пачки нет в кадре) сохраняется на диск, а при создании распознавателя загружается.
+    Загруженный фон применяется перед первым кадром, только если совпадают размер кадров
+    камеры, область ``region`` и уменьшение ``size_multiplier``, - иначе фон учится заново.
+
+    Вместе с фоном сохраняются последние кадры без пачки: MOG2 не даёт сохранить свою
+    модель целиком, поэтому при восстановлении она заново учится на этих кадрах
+    (одинаковые кадры дали бы нулевой разброс и ложное распознавание пачки на шуме).
     """
+    _SNAPSHOT_FRAMES = 16
+    """Сколько последних кадров без пачки сохраняется для восстановления модели"""
+    _SNAPSHOT_FRAME_STEP = 5
+    """Каждый какой кадр без пачки запоминается для сохранения"""
     _ACTIVATION_COUNT: int
     _DEACTIVATION_COUNT: int
     _THRESHOLD_SCORE: float
@@ -97,6 +214,8 @@ class BSPackRecognizer(BaseRecognizer):
             threshold_score: float = 0.8,
             size_multiplier: float = 1.0,
             region: dict[str, float] = None,
+            snapshot_path: Optional[str] = None,
+            snapshot_interval_sec: float = 300,
     ):
         region = dict(x1=0, x2=1, y1=0, y2=1) if region is None else region
 
@@ -111,10 +230,24 @@ class BSPackRecognizer(BaseRecognizer):
         self._recognize_counter = 0
 
         self._mog2 = cv2.createBackgroundSubtractorMOG2(detectShadows=True)
+
+        self._SNAPSHOT_PATH = snapshot_path
+        self._SNAPSHOT_INTERVAL_SEC = snapshot_interval_sec
+        self._snapshot_saved_time = time.monotonic()
+        self._frame_shape = None
+        self._snapshot = None
+        self._snapshot_frames: deque[np.ndarray] = deque(maxlen=self._SNAPSHOT_FRAMES)
+        self._snapshot_frame_counter = 0
         if background is not None:
             _ = self._has_foreground(background)
+        if snapshot_path is not None:
+            self._snapshot = load_background_snapshot(snapshot_path)
 
     def is_recognized(self, image: np.ndarray) -> bool:
+        if self._frame_shape is None:
+            self._frame_shape = image.shape
+            self._restore_background()
+
         # TODO: брать только нижнюю часть изображения (прокинуть регион в конструктор)
         recognized = self._has_foreground(image)
         if recognized:
@@ -131,14 +264,66 @@ class BSPackRecognizer(BaseRecognizer):
         self._recognize_counter = max(self._recognize_counter, self._DEACTIVATION_COUNT)
         self._recognize_counter = min(self._recognize_counter, self._ACTIVATION_COUNT)
 
+        self._save_background()
         return self._recognized
 
+    def _restore_background(self) -> None:
+        """
+        Восстанавливает фон из загруженного снимка, если он подходит для текущей камеры
+        """
+        snapshot, self._snapshot = self._snapshot, None
+        if snapshot is None:
+            return
+        if not snapshot.is_compatible(self._frame_shape, self._REGION, self._SIZER):
+            logger.warning(f"Сохранённый фон {self._SNAPSHOT_PATH!r} не подходит: кадр {snapshot.frame_shape}, "
+                           f"область {snapshot.region}, уменьшение {snapshot.sizer} вместо "
+                           f"{self._frame_shape}, {self._REGION}, {self._SIZER} - фон будет выучен заново")
+            return
+        if snapshot.frames is not None and len(snapshot.frames):
+            # первый кадр задаёт модель целиком, следующие усредняются с равными весами,
+            # в том числе по разбросу значений пикселей
+            for i, frame in enumerate(snapshot.frames):
+                self._mog2.apply(frame, learningRate=1 / (i + 1))
+            self._snapshot_frames.extend(snapshot.frames)
+        else:
+            # снимок без кадров - только средний фон с разбросом по умолчанию
+            self._mog2.apply(snapshot.background, learningRate=1)
+        logger.info(f"Фон восстановлен из {self._SNAPSHOT_PATH!r}")
+
+    def _save_background(self) -> None:
+        """
+        Периодически сохраняет выученный фон, пока пачки нет в кадре
+        """
+        if self._SNAPSHOT_PATH is None or self._recognized:
+            return
+        now = time.monotonic()
+        if now - self._snapshot_saved_time < self._SNAPSHOT_INTERVAL_SEC:
+            return
+        self._snapshot_saved_time = now
+        snapshot = BackgroundSnapshot(
+            background=self._mog2.getBackgroundImage(),
+            frame_shape=tuple(self._frame_shape),
+            region=self._REGION,
+            sizer=self._SIZER,
+            frames=np.stack(self._snapshot_frames) if self._snapshot_frames else None,
+        )
+        try:
+            save_background_snapshot(self._SNAPSHOT_PATH, snapshot)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить фон в {self._SNAPSHOT_PATH!r}")
+            logger.opt(exception=e)
+
     def _has_foreground(self, image: np.ndarray) -> bool:
         image = self.get_region_from_image(image, self._REGION)
         if abs(self._SIZER - 1.0) > 1e-4:
             image = get_resized(image, sizer=self._SIZER)
         learning_rate = self._LEARNING_RATE * (not self._recognized)
+        if self._SNAPSHOT_PATH is not None and not self._recognized:
+            self._snapshot_frame_counter = (self._snapshot_frame_counter + 1) % self._SNAPSHOT_FRAME_STEP
+            if self._snapshot_frame_counter == 0:
+                self._snapshot_frames.append(image.copy())
         score = get_mog2_foreground_score(self._mog2, image, learning_rate)
+        self.last_score = float(score)
         return score > self._THRESHOLD_SCORE
 
     @staticmethod
@@ -154,43 +339,43 @@ class BSPackRecognizer(BaseRecognizer):
 
 class SensorPackRecognizer(BaseRecognizer):
     """
-    Определение наличия пачки посредством SNMP-запросов к датчику расстояния
-    """
-    # TODO: возможно стоит вынести блокирующие запросы в асинхронный процесс
-    #  и обеспечить связь данного класса с процессом через очередь для исключения блокировок
+    Определение наличия пачки посредством SNMP-запросов к датчику расстояния.
 
-    def __init__(self, *, sensor_ip: str, sensor_key: str):
+    Запрос отправляется раз в ``_SKIPFRAME_MOD`` кадров через ``SnmpClient`` и не ждёт
+    ответа: до его получения используется предыдущее состояние датчика,
+    поэтому медленный или недоступный датчик не задерживает обработку кадров.
+    """
+    def __init__(
+            self,
+            *,
+            sensor_ip: str,
+            sensor_key: str,
+            timeout_sec: float = 1,
+            retries: int = 2,
+    ):
         # TODO: убрать костанты и сделать нормальную расширяемость
         #  добавить усреднение результата и другие
         self._SKIPFRAME_MOD = 15
         self._skipframe_counter = self._SKIPFRAME_MOD + 1
         self._recognized = False
-        self._snmp_detector_ip = sensor_ip
-        self._snmp_engine = snmp.SnmpEngine()
-        self._snmp_community_string = 'public'
-        self._snmp_sensor_identity = snmp.ObjectIdentity(sensor_key)
-        self._snmp_port = 161
-        self._snmp_context = snmp.ContextData()
+        self._snmp_sensor_key = sensor_key
+        self._snmp_client = get_snmp_client(sensor_ip, timeout_sec=timeout_sec, retries=retries)
+        self._pending_request: Optional[Future] = None
 
     def is_recognized(self, _: np.ndarray) -> bool:
+        self._collect_response()
         self._skipframe_counter = (self._skipframe_counter + 1) % self._SKIPFRAME_MOD
-        if self._skipframe_counter == 0:
-            self._recognized = self._has_pack()
+        if self._skipframe_counter == 0 and self._pending_request is None:
+            self._pending_request = self._snmp_client.get_nowait(self._snmp_sensor_key)
         return self._recognized
 
-    def _has_pack(self) -> bool:
-        erd = self._snmp_get()
-        return bool(erd)
-
-    def _snmp_get(self) -> str:
-        """получение состояния"""
-        t = snmp.getCmd(
-            self._snmp_engine,
-            snmp.CommunityData(self._snmp_community_string),
-            snmp.UdpTransportTarget((self._snmp_detector_ip, self._snmp_port)),
-            self._snmp_context,
-            snmp.ObjectType(self._snmp_sensor_identity),
-        )
-        errorIndication, errorStatus, errorIndex, varBinds = next(t)
-        for name, val in varBinds:
-            return val.prettyPrint()
+    def _collect_response(self) -> None:
+        """Обновляет состояние датчика, если пришёл ответ на запрос"""
+        request = self._pending_request
+        if request is None or not request.done():
+            return
+        self._pending_request = None
+        try:
+            self._recognized = bool(request.result())
+        except Exception as e:
+            logger.warning(f"Не удалось получить состояние датчика: {e}")
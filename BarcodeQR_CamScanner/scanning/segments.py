@@ -0,0 +1,156 @@
+"""
+Запись и чтение сегментов - кадров одной пачки в одном файле.
+
+Сегмент ``.camseg`` - несжатые кадры одного размера подряд с небольшим заголовком::
+
+    b'CAMSEG1\n' | длина заголовка (uint32, little-endian) | заголовок (JSON) | выравнивание | кадры
+
+В заголовке хранятся форма и тип кадров, время получения каждого кадра,
+оценки распознавателя, коды, прочитанные с пачки, и во сколько раз кадры были уменьшены при записи. Кадры читаются через
+``np.memmap`` без копирования в память.
+
+Сегмент-видео (``.avi``) пишется ``cv2.VideoWriter``, а заголовок - рядом, в ``.json``.
+"""
+import json
+import os
+import struct
+from typing import NamedTuple, Optional, Sequence
+
+import cv2
+import numpy as np
+
+__all__ = [
+    'RAW_SEGMENT_EXTENSION', 'VIDEO_SEGMENT_EXTENSION', 'Segment',
+    'write_raw_segment', 'write_video_segment', 'read_segment',
+]
+
+RAW_SEGMENT_EXTENSION = '.camseg'
+VIDEO_SEGMENT_EXTENSION = '.avi'
+
+_MAGIC = b'CAMSEG1\n'
+_HEADER_LENGTH = struct.Struct('<I')
+_ALIGNMENT = 64
+
+
+class Segment(NamedTuple):
+    """
+    Кадры пачки и сведения о них
+    """
+    frames: Sequence[np.ndarray]
+    """кадры (``np.memmap`` формы ``(N, H, W[, C])`` для ``.camseg``, список кадров для видео)"""
+    timestamps: list[float]
+    """время получения кадров (``time.time()``)"""
+    scores: list[Optional[float]]
+    """оценки распознавателя пачек для каждого кадра (если есть)"""
+    codes: list[str]
+    """коды, прочитанные с пачки"""
+    sizer: float = 1.0
+    """во сколько раз логгер уменьшил кадры пачки (которые уже уменьшены относительно кадров камеры,
+    см. ``video_processing.PACK_IMAGE_SIZER``)"""
+
+
+def _get_header(frames: Sequence[np.ndarray], timestamps, scores, codes, sizer) -> dict:
+    first = frames[0]
+    return {
+        'count': len(frames),
+        'shape': list(first.shape),
+        'dtype': first.dtype.str,
+        'timestamps': list(timestamps),
+        'scores': list(scores),
+        'codes': list(codes),
+        'sizer': sizer,
+    }
+
+
+def write_raw_segment(
+        filepath: str,
+        frames: Sequence[np.ndarray],
+        *,
+        timestamps: Sequence[float],
+        scores: Sequence[Optional[float]],
+        codes: Sequence[str] = (),
+        sizer: float = 1.0,
+) -> None:
+    """
+    Записывает кадры одного размера в сегмент ``.camseg``
+    """
+    header = json.dumps(_get_header(frames, timestamps, scores, codes, sizer)).encode()
+    prefix_length = len(_MAGIC) + _HEADER_LENGTH.size + len(header)
+    padding = -prefix_length % _ALIGNMENT
+    with open(filepath, 'wb') as file:
+        file.write(_MAGIC)
+        file.write(_HEADER_LENGTH.pack(len(header)))
+        file.write(header)
+        file.write(b'\0' * padding)
+        for frame in frames:
+            file.write(np.ascontiguousarray(frame).data)
+
+
+def write_video_segment(
+        filepath: str,
+        frames: Sequence[np.ndarray],
+        *,
+        timestamps: Sequence[float],
+        scores: Sequence[Optional[float]],
+        codes: Sequence[str] = (),
+        fps: float = 25,
+        fourcc: str = 'MJPG',
+        sizer: float = 1.0,
+) -> None:
+    """
+    Записывает кадры одного размера в видео, а сведения о кадрах - в ``.json`` рядом с ним
+    """
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(filepath, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    try:
+        for frame in frames:
+            writer.write(frame)
+    finally:
+        writer.release()
+    header = _get_header(frames, timestamps, scores, codes, sizer)
+    with open(os.path.splitext(filepath)[0] + '.json', 'w', encoding='utf-8') as file:
+        json.dump(header, file, ensure_ascii=False)
+
+
+def read_segment(filepath: str) -> Segment:
+    """
+    Читает сегмент ``.camseg`` (кадры не копируются в память) или сегмент-видео
+    """
+    if os.path.splitext(filepath)[1] != RAW_SEGMENT_EXTENSION:
+        return _read_video_segment(filepath)
+
+    with open(filepath, 'rb') as file:
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{filepath!r} не является сегментом {RAW_SEGMENT_EXTENSION}")
+        header_length, = _HEADER_LENGTH.unpack(file.read(_HEADER_LENGTH.size))
+        header = json.loads(file.read(header_length))
+    prefix_length = len(_MAGIC) + _HEADER_LENGTH.size + header_length
+    offset = prefix_length + -prefix_length % _ALIGNMENT
+    frames = np.memmap(
+        filepath,
+        dtype=np.dtype(header['dtype']),
+        mode='r',
+        offset=offset,
+        shape=(header['count'], *header['shape']),
+    )
+    return Segment(frames, header['timestamps'], header['scores'], header['codes'], header.get('sizer', 1.0))
+
+
+def _read_video_segment(filepath: str) -> Segment:
+    frames = []
+    cap = cv2.VideoCapture(filepath)
+    try:
+        while True:
+            is_exists, frame = cap.read()
+            if not is_exists:
+                break
+            frames.append(frame)
+    finally:
+        cap.release()
+
+    header_path = os.path.splitext(filepath)[0] + '.json'
+    if not os.path.exists(header_path):
+        return Segment(frames, [], [], [])
+    with open(header_path, encoding='utf-8') as file:
+        header = json.load(file)
+    return Segment(frames, header['timestamps'], header['scores'], header['codes'], header.get('sizer', 1.0))
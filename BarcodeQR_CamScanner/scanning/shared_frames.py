@@ -0,0 +1,234 @@
+"""
+Кольцевой буффер кадров в разделяемой памяти.
+
+Позволяет процессу захвата видео передавать кадры процессу-обработчику
+(распознавание пачек и чтение кодов) без сериализации и копирования
+полноразмерных изображений: обработчик читает кадр прямо из слота буффера.
+"""
+import time
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import numpy as np
+
+__all__ = ['SharedFrameRing', 'SharedFrameRingStats']
+
+
+@dataclass
+class SharedFrameRingStats:
+    """
+    Статистика кольцевого буффера.
+
+    Attributes:
+        written: кол-во записанных кадров
+        read: номер последнего прочитанного кадра
+        occupancy: кол-во записанных, но ещё не прочитанных кадров в буффере
+        overruns: кол-во непрочитанных кадров, перезаписанных новыми
+        torn: кол-во кадров, в слот которых писатель начал запись во время их обработки
+    """
+    written: int = 0
+    read: int = 0
+    occupancy: int = 0
+    overruns: int = 0
+    torn: int = 0
+
+    def __str__(self) -> str:
+        return (f"записано: {self.written}, прочитано: {self.read}, "
+                f"заполненность: {self.occupancy}, перезаписано непрочитанных: {self.overruns}, "
+                f"испорчено при обработке: {self.torn}")
+
+
+class SharedFrameRing:
+    """
+    Кольцевой буффер предвыделенных кадров одного размера в ``multiprocessing.shared_memory``.
+
+    Рассчитан на одного писателя (процесс захвата) и одного читателя (процесс обработки).
+    Читатель удерживает не более одного слота и обрабатывает кадр прямо в нём,
+    а писатель пропускает удерживаемый слот. Это соглашение без барьеров памяти
+    (из Python их не поставить), поэтому слот дополнительно проверяется как seqlock:
+    для каждого слота хранится номер записанного кадра (``-1`` - слот в процессе записи),
+    и ``release`` после обработки сверяет его с номером при захвате. Если писатель всё же
+    начал запись в слот, кадр считается испорченным (``torn`` в статистике).
+
+    Parameters:
+        name: имя блока разделяемой памяти
+        slots: кол-во слотов в буффере
+        shape: размер кадров (высота, ширина, каналы)
+        create: создать новый блок памяти (писатель) или подключиться к существующему (читатель)
+    """
+    # индексы полей заголовка
+    _WRITE_SEQ = 0
+    _LATEST_SLOT = 1
+    _READ_SEQ = 2
+    _HELD_SLOT = 3
+    _OVERRUNS = 4
+    _TORN = 5
+    _FINISHED = 6
+    _HEADER_SIZE = 8
+
+    def __init__(
+            self,
+            name: str,
+            *,
+            slots: int,
+            shape: tuple[int, int, int],
+            create: bool = False,
+    ):
+        self._SLOTS = slots
+        self._SHAPE = tuple(shape)
+        header_bytes = 8 * self._HEADER_SIZE
+        index_bytes = 8 * slots
+        frames_bytes = slots * int(np.prod(self._SHAPE))
+        total_bytes = header_bytes + 2 * index_bytes + frames_bytes
+
+        if create:
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=total_bytes)
+            except FileExistsError:
+                # остался от аварийно завершившегося процесса
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=total_bytes)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # блок принадлежит писателю - читатель не должен удалять его при своём завершении
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self._is_owner = create
+
+        buf = self._shm.buf
+        self._header = np.ndarray((self._HEADER_SIZE, ), np.int64, buf, 0)
+        self._slot_seqs = np.ndarray((slots, ), np.int64, buf, header_bytes)
+        self._slot_times = np.ndarray((slots, ), np.float64, buf, header_bytes + index_bytes)
+        self._frames = np.ndarray((slots, *self._SHAPE), np.uint8, buf, header_bytes + 2 * index_bytes)
+
+        if create:
+            self._header[:] = 0
+            self._header[self._HELD_SLOT] = -1
+            self._slot_seqs[:] = 0
+        self._next_slot = 0
+        self._held_seq = 0
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return self._SHAPE
+
+    @property
+    def is_finished(self) -> bool:
+        """Писатель больше не будет добавлять кадры"""
+        return bool(self._header[self._FINISHED])
+
+    def get_slot_for_write(self) -> tuple[int, np.ndarray]:
+        """
+        Выбирает слот для записи нового кадра, пропуская удерживаемый читателем,
+        и помечает его как записываемый.
+
+        Returns:
+            индекс слота и массив слота, в который нужно записать кадр
+        """
+        while True:
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self._SLOTS
+            if self._header[self._HELD_SLOT] == slot:
+                continue
+            old_seq = int(self._slot_seqs[slot])
+            self._slot_seqs[slot] = -1
+            if self._header[self._HELD_SLOT] == slot:
+                # читатель успел захватить слот до пометки - возвращаем как было
+                self._slot_seqs[slot] = old_seq
+                continue
+            if old_seq > self._header[self._READ_SEQ]:
+                self._header[self._OVERRUNS] += 1
+            return slot, self._frames[slot]
+
+    def commit(self, slot: int, grab_time: float) -> int:
+        """
+        Публикует записанный в слот кадр.
+
+        Args:
+            slot: индекс слота, полученный из ``get_slot_for_write``
+            grab_time: время захвата кадра (``time.monotonic``)
+
+        Returns:
+            номер опубликованного кадра
+        """
+        seq = int(self._header[self._WRITE_SEQ]) + 1
+        self._slot_times[slot] = grab_time
+        self._slot_seqs[slot] = seq
+        self._header[self._LATEST_SLOT] = slot
+        self._header[self._WRITE_SEQ] = seq
+        return seq
+
+    def write(self, image: np.ndarray, grab_time: Optional[float] = None) -> int:
+        """
+        Копирует кадр подходящего размера в буффер и публикует его.
+        """
+        slot, frame = self.get_slot_for_write()
+        np.copyto(frame, image)
+        grab_time = time.monotonic() if grab_time is None else grab_time
+        return self.commit(slot, grab_time)
+
+    def acquire_latest(self) -> Optional[tuple[int, float, np.ndarray]]:
+        """
+        Захватывает самый свежий кадр для обработки. Предыдущий захваченный кадр освобождается.
+
+        Returns:
+            номер кадра, время его захвата и массив-представление слота
+                (без копирования), либо ``None``, если нового кадра нет
+        """
+        self.release()
+        while True:
+            seq = int(self._header[self._WRITE_SEQ])
+            if seq <= self._header[self._READ_SEQ]:
+                return None
+            slot = int(self._header[self._LATEST_SLOT])
+            self._header[self._HELD_SLOT] = slot
+            slot_seq = int(self._slot_seqs[slot])
+            if slot_seq >= seq:
+                self._held_seq = slot_seq
+                return slot_seq, float(self._slot_times[slot]), self._frames[slot]
+            # слот перезаписывается - пробуем снова с более свежим кадром
+            self._header[self._HELD_SLOT] = -1
+
+    def release(self) -> bool:
+        """
+        Освобождает захваченный слот после обработки кадра.
+
+        Returns:
+            ``False``, если писатель начал запись в слот во время обработки кадра
+        """
+        slot = int(self._header[self._HELD_SLOT])
+        if slot < 0:
+            return True
+        is_intact = self._slot_seqs[slot] == self._held_seq
+        if not is_intact:
+            self._header[self._TORN] += 1
+        self._header[self._READ_SEQ] = self._held_seq
+        self._header[self._HELD_SLOT] = -1
+        return is_intact
+
+    def finish(self) -> None:
+        """
+        Сообщает читателю, что новых кадров не будет
+        """
+        self._header[self._FINISHED] = 1
+
+    def get_stats(self) -> SharedFrameRingStats:
+        read_seq = int(self._header[self._READ_SEQ])
+        return SharedFrameRingStats(
+            written=int(self._header[self._WRITE_SEQ]),
+            read=read_seq,
+            occupancy=int(np.count_nonzero(self._slot_seqs > read_seq)),
+            overruns=int(self._header[self._OVERRUNS]),
+            torn=int(self._header[self._TORN]),
+        )
+
+    def close(self) -> None:
+        """
+        Отключается от разделяемой памяти. Владелец буффера также удаляет её.
+        """
+        del self._header, self._slot_seqs, self._slot_times, self._frames
+        self._shm.close()
+        if self._is_owner:
+            self._shm.unlink()
@@ -0,0 +1,90 @@
+"""
+Лёгкие метрики стадий обработки видео в процессе-камере.
+"""
+import bisect
+import time
+from collections import Counter
+from typing import Iterable, Optional, TypeVar
+
+from ..models import CameraStageMetrics
+
+__all__ = ['LATENCY_BUCKETS_SEC', 'StageMetrics']
+
+LATENCY_BUCKETS_SEC = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+"""Верхние границы интервалов гистограмм задержек"""
+
+_T = TypeVar('_T')
+
+
+class StageMetrics:
+    """
+    Гистограммы задержек стадий обработки (захват, распознавание, чтение кодов и т.п.)
+    и счётчики событий за последний интервал.
+
+    Раз в ``interval_sec`` накопленные значения отдаются в виде ``CameraStageMetrics``
+    и обнуляются. При ``interval_sec=0`` метрики не собираются.
+    """
+    def __init__(self, *, interval_sec: float = 0):
+        self._INTERVAL_SEC = interval_sec
+        self.enabled = interval_sec > 0
+        self._interval_start = time.monotonic()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._histograms: dict[str, list[int]] = {}
+        self._sums_sec: Counter[str] = Counter()
+        self._counters: Counter[str] = Counter()
+
+    def observe(self, stage: str, duration_sec: float) -> None:
+        """Учитывает длительность одного выполнения стадии"""
+        if not self.enabled:
+            return
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = [0] * (len(LATENCY_BUCKETS_SEC) + 1)
+        histogram[bisect.bisect_left(LATENCY_BUCKETS_SEC, duration_sec)] += 1
+        self._sums_sec[stage] += duration_sec
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Увеличивает счётчик событий"""
+        if self.enabled:
+            self._counters[name] += value
+
+    def timed(self, stage: str, iterable: Iterable[_T]) -> Iterable[_T]:
+        """Замеряет время получения каждого элемента ``iterable`` как стадию ``stage``"""
+        if not self.enabled:
+            return iterable
+        return self._timed(stage, iterable)
+
+    def _timed(self, stage: str, iterable: Iterable[_T]) -> Iterable[_T]:
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start)
+            yield item
+
+    def pop_event(self) -> Optional[CameraStageMetrics]:
+        """
+        Возвращает метрики за прошедший интервал и начинает новый,
+        либо ``None``, если интервал ещё не закончился.
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        interval_sec = now - self._interval_start
+        if interval_sec < self._INTERVAL_SEC:
+            return None
+        event = CameraStageMetrics(
+            interval_sec=interval_sec,
+            bucket_bounds=list(LATENCY_BUCKETS_SEC),
+            histograms=self._histograms,
+            sums_sec=dict(self._sums_sec),
+            counters=dict(self._counters),
+        )
+        self._interval_start = now
+        self._reset()
+        return event
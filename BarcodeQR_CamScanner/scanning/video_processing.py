@@ -1,16 +1,28 @@
 """
 Функции для работы с видеопотоком: чтение QR- и штрихкодов, распознавание наличия пачки
 """
+import time
 from datetime import datetime
-from typing import Iterable
+from typing import Iterable, Optional
 
 import cv2
 import numpy as np
+from loguru import logger
 
-from .code_reading import get_codes_from_image, CodeType
+from .code_reading import CodeType
+from .code_tracking import CodeTracker
+from .decode_pool import CodesDecodePool, DecodedFrame
+from .frame_gating import FrameChangeGate
+from .frame_lookback import FrameLookback
+from .frame_sources import BaseFrameSource, DirectFrameSource
 from .image_loggers import BaseImagesLogger
 from .pack_recognition.recognizers import BaseRecognizer
+from .stage_metrics import StageMetrics
 from ..models import CameraPackResult, CameraProcessEvent
+from ..shared_state import SharedScanningState
+
+PACK_IMAGE_SIZER = 0.5
+"""Во сколько раз кадры пачки уменьшаются перед логгированием и чтением кодов"""
 
 
 def _get_images_from_source(
@@ -18,30 +30,23 @@ def _get_images_from_source(
         *,
         display_window: bool,
         auto_reconnect: bool,
+        frame_source: BaseFrameSource = None,
 ) -> Iterable[np.ndarray]:
     """
     Генератор, возвращающий последовательность изображений из видео.
-    Если ``auto_reconnect=True``
-    """
-    cap = cv2.VideoCapture(video_url)
-    while True:
-        is_exists, image = cap.read()
-        if not is_exists:
-            if not auto_reconnect:
-                break
-
-            # переподключение
-            cap.release()
-            cap.open(video_url)
-            continue
+    Если ``auto_reconnect=True``, то при потере соединения переподключается к источнику.
 
+    Кадры читаются через ``frame_source`` (по умолчанию - в текущем потоке).
+    """
+    frame_source = DirectFrameSource() if frame_source is None else frame_source
+    frames = frame_source.get_frames(video_url, auto_reconnect=auto_reconnect)
+    for image in frames:
         if display_window:
             img2display = _resize_image(image, 0.25)
             cv2.imshow('', img2display)
             cv2.waitKey(1)
 
         yield image
-    cap.release()
     cv2.destroyAllWindows()
 
 
@@ -51,15 +56,97 @@ def _resize_image(image: np.ndarray, sizer: float) -> np.ndarray:
     return cv2.resize(image, shape[::-1])
 
 
+def _add_new_codes(
+        decoded_frame: DecodedFrame,
+        qr_codes: list[str],
+        barcodes: list[str],
+        code_tracker: CodeTracker,
+) -> None:
+    """
+    Дописывает коды, прочитанные с одного кадра, к уже считанным с пачки, игнорируя повторы.
+    Учтённые коды передаются ``code_tracker``, чтобы не читать их на следующих кадрах.
+    """
+    new_qr_codes = decoded_frame.codes[CodeType.QR_CODE]
+    new_barcodes = decoded_frame.codes[CodeType.BARCODE]
+
+    if len(new_qr_codes) > 0:
+        qr_codes += [code for code in new_qr_codes if code not in qr_codes]
+    if len(new_barcodes) > 0 and len(barcodes) <= len(qr_codes):
+        barcodes += [code for code in new_barcodes if code not in barcodes]
+
+    # штрихкод может быть прочитан, но не учтён - такой штрихкод нужно читать и дальше
+    accepted = [code for code in decoded_frame.decoded
+                if code.data in (qr_codes if code.type == CodeType.QR_CODE else barcodes)]
+    code_tracker.add(decoded_frame.tag, accepted)
+
+
+def _is_decoding_needless(
+        shared_state: SharedScanningState,
+        qr_codes: list[str],
+        barcodes: list[str],
+) -> bool:
+    """
+    Нужно ли продолжать читать коды с текущей пачки:
+    не нужно, если уже прочитаны все ожидаемые коды или режим работы не автоматический.
+    """
+    if shared_state is None:
+        return False
+    if shared_state.workmode != 'auto':
+        return True
+    expected_count = shared_state.expected_codes_count
+    return len(qr_codes) >= expected_count and len(barcodes) >= expected_count
+
+
+def _get_expected_new_codes(
+        shared_state: SharedScanningState,
+        qr_codes: list[str],
+        barcodes: list[str],
+) -> Optional[tuple[int, int]]:
+    """
+    Сколько QR-кодов и штрихкодов пачки ещё не прочитано
+    (``None`` - неизвестно, каскад использует своё ожидаемое кол-во)
+    """
+    if shared_state is None:
+        return None
+    expected_count = shared_state.expected_codes_count
+    return max(expected_count - len(qr_codes), 0), max(expected_count - len(barcodes), 0)
+
+
 def get_events_from_video(
         video_url: str,
         recognizer: BaseRecognizer,
         images_logger: BaseImagesLogger,
         display_window: bool = True,
         auto_reconnect: bool = True,
+        frame_source: BaseFrameSource = None,
+        decode_pool: CodesDecodePool = None,
+        frame_gate: FrameChangeGate = None,
+        code_tracker: CodeTracker = None,
+        shared_state: SharedScanningState = None,
+        stage_metrics: StageMetrics = None,
+        lookback: FrameLookback = None,
+        launch_time: float = None,
 ) -> Iterable[CameraProcessEvent]:
     """
-    Генератор, возвращающий события с камеры-сканера
+    Генератор, возвращающий события с камеры-сканера.
+
+    Коды с кадров пачки читаются через ``decode_pool``, результаты учитываются
+    в порядке кадров, поэтому совпадают с последовательным чтением.
+    Кадры, почти не отличающиеся от последнего прочитанного, отсеиваются ``frame_gate``,
+    а области уже прочитанных кодов, отслеживаемые ``code_tracker``, не читаются повторно.
+
+    Если передано ``shared_state``, то чтение кодов с пачки прекращается, как только
+    прочитано ожидаемое кол-во QR- и штрихкодов, а в неавтоматическом режиме работы
+    коды не читаются вовсе.
+
+    Если в ``stage_metrics`` включён сбор метрик, то время захвата, распознавания,
+    чтения кодов и логгирования изображений периодически отдаётся событием ``CameraStageMetrics``.
+
+    Последние кадры до появления пачки хранятся в ``lookback`` и при появлении пачки
+    читаются и логгируются перед текущим кадром.
+
+    Если указан ``launch_time`` (``time.monotonic()`` при запуске процесса), то логгируется
+    время от запуска до первого обработанного кадра.
     """
     # noinspection PyUnusedLocal
     is_pack_visible_before = False
@@ -73,17 +160,43 @@ def get_events_from_video(
 
     pack = CameraPackResult(start_time=datetime.now())
 
+    decode_pool = CodesDecodePool() if decode_pool is None else decode_pool
+    frame_gate = FrameChangeGate() if frame_gate is None else frame_gate
+    code_tracker = CodeTracker() if code_tracker is None else code_tracker
+    stage_metrics = StageMetrics() if stage_metrics is None else stage_metrics
+    lookback = FrameLookback() if lookback is None else lookback
+
     images = _get_images_from_source(
         video_url,
         display_window=display_window,
         auto_reconnect=auto_reconnect,
+        frame_source=frame_source,
     )
+    images = stage_metrics.timed('capture', images)
+
+    decode_cpu_time_sec = 0.0
+    """Процессорное время, потраченное на чтение кодов со всех кадров"""
+    decoded_frames_count = 0
+    """Кол-во кадров, с которых читались коды"""
+    skipped_decodes_count = 0
+    """Кол-во кадров текущей пачки, с которых не пришлось читать коды"""
 
     qr_codes = []
     barcodes = []
     for image in images:
+        metrics_event = stage_metrics.pop_event()
+        if metrics_event is not None:
+            yield metrics_event
+        stage_metrics.count('frames')
+
+        stage_start = time.perf_counter()
         is_pack_visible_before = is_pack_visible_now
         is_pack_visible_now = recognizer.is_recognized(image)
+        stage_metrics.observe('recognition', time.perf_counter() - stage_start)
+
+        if launch_time is not None:
+            logger.info(f"Первый кадр обработан через {time.monotonic() - launch_time:.2f} с после запуска")
+            launch_time = None
 
         if is_pack_visible_now:
             # пачка проходит в данный момент
@@ -91,25 +204,64 @@ def get_events_from_video(
             if not is_pack_visible_before:
                 # пачка впервые попала в кадр - создаём новую запись о пачке и фиксируем время
                 pack = CameraPackResult(start_time=datetime.now())
+                frame_gate.reset()
+                code_tracker.reset()
+                skipped_decodes_count = 0
 
             # пытаемся прочитать QR и шрихкод
-            image = _resize_image(image, sizer=0.5)
-            images_logger.add(image)
-
-            codes_dict = get_codes_from_image(image)
-            new_qr_codes = codes_dict[CodeType.QR_CODE]
-            new_barcodes = codes_dict[CodeType.BARCODE]
-
-            # сохраняем коды, игнорируя повторы
-            # ключи словарей не допускают повторов и хранятся в порядке добавления
-            if len(new_qr_codes) > 0:
-                qr_codes += [code for code in new_qr_codes if code not in qr_codes]
-            if len(new_barcodes) > 0 and len(barcodes) <= len(qr_codes):
-                barcodes += [code for code in new_barcodes if code not in barcodes]
+            image = _resize_image(image, sizer=PACK_IMAGE_SIZER)
+            pack_images = [image]
+            if not is_pack_visible_before:
+                # кадры до срабатывания распознавателя тоже относятся к пачке
+                pack_images = lookback.pop_all() + pack_images
+                stage_metrics.count('lookback_frames', len(pack_images) - 1)
+
+            for pack_image in pack_images:
+                stage_start = time.perf_counter()
+                # оценка распознавателя есть только у текущего кадра, но не у кадров из lookback
+                score = recognizer.last_score if pack_image is image else None
+                images_logger.add(pack_image, score=score)
+                stage_metrics.observe('logging', time.perf_counter() - stage_start)
+                stage_metrics.count('pack_frames')
+
+                if _is_decoding_needless(shared_state, qr_codes, barcodes):
+                    skipped_decodes_count += 1
+                    stage_metrics.count('skipped_decodes')
+                    continue
+
+                stage_start = time.perf_counter()
+                frame_index = code_tracker.advance(pack_image)
+                if frame_gate.is_changed(pack_image):
+                    known = code_tracker.get_visible(frame_index, pack_image.shape)
+                    expected = _get_expected_new_codes(shared_state, qr_codes, barcodes)
+                    decode_pool.submit(pack_image, tag=frame_index, known=known, expected=expected)
+                for decoded_frame in decode_pool.get_ready():
+                    decode_cpu_time_sec += decoded_frame.cpu_time_sec
+                    decoded_frames_count += 1
+                    stage_metrics.count('decoded_frames')
+                    _add_new_codes(decoded_frame, qr_codes, barcodes, code_tracker)
+                stage_metrics.observe('decode', time.perf_counter() - stage_start)
             continue
 
         if not is_pack_visible_now and is_pack_visible_before:
             # пачка только что прошла, подводим итоги
+            pack.trace.mark('left_frame')
+
+            # дочитываем коды с оставшихся кадров пачки
+            stage_start = time.perf_counter()
+            for decoded_frame in decode_pool.get_all():
+                decode_cpu_time_sec += decoded_frame.cpu_time_sec
+                decoded_frames_count += 1
+                stage_metrics.count('decoded_frames')
+                _add_new_codes(decoded_frame, qr_codes, barcodes, code_tracker)
+            stage_metrics.observe('decode_drain', time.perf_counter() - stage_start)
+            # все прочитанные коды - до подгонки кол-ва штрихкодов к кол-ву QR-кодов
+            images_logger.set_codes(qr_codes + barcodes)
+
+            if skipped_decodes_count > 0:
+                saved_cpu_time_sec = skipped_decodes_count * decode_cpu_time_sec / max(decoded_frames_count, 1)
+                logger.info(f"Чтение кодов с пачки остановлено до её ухода: пропущено чтение "
+                            f"{skipped_decodes_count} кадров, сэкономлено ~{saved_cpu_time_sec * 1000:.0f} мс CPU")
 
             # подгоняем кол-во штрихкодов к кол-ву QR-кодов:
             # если не смогли считать штрихкод, то берём предыдущий считанный
@@ -122,17 +274,24 @@ def get_events_from_video(
                 barcodes.append(last_correct_barcode)
 
             # если с группы пачек не считано ни одного QR-кода, то сохраняем изображения этой группы
+            stage_start = time.perf_counter()
             if len(qr_codes) == 0:
                 images_logger.save()
             images_logger.clear()
+            stage_metrics.observe('logging_save', time.perf_counter() - stage_start)
 
             pack.codepairs = [{
                 CodeType.QR_CODE: qr_code,
                 CodeType.BARCODE: barcode,
             } for qr_code, barcode in zip(qr_codes, barcodes)]
             pack.finish_time = datetime.now()
+            stage_metrics.count('packs')
+            pack.trace.mark('decoded')
             yield pack
 
             qr_codes.clear()
             barcodes.clear()
             continue
+
+        # пачки в кадре нет - запоминаем кадр на случай, если пачка уже появилась, но ещё не распознана
+        lookback.push(image)
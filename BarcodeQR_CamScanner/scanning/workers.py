@@ -1,10 +1,18 @@
 import multiprocessing as mp
+import time
+from typing import Optional
+
+from loguru import logger
 
 from .video_processing import get_events_from_video
+from ..models import CameraPackResult
 
-__all__ = ['FakeScannerProcess', 'CameraScannerProcess']
+__all__ = ['FakeScannerProcess', 'CameraScannerProcess', 'FrameCaptureProcess']
 
 from ..di_containers import ApplicationContainer
+from ..launching import setup_logging
+from ..process_stats import get_loaded_heavy_modules, get_peak_rss_mb
+from ..shared_state import SharedScanningState
 
 
 class FakeScannerProcess(mp.Process):
@@ -25,10 +33,30 @@ class FakeScannerProcess(mp.Process):
             sleep(5)
 
 
+def _get_container(config: Optional[dict]) -> ApplicationContainer:
+    """
+    Контейнер с конфигурацией, уже прочитанной главным процессом (``config``),
+    либо прочитанной из ``config.yaml``.
+    """
+    container = ApplicationContainer()
+    if config is None:
+        container.config.from_yaml('config.yaml')
+        return container
+
+    container.config.from_dict(config)
+    if mp.get_start_method() != 'fork':
+        # процесс не унаследовал настройки логгера от главного процесса
+        setup_logging(container)
+    return container
+
+
 class CameraScannerProcess(mp.Process):
     """
     Процесс - источник событий с камеры.
     Общается с управляющим процессом через ``queue``.
+
+    Момент запуска процесса (``start``) передаётся в процесс для замера
+    времени до первого обработанного кадра.
     """
     def __init__(self, *args, **kwargs):
         super().__init__(
@@ -38,11 +66,18 @@ class CameraScannerProcess(mp.Process):
             daemon=True,
         )
 
+    def start(self) -> None:
+        self._kwargs['launch_time'] = time.monotonic()
+        super().start()
+
     @staticmethod
     def target(
             queue: mp.Queue,
             worker_id: int,
             *args,
+            shared_state: SharedScanningState = None,
+            config: dict = None,
+            launch_time: float = None,
             **kwargs,
     ) -> None:
         """
@@ -50,21 +85,33 @@ class CameraScannerProcess(mp.Process):
 
         Бесконечное читает QR-, штрихкоды с выбранной камеры
         и отправляет их данные базовому процессу через ``queue``.
+        Ожидаемое кол-во кодов и режим работы берёт из ``shared_state``.
+        Конфигурацию берёт из ``config`` (если передана), иначе читает ``config.yaml``.
 
         Кладёт в ``queue`` следующие события-наследники от ``CamScannerEvent``:
 
         - В случае ошибок экземпляр ``TaskError`` с информацией об ошибке.
         - В случае успешной обработки экземпляр ``CameraPackResult`` со считанными данными.
+        - Периодически (если включено) экземпляр ``CameraStageMetrics`` с метриками стадий обработки.
         """
         try:
-            container = ApplicationContainer()
-            container.config.from_yaml('config.yaml')
+            start_time = time.monotonic()
+            container = _get_container(config)
 
             video_path = container.scanning.video_path()
             show_video = container.scanning.show_video()
             auto_restart = container.scanning.auto_restart()
             recognizer = container.scanning.PackRecognizer()
             images_logger = container.scanning.ImagesSaver()
+            frame_source = container.scanning.FrameSource()
+            decode_pool = container.scanning.DecodePool()
+            frame_gate = container.scanning.FrameGate()
+            code_tracker = container.scanning.CodeTracker()
+            stage_metrics = container.scanning.StageMetrics()
+            lookback = container.scanning.FrameLookback()
+            logger.info(f"Процесс-камера {worker_id} подготовлен за {time.monotonic() - start_time:.2f} с, "
+                        f"RSS: {get_peak_rss_mb():.0f} МБ, "
+                        f"тяжёлые модули: {get_loaded_heavy_modules() or 'нет'}")
 
             events = get_events_from_video(
                 video_url=video_path,
@@ -72,12 +119,51 @@ class CameraScannerProcess(mp.Process):
                 images_logger=images_logger,
                 display_window=show_video,
                 auto_reconnect=auto_restart,
+                frame_source=frame_source,
+                decode_pool=decode_pool,
+                frame_gate=frame_gate,
+                code_tracker=code_tracker,
+                shared_state=shared_state,
+                stage_metrics=stage_metrics,
+                lookback=lookback,
+                launch_time=start_time if launch_time is None else launch_time,
             )
 
             # бесконечный цикл, который получает события от камеры и кладёт их в очередь
             for event in events:
                 # отправка события основному процессу
                 event.worker_id = worker_id
+                if isinstance(event, CameraPackResult):
+                    event.trace.mark('queued')
                 queue.put(event)
         except KeyboardInterrupt:
             pass
+
+
+class FrameCaptureProcess(mp.Process):
+    """
+    Процесс захвата видео для режима ``SharedMemory``.
+
+    Читает кадры с камеры и пишет их в кольцевой буффер в разделяемой памяти,
+    откуда их забирает ``CameraScannerProcess``. Медленное чтение кодов
+    в процессе-обработчике не останавливает захват.
+    """
+    def __init__(self, *, config: dict = None):
+        super().__init__(target=self.target, kwargs=dict(config=config), daemon=True)
+
+    @staticmethod
+    def target(config: dict = None) -> None:
+        """
+        Метод для запуска в отдельном процессе.
+
+        Бесконечно читает кадры с выбранной камеры в разделяемую память.
+        """
+        try:
+            container = _get_container(config)
+
+            video_path = container.scanning.video_path()
+            auto_restart = container.scanning.auto_restart()
+            frame_source = container.scanning.FrameSource()
+            frame_source.capture_forever(video_path, auto_reconnect=auto_restart)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,38 @@
+"""
+Состояние, разделяемое главным процессом и процессами-камерами.
+"""
+import multiprocessing as mp
+
+__all__ = ['SharedScanningState']
+
+
+class SharedScanningState:
+    """
+    Актуальные ожидаемое кол-во кодов и режим работы, которые главный процесс
+    получает от сервера, а процессы-камеры читают при обработке каждой пачки.
+
+    Хранятся в разделяемой памяти (``mp.Value``/``mp.Array``), поэтому чтение
+    не требует обмена сообщениями. Объект передаётся процессам при их создании.
+    """
+    _WORKMODE_SIZE = 32
+
+    def __init__(self, *, expected_codes_count: int = 2, workmode: str = 'auto'):
+        self._expected_codes_count = mp.Value('i', expected_codes_count)
+        self._workmode = mp.Array('c', self._WORKMODE_SIZE)
+        self.workmode = workmode
+
+    @property
+    def expected_codes_count(self) -> int:
+        return self._expected_codes_count.value
+
+    @expected_codes_count.setter
+    def expected_codes_count(self, value: int) -> None:
+        self._expected_codes_count.value = value
+
+    @property
+    def workmode(self) -> str:
+        return self._workmode.value.decode()
+
+    @workmode.setter
+    def workmode(self, value: str) -> None:
+        self._workmode.value = value.encode()[:self._WORKMODE_SIZE - 1]
@@ -0,0 +1,154 @@
+"""
+SNMP-запросы к устройствам (заслонке, датчику) без блокировки вызывающего кода.
+"""
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from loguru import logger
+
+__all__ = ['SnmpError', 'SnmpClient', 'get_snmp_client']
+
+
+class SnmpError(Exception):
+    """Устройство не ответило или вернуло ошибку"""
+
+
+class SnmpClient:
+    """
+    SNMP-клиент (v2c) для одного устройства.
+
+    Запросы выполняются по очереди в отдельном потоке ввода-вывода, который
+    один раз создаёт ``SnmpEngine`` и UDP-транспорт и использует их для всех запросов.
+    ``get_nowait``/``set_nowait`` сразу возвращают ``Future``, а ``get``/``set`` - его
+    ожидание в ``eventloop``, поэтому ни ``eventloop``, ни обработка кадров не блокируются.
+
+    Parameters:
+        host: адрес устройства
+        port: UDP-порт агента SNMP
+        community: SNMP community
+        timeout_sec: таймаут одной попытки запроса
+        retries: кол-во повторных попыток при отсутствии ответа
+    """
+    def __init__(
+            self,
+            *,
+            host: str,
+            port: int = 161,
+            community: str = 'public',
+            timeout_sec: float = 1,
+            retries: int = 2,
+    ):
+        # pysnmp долго импортируется - только если используется устройство с SNMP
+        import pysnmp.hlapi as snmp
+        self._snmp = snmp
+        self._HOST = host
+        self._PORT = port
+        self._COMMUNITY = community
+        self._TIMEOUT_SEC = timeout_sec
+        self._RETRIES = retries
+        self._requests: queue.Queue[Optional[tuple]] = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def get_nowait(self, oid: str) -> Future:
+        """Запрашивает значение ``oid``, результат - строковое значение"""
+        return self._submit(oid, None)
+
+    def set_nowait(self, oid: str, value: int) -> Future:
+        """Устанавливает целочисленное значение ``oid``"""
+        return self._submit(oid, value)
+
+    async def get(self, oid: str) -> str:
+        return await asyncio.wrap_future(self.get_nowait(oid))
+
+    async def set(self, oid: str, value: int) -> None:
+        await asyncio.wrap_future(self.set_nowait(oid, value))
+
+    def close(self) -> None:
+        """Останавливает поток ввода-вывода после выполнения уже поставленных запросов"""
+        with self._lock:
+            if self._thread is not None:
+                self._requests.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def _submit(self, oid: str, value: Optional[int]) -> Future:
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f'snmp-{self._HOST}:{self._PORT}', daemon=True,
+                )
+                self._thread.start()
+            self._requests.put((future, oid, value))
+        return future
+
+    def _run(self) -> None:
+        snmp = self._snmp
+        try:
+            engine = snmp.SnmpEngine()
+            community = snmp.CommunityData(self._COMMUNITY)
+            transport = snmp.UdpTransportTarget(
+                (self._HOST, self._PORT), timeout=self._TIMEOUT_SEC, retries=self._RETRIES,
+            )
+            context = snmp.ContextData()
+            setup_error = None
+        except Exception as e:
+            logger.error(f"Не удалось подготовить SNMP-запросы к {self._HOST}:{self._PORT}: {e!r}")
+            setup_error = e
+
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            future, oid, value = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if setup_error is not None:
+                    raise SnmpError(f"{self._HOST}: {setup_error!r}")
+                if value is None:
+                    command = snmp.getCmd(engine, community, transport, context,
+                                          snmp.ObjectType(snmp.ObjectIdentity(oid)))
+                else:
+                    command = snmp.setCmd(engine, community, transport, context,
+                                          snmp.ObjectType(snmp.ObjectIdentity(oid), snmp.Integer(value)))
+                error_indication, error_status, error_index, var_binds = next(command)
+                if error_indication:
+                    raise SnmpError(f"{self._HOST}: {error_indication}")
+                if error_status:
+                    raise SnmpError(f"{self._HOST}: {error_status.prettyPrint()} ({oid})")
+                future.set_result(var_binds[0][1].prettyPrint() if var_binds else None)
+            except Exception as e:
+                future.set_exception(e)
+
+
+_clients: dict[tuple, SnmpClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_snmp_client(
+        host: str,
+        *,
+        port: int = 161,
+        community: str = 'public',
+        timeout_sec: float = 1,
+        retries: int = 2,
+) -> SnmpClient:
+    """
+    Общий для процесса клиент устройства: компоненты одного процесса,
+    обращающиеся к одному устройству, используют один поток и ``SnmpEngine``
+    """
+    key = (os.getpid(), host, port, community, timeout_sec, retries)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            logger.debug(f"Создан SNMP-клиент для {host}:{port}")
+            client = _clients[key] = SnmpClient(
+                host=host, port=port, community=community, timeout_sec=timeout_sec, retries=retries,
+            )
+        return client
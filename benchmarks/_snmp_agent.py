@@ -0,0 +1,203 @@
+"""
+Заглушка SNMP-агента (v1/v2c) на локальном UDP-порту для проверки работы с заслонкой и датчиком
+без реальных устройств. Отвечает на ``GetRequest`` и ``SetRequest``, хранит значения в словаре.
+
+Может отвечать с задержкой и терять часть запросов - для проверки таймаутов и повторов.
+"""
+import random
+import socket
+import threading
+import time
+from typing import Optional
+
+__all__ = ['SnmpAgentStub', 'encode_message', 'decode_message']
+
+_INTEGER, _OCTET_STRING, _NULL, _OID, _SEQUENCE = 0x02, 0x04, 0x05, 0x06, 0x30
+_GET_REQUEST, _GET_RESPONSE, _SET_REQUEST = 0xA0, 0xA2, 0xA3
+_NO_SUCH_OBJECT = 0x80
+
+
+def _encode_tlv(tag: int, value: bytes) -> bytes:
+    length = len(value)
+    if length < 0x80:
+        return bytes([tag, length]) + value
+    length_bytes = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([tag, 0x80 | len(length_bytes)]) + length_bytes + value
+
+
+def _decode_tlv(data: bytes, offset: int = 0) -> tuple[int, bytes, int]:
+    """Возвращает тег, значение и смещение следующего элемента"""
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    return tag, data[offset:offset + length], offset + length
+
+
+def _decode_sequence(data: bytes) -> list[tuple[int, bytes]]:
+    items, offset = [], 0
+    while offset < len(data):
+        tag, value, offset = _decode_tlv(data, offset)
+        items.append((tag, value))
+    return items
+
+
+def _encode_integer(value: int) -> bytes:
+    return _encode_tlv(_INTEGER, value.to_bytes(max(1, (value.bit_length() + 8) // 8), 'big', signed=True))
+
+
+def _encode_oid(oid: str) -> bytes:
+    parts = [int(part) for part in oid.strip('.').split('.')]
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        body += bytes(reversed(chunk))
+    return _encode_tlv(_OID, bytes(body))
+
+
+def _decode_oid(value: bytes) -> str:
+    parts = [value[0] // 40, value[0] % 40]
+    number = 0
+    for byte in value[1:]:
+        number = (number << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(number)
+            number = 0
+    return '.'.join(map(str, parts))
+
+
+def encode_message(
+        pdu_type: int,
+        request_id: int,
+        var_binds: list[tuple[str, bytes]],
+        *,
+        community: str = 'public',
+        version: int = 1,
+        error_status: int = 0,
+        error_index: int = 0,
+) -> bytes:
+    """
+    Кодирует SNMP-сообщение. Значения ``var_binds`` - уже закодированные элементы
+    (например ``_encode_integer(1)`` или ``b'\\x05\\x00'`` для NULL)
+    """
+    var_binds_body = b''.join(
+        _encode_tlv(_SEQUENCE, _encode_oid(oid) + value) for oid, value in var_binds
+    )
+    pdu = _encode_tlv(pdu_type, (
+        _encode_integer(request_id)
+        + _encode_integer(error_status)
+        + _encode_integer(error_index)
+        + _encode_tlv(_SEQUENCE, var_binds_body)
+    ))
+    return _encode_tlv(_SEQUENCE, _encode_integer(version) + _encode_tlv(_OCTET_STRING, community.encode()) + pdu)
+
+
+def decode_message(data: bytes) -> dict:
+    """Декодирует SNMP-сообщение (значения ``var_binds`` остаются закодированными)"""
+    _, message, _ = _decode_tlv(data)
+    (_, version), (_, community), (pdu_type, pdu) = _decode_sequence(message)
+    (_, request_id), (_, error_status), (_, error_index), (_, var_binds) = _decode_sequence(pdu)
+    decoded_var_binds = []
+    for _, var_bind in _decode_sequence(var_binds):
+        (_, oid), (value_tag, value) = _decode_sequence(var_bind)
+        decoded_var_binds.append((_decode_oid(oid), _encode_tlv(value_tag, value)))
+    return {
+        'version': int.from_bytes(version, 'big', signed=True),
+        'community': community.decode(),
+        'pdu_type': pdu_type,
+        'request_id': int.from_bytes(request_id, 'big', signed=True),
+        'error_status': int.from_bytes(error_status, 'big', signed=True),
+        'var_binds': decoded_var_binds,
+    }
+
+
+class SnmpAgentStub:
+    """
+    SNMP-агент в отдельном потоке на ``host:port`` (``port=0`` - любой свободный).
+
+    Parameters:
+        values: начальные целочисленные значения по OID
+        delay_sec: задержка перед каждым ответом
+        drop_rate: доля запросов, оставляемых без ответа
+    """
+    def __init__(
+            self,
+            *,
+            host: str = '127.0.0.1',
+            port: int = 0,
+            values: Optional[dict[str, int]] = None,
+            delay_sec: float = 0,
+            drop_rate: float = 0,
+    ):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(0.1)
+        self.host, self.port = self._socket.getsockname()
+        self.delay_sec = delay_sec
+        self.drop_rate = drop_rate
+        self._values = {oid.strip('.'): _encode_integer(value) for oid, value in (values or {}).items()}
+        self.requests = 0
+        """кол-во полученных запросов (включая потерянные)"""
+        self.set_history: list[tuple[str, int]] = []
+        """OID и значения всех выполненных ``SetRequest``"""
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name='snmp-agent-stub', daemon=True)
+        self._thread.start()
+
+    def get_value(self, oid: str) -> Optional[int]:
+        value = self._values.get(oid.strip('.'))
+        if value is None:
+            return None
+        _, body, _ = _decode_tlv(value)
+        return int.from_bytes(body, 'big', signed=True)
+
+    def close(self) -> None:
+        self._running = False
+        self._thread.join()
+        self._socket.close()
+
+    def __enter__(self) -> 'SnmpAgentStub':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _serve(self) -> None:
+        while self._running:
+            try:
+                data, address = self._socket.recvfrom(65535)
+            except socket.timeout:
+                continue
+            self.requests += 1
+            if random.random() < self.drop_rate:
+                continue
+            try:
+                request = decode_message(data)
+            except (IndexError, ValueError):
+                continue
+            if self.delay_sec:
+                time.sleep(self.delay_sec)
+            self._socket.sendto(self._respond(request), address)
+
+    def _respond(self, request: dict) -> bytes:
+        var_binds = []
+        for oid, value in request['var_binds']:
+            if request['pdu_type'] == _SET_REQUEST:
+                self._values[oid] = value
+                self.set_history.append((oid, self.get_value(oid)))
+                var_binds.append((oid, value))
+            elif oid in self._values:
+                var_binds.append((oid, self._values[oid]))
+            else:
+                var_binds.append((oid, bytes([_NO_SUCH_OBJECT, 0])))
+        return encode_message(
+            _GET_RESPONSE, request['request_id'], var_binds,
+            community=request['community'], version=request['version'],
+        )
@@ -0,0 +1,28 @@
+"""
+Общие функции для бенчмарков.
+"""
+import glob
+import os
+
+import cv2
+import numpy as np
+
+from BarcodeQR_CamScanner.scanning.image_utils import get_resized
+
+IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg', '*.bmp')
+
+
+def load_images(path: str, sizer: float = None) -> list[np.ndarray]:
+    """
+    Загружает все изображения из папки (включая вложенные) в порядке имён файлов.
+    """
+    filepaths = sorted(
+        filepath
+        for pattern in IMAGE_PATTERNS
+        for filepath in glob.glob(os.path.join(path, '**', pattern), recursive=True)
+    )
+    images = [cv2.imread(filepath) for filepath in filepaths]
+    images = [image for image in images if image is not None]
+    if sizer is not None:
+        images = [get_resized(image, sizer=sizer) for image in images]
+    return images
@@ -0,0 +1,55 @@
+"""
+Сравнение времени чтения кодов с кадра: по всему кадру и только в найденных областях.
+
+Запуск из корня проекта::
+
+    python -m benchmarks.decode_localization ./pics --padding 0.15
+
+Кадры берутся из указанной папки (например, сохранённые ``ImagesBufferedSaver``)
+и читаются так же, как в ``get_events_from_video`` - с уменьшением в 2 раза.
+"""
+import argparse
+import statistics
+import time
+
+from BarcodeQR_CamScanner.scanning.code_reading import CodeType, get_codes_from_image
+from ._utils import load_images
+
+
+def _measure(images: list, **decode_kwargs) -> tuple[list[float], int]:
+    """Возвращает время чтения каждого кадра (мс) и общее кол-во прочитанных кодов"""
+    timings = []
+    codes_count = 0
+    for image in images:
+        start = time.perf_counter()
+        codes = get_codes_from_image(image, **decode_kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+        codes_count += len(codes[CodeType.QR_CODE]) + len(codes[CodeType.BARCODE])
+    return timings, codes_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='папка с сохранёнными кадрами')
+    parser.add_argument('--sizer', type=float, default=0.5, help='уменьшение кадров перед чтением')
+    parser.add_argument('--padding', type=float, default=0.15, help='отступ вокруг найденных областей')
+    args = parser.parse_args()
+
+    images = load_images(args.path, args.sizer)
+    if not images:
+        parser.error(f'в папке {args.path!r} нет изображений')
+
+    print(f'кадров: {len(images)}')
+    modes = {
+        'весь кадр': dict(localize=False),
+        'локализация': dict(localize=True, padding=args.padding),
+    }
+    for name, decode_kwargs in modes.items():
+        timings, codes_count = _measure(images, **decode_kwargs)
+        print(f'{name:>12}: среднее {statistics.mean(timings):7.2f} мс/кадр, '
+              f'медиана {statistics.median(timings):7.2f} мс/кадр, '
+              f'прочитано кодов: {codes_count}')
+
+
+if __name__ == '__main__':
+    main()
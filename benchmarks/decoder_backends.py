@@ -0,0 +1,79 @@
+"""
+Сравнение бэкендов чтения кодов на сохранённых кадрах: доля кадров с прочитанными кодами
+и перцентили времени чтения одного кадра.
+
+Запуск из корня проекта::
+
+    python -m benchmarks.decoder_backends ./pics --variants fixed
+
+Кадры читаются так же, как в ``get_events_from_video`` - с уменьшением в 2 раза
+и выбранным каскадом предобработки. Бэкенды, недоступные в установленной версии OpenCV, пропускаются.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from BarcodeQR_CamScanner.scanning.code_reading import DecodeCascade, read_codes
+from BarcodeQR_CamScanner.scanning.decoders import BaseCodesDecoder, OpenCVDecoder, PyzbarDecoder
+from ._utils import load_images
+
+BACKENDS = {
+    'pyzbar': lambda: PyzbarDecoder(),
+    'opencv-qr': lambda: OpenCVDecoder(barcodes=False),
+    'opencv-qr-aruco': lambda: OpenCVDecoder(aruco=True, barcodes=False),
+    'opencv-barcode': lambda: OpenCVDecoder(qr_codes=False),
+    'opencv': lambda: OpenCVDecoder(),
+}
+
+
+def _measure(images: list[np.ndarray], decoder: BaseCodesDecoder, variants: list[str]) -> dict:
+    cascade = DecodeCascade(variants, decoder=decoder, expected_count=1)
+    timings = []
+    frames_with_codes = 0
+    codes_count = 0
+    for image in images:
+        start = time.perf_counter()
+        decoded = read_codes(image, cascade=cascade)
+        timings.append((time.perf_counter() - start) * 1000)
+        frames_with_codes += len(decoded) > 0
+        codes_count += len(decoded)
+    p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+    return dict(
+        decode_rate=frames_with_codes / len(images),
+        codes=codes_count,
+        p50_ms=p50,
+        p90_ms=p90,
+        p99_ms=p99,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='папка с сохранёнными кадрами')
+    parser.add_argument('--sizer', type=float, default=0.5, help='уменьшение кадров перед чтением')
+    parser.add_argument('--variants', nargs='+', default=['fixed'],
+                        help='варианты предобработки (см. PreprocessVariant)')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS),
+                        help='сравниваемые бэкенды')
+    args = parser.parse_args()
+
+    images = load_images(args.path, args.sizer)
+    if not images:
+        parser.error(f'в папке {args.path!r} нет изображений')
+
+    print(f'кадров: {len(images)}, предобработка: {", ".join(args.variants)}')
+    for name in args.backends:
+        try:
+            decoder = BACKENDS[name]()
+        except (RuntimeError, ImportError, OSError) as e:
+            # бэкенд недоступен: нет нужной версии OpenCV, пакета pyzbar или библиотеки zbar
+            print(f'{name:>16}: пропущен ({e!r})')
+            continue
+        result = _measure(images, decoder, args.variants)
+        print(f'{name:>16}: кадров с кодами {result["decode_rate"]:6.1%}, кодов {result["codes"]:5}, '
+              f'p50 {result["p50_ms"]:7.2f} мс, p90 {result["p90_ms"]:7.2f} мс, p99 {result["p99_ms"]:7.2f} мс')
+
+
+if __name__ == '__main__':
+    main()
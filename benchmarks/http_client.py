@@ -0,0 +1,102 @@
+"""
+Пропускная способность отправки пар кодов: новая сессия ``aiohttp`` на каждый запрос
+(как было раньше) против одной долгоживущей сессии с пулом keep-alive соединений.
+
+Поднимает локальный HTTP-сервер с ``PUT /api/v1_0/new_pack_after_pintset`` и отправляет
+на него пары кодов через ``ApiV1SendCodesAnyway._send_codepair``. ``--concurrency`` -
+сколько пар отправляется одновременно (1 - по очереди, как в ``notify_*``).
+
+Запуск из корня проекта::
+
+    python -m benchmarks.http_client --requests 2000 --concurrency 1 8
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+from loguru import logger
+
+from BarcodeQR_CamScanner.networking.api_wrappers import ApiV1SendCodesAnyway
+
+
+class _SessionPerRequestApi(ApiV1SendCodesAnyway):
+    """Отправка пары кодов через новую сессию на каждый запрос (поведение до общей сессии)"""
+    async def _send_codepair(self, qr_code: str, barcode: str) -> None:
+        async with aiohttp.ClientSession() as session:
+            async with session.put(
+                    url=f'http://{self._domain}/api/v1_0/new_pack_after_pintset',
+                    json={'qr': qr_code, 'barcode': barcode},
+                    timeout=self._REQUEST_TIMEOUT_SEC,
+            ):
+                pass
+
+
+async def _start_server(host: str) -> tuple[web.AppRunner, str]:
+    async def new_pack(request: web.Request) -> web.Response:
+        await request.json()
+        return web.json_response({'status': 'ok'})
+
+    app = web.Application()
+    app.router.add_put('/api/v1_0/new_pack_after_pintset', new_pack)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'{host}:{port}'
+
+
+async def _measure(api: ApiV1SendCodesAnyway, requests: int, concurrency: int) -> float:
+    """Отправляет ``requests`` пар кодов не более чем по ``concurrency`` одновременно, возвращает req/s"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i: int) -> None:
+        async with semaphore:
+            await api._send_codepair(f'qr{i}', f'bar{i}')
+
+    await api.start()
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(requests)))
+        return requests / (time.perf_counter() - start)
+    finally:
+        await api.close()
+
+
+async def _main(args) -> None:
+    runner, domain = await _start_server(args.host)
+    try:
+        for concurrency in args.concurrency:
+            results = {}
+            for name, api_class in (('сессия на запрос', _SessionPerRequestApi),
+                                    ('общая сессия', ApiV1SendCodesAnyway)):
+                api = api_class(domain_url=domain, pool_size=args.pool_size)
+                results[name] = await _measure(api, args.requests, concurrency)
+            before, after = results.values()
+            print(f"одновременно {concurrency:>3}: "
+                  + ', '.join(f"{name} {rps:8.0f} req/s" for name, rps in results.items())
+                  + f", ускорение x{after / before:.2f}")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='кол-во отправляемых пар кодов')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8],
+                        help='сколько пар отправляется одновременно')
+    parser.add_argument('--pool-size', type=int, default=8, help='размер пула соединений общей сессии')
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args()
+
+    # отладочные сообщения о каждой паре кодов искажают замер
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    asyncio.run(_main(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""
+Сквозной бенчмарк обработки видео: прогоняет видеофайлы через ``get_events_from_video``
+с максимальной скоростью (без окна и без привязки к реальному времени)
+и выводит результат в JSON для сравнения между коммитами.
+
+Запуск из корня проекта::
+
+    python -m benchmarks.replay sample.mp4 --config config.yaml --output replay.json
+
+Распознаватель пачек, логгер изображений и параметры чтения кодов берутся из конфига,
+распознаватель и логгер можно переопределить (``--recognizer``, ``--images-logger``).
+
+Кроме видео можно прогонять сегменты ``.camseg``, сохранённые логгером ``SaveSegments``
+(кадры читаются из файла через ``np.memmap``)::
+
+    python -m benchmarks.replay segments/*.camseg --images-logger No
+
+Сегмент содержит кадры одной пачки, поэтому распознаватель пачек для него не используется:
+все кадры сегмента считаются кадрами пачки, а после них пачка уходит из кадра.
+Кадры сегмента уменьшены дважды: при обработке (``PACK_IMAGE_SIZER``) и логгером (``sizer``).
+Перед обработкой они возвращаются к размеру кадров камеры, чтобы после уменьшения
+при обработке коды читались с кадров того же размера, что и при записи.
+"""
+import argparse
+import json
+import subprocess
+import time
+from collections import Counter
+from typing import Iterable, Optional
+
+import cv2
+import numpy as np
+
+from BarcodeQR_CamScanner.di_containers import ApplicationContainer
+from BarcodeQR_CamScanner.models import CameraPackResult
+from BarcodeQR_CamScanner.scanning.decode_pool import CodesDecodePool, DecodedFrame
+from BarcodeQR_CamScanner.scanning.frame_sources import BaseFrameSource, DirectFrameSource
+from BarcodeQR_CamScanner.scanning.image_loggers import BaseImagesLogger
+from BarcodeQR_CamScanner.scanning.pack_recognition.recognizers import BaseRecognizer
+from BarcodeQR_CamScanner.scanning.segments import RAW_SEGMENT_EXTENSION, read_segment
+from BarcodeQR_CamScanner.scanning.video_processing import PACK_IMAGE_SIZER, get_events_from_video
+from BarcodeQR_CamScanner.shared_state import SharedScanningState
+
+
+class StageTimer:
+    """Суммарное время и кол-во вызовов каждой стадии обработки"""
+    def __init__(self):
+        self.total_sec = Counter()
+        self.calls = Counter()
+
+    def add(self, stage: str, start: float) -> None:
+        self.total_sec[stage] += time.perf_counter() - start
+        self.calls[stage] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            stage: {
+                'total_sec': round(total_sec, 4),
+                'calls': self.calls[stage],
+                'mean_ms': round(total_sec * 1000 / max(self.calls[stage], 1), 4),
+            } for stage, total_sec in self.total_sec.items()
+        }
+
+
+SEGMENT_END = np.zeros((1, 1, 3), dtype=np.uint8)
+"""Кадр, которым ``SegmentFrameSource`` отмечает конец сегмента (уход пачки)"""
+
+
+class SegmentFrameSource(BaseFrameSource):
+    """
+    Кадры из сегмента ``.camseg`` в размере кадров камеры и ``SEGMENT_END`` после них.
+
+    Parameters:
+        sizer: во сколько раз логгер уменьшил кадры пачки при записи (``None`` - из заголовка сегмента)
+    """
+    def __init__(self, sizer: Optional[float] = None):
+        super().__init__()
+        self._SIZER = sizer
+
+    def get_frames(self, video_url: str, *, auto_reconnect: bool) -> Iterable[np.ndarray]:
+        segment = read_segment(video_url)
+        sizer = (segment.sizer if self._SIZER is None else self._SIZER) * PACK_IMAGE_SIZER
+        for frame in segment.frames:
+            height, width = frame.shape[:2]
+            # ближайший сосед: при sizer логгера 1 уменьшение при обработке даёт в точности записанный кадр
+            yield cv2.resize(frame, (round(width / sizer), round(height / sizer)),
+                             interpolation=cv2.INTER_NEAREST)
+        yield SEGMENT_END
+
+
+class SegmentRecognizer(BaseRecognizer):
+    """Пачка есть на всех кадрах сегмента (``SegmentFrameSource``)"""
+    def is_recognized(self, image: np.ndarray) -> bool:
+        return image is not SEGMENT_END
+
+
+class TimedFrameSource(BaseFrameSource):
+    def __init__(self, frame_source: BaseFrameSource, timer: StageTimer):
+        super().__init__()
+        self._frame_source = frame_source
+        self._timer = timer
+
+    def get_frames(self, video_url: str, *, auto_reconnect: bool) -> Iterable[np.ndarray]:
+        frames = iter(self._frame_source.get_frames(video_url, auto_reconnect=auto_reconnect))
+        while True:
+            start = time.perf_counter()
+            image = next(frames, None)
+            if image is None:
+                return
+            if image is not SEGMENT_END:
+                self._timer.add('capture', start)
+            yield image
+
+
+class TimedRecognizer(BaseRecognizer):
+    def __init__(self, recognizer: BaseRecognizer, timer: StageTimer):
+        self._recognizer = recognizer
+        self._timer = timer
+
+    def is_recognized(self, image: np.ndarray) -> bool:
+        start = time.perf_counter()
+        recognized = self._recognizer.is_recognized(image)
+        self._timer.add('recognition', start)
+        return recognized
+
+    @property
+    def last_score(self) -> Optional[float]:
+        return self._recognizer.last_score
+
+
+class TimedImagesLogger(BaseImagesLogger):
+    def __init__(self, images_logger: BaseImagesLogger, timer: StageTimer):
+        self._images_logger = images_logger
+        self._timer = timer
+
+    def add(self, image: np.ndarray, *, score: Optional[float] = None) -> None:
+        start = time.perf_counter()
+        self._images_logger.add(image, score=score)
+        self._timer.add('logging', start)
+
+    def set_codes(self, codes: list[str]) -> None:
+        self._images_logger.set_codes(codes)
+
+    def save(self) -> None:
+        start = time.perf_counter()
+        self._images_logger.save()
+        self._timer.add('logging', start)
+
+    def clear(self) -> None:
+        self._images_logger.clear()
+
+
+class TimedDecodePool:
+    """
+    Время чтения кодов - время, на которое чтение задерживает цикл обработки,
+    и отдельно процессорное время потоков чтения.
+    """
+    def __init__(self, decode_pool: CodesDecodePool, timer: StageTimer):
+        self._decode_pool = decode_pool
+        self._timer = timer
+        self.cpu_time_sec = 0.0
+
+    def submit(self, image: np.ndarray, **kwargs) -> None:
+        start = time.perf_counter()
+        self._decode_pool.submit(image, **kwargs)
+        self._timer.add('decode', start)
+
+    def get_ready(self) -> list[DecodedFrame]:
+        return self._get_results(self._decode_pool.get_ready)
+
+    def get_all(self) -> list[DecodedFrame]:
+        return self._get_results(self._decode_pool.get_all)
+
+    def close(self) -> None:
+        self._decode_pool.close()
+
+    def _get_results(self, getter) -> list[DecodedFrame]:
+        start = time.perf_counter()
+        results = getter()
+        self._timer.total_sec['decode'] += time.perf_counter() - start
+        self.cpu_time_sec += sum(decoded_frame.cpu_time_sec for decoded_frame in results)
+        return results
+
+
+def _get_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='+', help='видеофайлы для прогона')
+    parser.add_argument('--config', default='config.yaml', help='конфиг программы')
+    parser.add_argument('--recognizer', help='распознаватель пачек (scanning.recognizing.using), кроме сегментов')
+    parser.add_argument('--images-logger', help='логгер изображений (scanning.images_logging.using)')
+    parser.add_argument('--expected-codes', type=int,
+                        help='ожидаемое кол-во кодов на пачке (без него коды читаются до ухода пачки)')
+    parser.add_argument('--segment-sizer', type=float,
+                        help='во сколько раз логгер уменьшил кадры сегментов (по умолчанию - из заголовка сегмента)')
+    parser.add_argument('--output', help='файл для JSON-результата (по умолчанию - stdout)')
+    args = parser.parse_args()
+
+    container = ApplicationContainer()
+    container.config.from_yaml(args.config)
+    if args.recognizer is not None:
+        container.config.scanning.recognizing.using.from_value(args.recognizer)
+    if args.images_logger is not None:
+        container.config.scanning.images_logging.using.from_value(args.images_logger)
+
+    shared_state = None
+    if args.expected_codes is not None:
+        shared_state = SharedScanningState(expected_codes_count=args.expected_codes)
+
+    timer = StageTimer()
+    packs: list[CameraPackResult] = []
+    decode_cpu_time_sec = 0.0
+    start = time.perf_counter()
+    for video_path in args.videos:
+        decode_pool = TimedDecodePool(container.scanning.DecodePool(), timer)
+        if video_path.endswith(RAW_SEGMENT_EXTENSION):
+            frame_source = TimedFrameSource(SegmentFrameSource(args.segment_sizer), timer)
+            recognizer = SegmentRecognizer()
+        else:
+            frame_source = TimedFrameSource(DirectFrameSource(), timer)
+            recognizer = container.scanning.PackRecognizer()
+        events = get_events_from_video(
+            video_url=video_path,
+            recognizer=TimedRecognizer(recognizer, timer),
+            images_logger=TimedImagesLogger(container.scanning.ImagesSaver(), timer),
+            display_window=False,
+            auto_reconnect=False,
+            frame_source=frame_source,
+            decode_pool=decode_pool,
+            frame_gate=container.scanning.FrameGate(),
+            code_tracker=container.scanning.CodeTracker(),
+            shared_state=shared_state,
+            lookback=container.scanning.FrameLookback(),
+        )
+        packs += [event for event in events if isinstance(event, CameraPackResult)]
+        decode_cpu_time_sec += decode_pool.cpu_time_sec
+        decode_pool.close()
+    elapsed_sec = time.perf_counter() - start
+    frames_count = timer.calls['capture']
+
+    codes_per_pack = [len(pack.codepairs) for pack in packs]
+    result = {
+        'commit': _get_commit(),
+        'videos': args.videos,
+        'frames': frames_count,
+        'elapsed_sec': round(elapsed_sec, 4),
+        'fps': round(frames_count / elapsed_sec, 2) if elapsed_sec > 0 else 0.0,
+        'stages': timer.to_dict(),
+        'decode_cpu_sec': round(decode_cpu_time_sec, 4),
+        'packs': len(packs),
+        'codes_per_pack': {
+            'mean': round(float(np.mean(codes_per_pack)), 3) if packs else 0.0,
+            'histogram': {str(count): packs_count
+                          for count, packs_count in sorted(Counter(codes_per_pack).items())},
+        },
+    }
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+
+
+if __name__ == '__main__':
+    main()
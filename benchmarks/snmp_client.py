@@ -0,0 +1,80 @@
+"""
+SNMP-запросы через ``SnmpClient`` к локальной заглушке агента: задержки запросов,
+доля успешных при потере пакетов и задержка ``eventloop`` во время запросов
+(она не должна расти вместе с задержкой ответа устройства).
+
+Запуск из корня проекта::
+
+    python -m benchmarks.snmp_client --requests 200 --delay 0.05 --drop-rate 0.1
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from loguru import logger
+
+from BarcodeQR_CamScanner.snmp_client import SnmpClient
+from ._snmp_agent import SnmpAgentStub
+
+OID = '1.3.6.1.4.1.40418.2.6.2.2.1.3.1.4'
+
+
+async def _measure_loop_lag(lags: list[float], stop: asyncio.Event, interval_sec: float = 0.01) -> None:
+    """Замеряет, насколько позже запланированного просыпается ``eventloop``"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval_sec)
+        lags.append(time.perf_counter() - start - interval_sec)
+
+
+async def _measure(client: SnmpClient, requests: int) -> dict:
+    lags, stop = [], asyncio.Event()
+    lag_task = asyncio.create_task(_measure_loop_lag(lags, stop))
+    timings, errors = [], 0
+    for i in range(requests):
+        start = time.perf_counter()
+        try:
+            if i % 2:
+                await client.get(OID)
+            else:
+                await client.set(OID, i % 4 // 2)
+            timings.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            logger.debug(f"Ошибка запроса: {e}")
+            errors += 1
+    stop.set()
+    await lag_task
+    return {
+        'ok': len(timings),
+        'errors': errors,
+        'latency_ms': {p: float(np.percentile(timings, p)) for p in (50, 90, 99)} if timings else {},
+        'max_loop_lag_ms': max(lags, default=0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=0.05, help='задержка ответа агента, с')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='доля запросов без ответа')
+    parser.add_argument('--timeout', type=float, default=0.5, help='таймаут одной попытки запроса, с')
+    parser.add_argument('--retries', type=int, default=2)
+    args = parser.parse_args()
+
+    with SnmpAgentStub(values={OID: 0}, delay_sec=args.delay, drop_rate=args.drop_rate) as agent:
+        client = SnmpClient(host=agent.host, port=agent.port, timeout_sec=args.timeout, retries=args.retries)
+        try:
+            result = asyncio.run(_measure(client, args.requests))
+        finally:
+            client.close()
+        print(f"запросов: {args.requests}, успешно: {result['ok']}, ошибок: {result['errors']}, "
+              f"получено агентом (с повторами): {agent.requests}")
+        print("задержка запроса (мс): " + ', '.join(
+            f"p{p} {value:.1f}" for p, value in result['latency_ms'].items()))
+        print(f"макс. задержка eventloop: {result['max_loop_lag_ms']:.1f} мс "
+              f"(задержка ответа агента {args.delay * 1000:.0f} мс)")
+
+
+if __name__ == '__main__':
+    main()
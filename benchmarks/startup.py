@@ -0,0 +1,83 @@
+"""
+Время запуска и память процесса для разных распознавателей пачек и сетевых обёрток.
+
+Каждая комбинация проверяется в отдельном чистом процессе: замеряется время импорта
+программы и создания выбранных компонентов, пиковый RSS и какие тяжёлые модули
+(``tensorflow``, ``skimage``, ``pysnmp`` и т.п.) оказались импортированы.
+
+Запуск из корня проекта::
+
+    python -m benchmarks.startup --config config.yaml --recognizers Background Neuronet --apis OnlySendCodes DropOnly
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+
+def _measure_child(config_path: str, recognizer: str, api: str) -> dict:
+    """Замер в текущем (дочернем) процессе"""
+    start = time.perf_counter()
+    from BarcodeQR_CamScanner.di_containers import ApplicationContainer
+    from BarcodeQR_CamScanner.process_stats import get_loaded_heavy_modules, get_peak_rss_mb
+    import_sec = time.perf_counter() - start
+
+    container = ApplicationContainer()
+    container.config.from_yaml(config_path)
+    container.config.scanning.recognizing.using.from_value(recognizer)
+    container.config.networking.commutication.using.from_value(api)
+    error = None
+    try:
+        container.scanning.PackRecognizer()
+        container.networking.NetworkApi()
+    except Exception as e:
+        error = f'{e.__class__.__name__}: {e}'
+    return {
+        'recognizer': recognizer,
+        'api': api,
+        'import_sec': round(import_sec, 3),
+        'startup_sec': round(time.perf_counter() - start, 3),
+        'peak_rss_mb': round(get_peak_rss_mb(), 1),
+        'heavy_modules': get_loaded_heavy_modules(),
+        'error': error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='config.yaml', help='конфиг программы')
+    parser.add_argument('--recognizers', nargs='+', default=['Background', 'Neuronet', 'Sensor'],
+                        help='распознаватели пачек (scanning.recognizing.using)')
+    parser.add_argument('--apis', nargs='+', default=['OnlySendCodes', 'DropOnly'],
+                        help='сетевые обёртки (networking.commutication.using)')
+    parser.add_argument('--output', help='файл для JSON-результата')
+    parser.add_argument('--child', nargs=2, metavar=('RECOGNIZER', 'API'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(_measure_child(args.config, *args.child)))
+        return
+
+    results = []
+    for recognizer in args.recognizers:
+        for api in args.apis:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.startup', '--config', args.config,
+                 '--child', recognizer, api],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{recognizer:>10} + {api:<16}: запуск {result['startup_sec']:6.2f} с "
+                  f"(импорт {result['import_sec']:5.2f} с), RSS {result['peak_rss_mb']:6.0f} МБ, "
+                  f"тяжёлые модули: {', '.join(result['heavy_modules']) or 'нет'}"
+                  + (f", ошибка: {result['error']}" if result['error'] else ''))
+
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,11 @@ import multiprocessing as mp
 from loguru import logger
 
 from BarcodeQR_CamScanner.di_containers import ApplicationContainer
+from BarcodeQR_CamScanner.launching import setup_logging, setup_start_method
 from BarcodeQR_CamScanner.networking.workers import AsyncMainWorker
-from BarcodeQR_CamScanner.scanning.workers import CameraScannerProcess
+from BarcodeQR_CamScanner.process_stats import get_loaded_heavy_modules, get_peak_rss_mb
+from BarcodeQR_CamScanner.scanning.workers import CameraScannerProcess, FrameCaptureProcess
+from BarcodeQR_CamScanner.shared_state import SharedScanningState
 
 
 def main():
@@ -13,17 +16,36 @@ def main():
     """
     container = ApplicationContainer()
     container.config.from_yaml('config.yaml')
-
-    log_path = container.networking.log_path()
-    log_level = container.networking.log_level()
-    logger.add(sink=log_path, level=log_level, rotation='2 MB', compression='zip')
+    setup_logging(container)
+    setup_start_method(
+        container.config.launching.start_method() or 'fork',
+        preload=container.config.launching.preload() or (),
+    )
+    # дочерние процессы получают уже прочитанную конфигурацию
+    config = container.config()
 
     queue = mp.Queue()
+    shared_state = SharedScanningState()
     api = container.networking.NetworkApi()
     consolidator = container.networking.CodesConsolidator()
-    async_worker = AsyncMainWorker(api=api, queue=queue, consolidator=consolidator)
-    camera_worker = CameraScannerProcess(queue, 1)
+    async_worker = AsyncMainWorker(
+        api=api,
+        queue=queue,
+        consolidator=consolidator,
+        shared_state=shared_state,
+        metrics_port=container.networking.metrics_port(),
+        latency_stats=container.networking.PackLatencyStats(),
+    )
+    logger.info(f"Главный процесс подготовлен, RSS: {get_peak_rss_mb():.0f} МБ, "
+                f"тяжёлые модули: {get_loaded_heavy_modules() or 'нет'}")
+    camera_worker = CameraScannerProcess(queue, 1, shared_state=shared_state, config=config)
+    # в режиме SharedMemory захват кадров идёт в отдельном процессе
+    capture_worker = None
+    if container.scanning.capturing_mode() == 'SharedMemory':
+        capture_worker = FrameCaptureProcess(config=config)
     try:
+        if capture_worker is not None:
+            capture_worker.start()
         camera_worker.start()
         async_worker.run_forever()
     except KeyboardInterrupt:
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def make_qr_frame():
+    """Кадр пачки с QR-кодами с заданными данными, расположенными в ряд"""
+    encoder = cv2.QRCodeEncoder.create()
+
+    def make(texts, *, shape=(480, 960, 3), module_px=6):
+        frame = np.full(shape, 170, dtype=np.uint8)
+        for i, text in enumerate(texts):
+            qr = cv2.resize(encoder.encode(text), None, fx=module_px, fy=module_px,
+                            interpolation=cv2.INTER_NEAREST)
+            x, y = 40 + i * 300, 100
+            frame[y:y + qr.shape[0], x:x + qr.shape[1]] = qr[..., None]
+        return frame
+    return make
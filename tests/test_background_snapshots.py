@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from BarcodeQR_CamScanner.scanning.pack_recognition.background_snapshots import (
+    BackgroundSnapshot, load_background_snapshot, save_background_snapshot,
+)
+from BarcodeQR_CamScanner.scanning.pack_recognition.recognizers import BSPackRecognizer
+
+THRESHOLD_SCORE = 0.65
+NOISE_SIGMA = 9
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def background(rng):
+    return rng.integers(60, 200, (60, 80, 3)).astype(np.float32)
+
+
+def _noisy(background, rng):
+    return np.clip(background + rng.normal(0, NOISE_SIGMA, background.shape), 0, 255).astype(np.uint8)
+
+
+def _make_recognizer(snapshot_path, learning_rate=1e-2):
+    return BSPackRecognizer(
+        activation_interval={'upper_bound': 15, 'lower_bound': -20},
+        threshold_score=THRESHOLD_SCORE,
+        learning_rate=learning_rate,
+        snapshot_path=str(snapshot_path),
+        snapshot_interval_sec=0,
+    )
+
+
+def test_restored_background_does_not_see_pack_on_noise(tmp_path, background, rng):
+    snapshot_path = tmp_path / 'background.npz'
+    recognizer = _make_recognizer(snapshot_path)
+    for _ in range(100):
+        recognizer.is_recognized(_noisy(background, rng))
+    assert snapshot_path.exists()
+
+    restored = _make_recognizer(snapshot_path)
+    scores = []
+    for _ in range(5):
+        assert not restored.is_recognized(_noisy(background, rng))
+        scores.append(restored.last_score)
+    assert max(scores) < 0.1
+
+
+def test_restored_background_recognizes_pack_like_original(tmp_path, background, rng):
+    snapshot_path = tmp_path / 'background.npz'
+    original = _make_recognizer(snapshot_path)
+    for _ in range(100):
+        original.is_recognized(_noisy(background, rng))
+    # фон выучен - дальше, как в работе, учимся медленно, чтобы пачка не стала фоном
+    original._LEARNING_RATE = 1e-4
+    restored = _make_recognizer(snapshot_path, learning_rate=1e-4)
+
+    pack = background.copy()
+    pack[2:58, 4:76] = 20
+    frames = [_noisy(background, rng) for _ in range(5)] + [_noisy(pack, rng) for _ in range(20)]
+    frames += [_noisy(background, rng) for _ in range(25)]
+    decisions = []
+    for frame in frames:
+        decisions.append(original.is_recognized(frame))
+        assert restored.is_recognized(frame) == decisions[-1]
+        assert abs(restored.last_score - original.last_score) < 0.05
+    assert True in decisions and not decisions[-1]
+
+
+def test_snapshot_without_frames_keeps_default_variance(tmp_path, background, rng):
+    snapshot_path = tmp_path / 'background.npz'
+    save_background_snapshot(str(snapshot_path), BackgroundSnapshot(
+        background=background.astype(np.uint8),
+        frame_shape=background.shape,
+        region=(0, 0, 1, 1),
+        sizer=1.0,
+    ))
+
+    restored = _make_recognizer(snapshot_path)
+    restored.is_recognized(_noisy(background, rng))
+    assert restored.last_score < THRESHOLD_SCORE
+
+
+def test_snapshot_roundtrip(tmp_path, background):
+    frames = np.zeros((3, 4, 5, 3), dtype=np.uint8)
+    snapshot = BackgroundSnapshot(background.astype(np.uint8), (8, 10, 3), (0, 0.5, 1, 1), 0.5, frames)
+    save_background_snapshot(str(tmp_path / 'b.npz'), snapshot)
+
+    loaded = load_background_snapshot(str(tmp_path / 'b.npz'))
+    assert loaded.is_compatible((8, 10, 3), (0, 0.5, 1, 1), 0.5)
+    assert np.array_equal(loaded.frames, frames)
+    assert np.array_equal(loaded.background, snapshot.background)
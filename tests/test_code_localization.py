@@ -0,0 +1,40 @@
+import cv2
+
+from BarcodeQR_CamScanner.scanning import code_reading
+from BarcodeQR_CamScanner.scanning.code_reading import DecodeCascade, find_code_regions, read_codes
+from BarcodeQR_CamScanner.scanning.decoders import OpenCVDecoder
+
+
+def _read(frame, *, localize):
+    cascade = DecodeCascade(['raw'], expected_count=2, decoder=OpenCVDecoder(barcodes=False))
+    return sorted(read_codes(frame, localize=localize, cascade=cascade))
+
+
+def test_regions_cover_qr_codes(make_qr_frame):
+    frame = make_qr_frame(['pack-1', 'pack-2'])
+    regions = find_code_regions(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+    for code in _read(frame, localize=False):
+        x, y, w, h = code.rect
+        assert any(rx <= x and ry <= y and x + w <= rx + rw and y + h <= ry + rh
+                   for rx, ry, rw, rh in regions)
+
+
+def test_localized_reading_gives_same_codes_as_full_frame(make_qr_frame):
+    for texts in (['pack-1', 'pack-2'], ['pack-3'], ['box-17', 'box-18', 'box-19']):
+        frame = make_qr_frame(texts)
+        full_frame = _read(frame, localize=False)
+        localized = _read(frame, localize=True)
+
+        assert sorted(code.data for code in full_frame) == sorted(texts)
+        assert [code.data for code in localized] == [code.data for code in full_frame]
+        for code, full_frame_code in zip(localized, full_frame):
+            assert all(abs(a - b) <= 2 for a, b in zip(code.rect, full_frame_code.rect))
+
+
+def test_full_frame_is_read_when_regions_are_false_positives(make_qr_frame, monkeypatch):
+    frame = make_qr_frame(['pack-1'])
+    # область без кода (например, блик или текстура упаковки)
+    monkeypatch.setattr(code_reading, 'find_code_regions', lambda grayscaled, padding: [(600, 300, 80, 80)])
+
+    assert [code.data for code in _read(frame, localize=True)] == ['pack-1']
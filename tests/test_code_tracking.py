@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+from BarcodeQR_CamScanner.scanning.code_reading import DecodeCascade, read_codes
+from BarcodeQR_CamScanner.scanning.code_tracking import CodeTracker
+from BarcodeQR_CamScanner.scanning.decoders import OpenCVDecoder
+
+TEXTS = ['pack-1', 'pack-2', 'pack-3']
+
+
+def _get_moving_pack_frames(step_px=40, width=640):
+    """Кадры пачки с QR-кодами на текстуре, сдвигающейся на ``step_px`` за кадр"""
+    rng = np.random.default_rng(0)
+    canvas = cv2.GaussianBlur(rng.integers(120, 220, (480, 1600), dtype=np.uint8), (7, 7), 0)
+    canvas = cv2.cvtColor(canvas, cv2.COLOR_GRAY2BGR)
+    encoder = cv2.QRCodeEncoder.create()
+    for i, text in enumerate(TEXTS):
+        qr = cv2.resize(encoder.encode(text), None, fx=6, fy=6, interpolation=cv2.INTER_NEAREST)
+        x = 80 + i * 450
+        canvas[100:100 + qr.shape[0], x:x + qr.shape[1]] = qr[..., None]
+    return [canvas[:, shift:shift + width].copy() for shift in range(0, canvas.shape[1] - width, step_px)]
+
+
+def test_tracked_codes_are_read_once_and_match_sequential_decoding():
+    decoder = OpenCVDecoder(barcodes=False)
+    frames = _get_moving_pack_frames()
+    sequential = set()
+    for frame in frames:
+        cascade = DecodeCascade(['raw'], expected_count=len(TEXTS), decoder=decoder)
+        sequential |= {code.data for code in read_codes(frame, cascade=cascade)}
+
+    tracker = CodeTracker(enabled=True)
+    tracked = []
+    for frame in frames:
+        frame_index = tracker.advance(frame)
+        known = tracker.get_visible(frame_index, frame.shape)
+        cascade = DecodeCascade(['raw'], expected_count=1, decoder=decoder)
+        decoded = read_codes(frame, cascade=cascade, known=known, expected=(1, 0))
+        tracker.add(frame_index, decoded)
+        tracked += [code.data for code in decoded]
+
+    assert sequential == set(TEXTS)
+    assert sorted(tracked) == TEXTS
+
+
+def _get_pack_over_static_background_frames(step_px=60, width=1280, height=960):
+    """Кадры с небольшой пачкой (карточка с QR-кодами), движущейся по неподвижному фону"""
+    rng = np.random.default_rng(0)
+    background = cv2.resize(rng.integers(0, 255, (height // 40, width // 40), dtype=np.uint8),
+                            (width, height), interpolation=cv2.INTER_NEAREST)
+    background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+    encoder = cv2.QRCodeEncoder.create()
+    card = np.full((150, 820, 3), 235, dtype=np.uint8)
+    for i, text in enumerate(TEXTS):
+        qr = cv2.resize(encoder.encode(text), None, fx=5, fy=5, interpolation=cv2.INTER_NEAREST)
+        card[20:20 + qr.shape[0], 10 + i * 300:10 + i * 300 + qr.shape[1]] = qr[..., None]
+
+    frames = []
+    for card_x in range(width - 130, -card.shape[1], -step_px):
+        frame = background.copy()
+        x1, x2 = max(card_x, 0), min(card_x + card.shape[1], width)
+        frame[400:550, x1:x2] = card[:, x1 - card_x:x2 - card_x]
+        frames.append(frame)
+    return frames
+
+
+def test_tracked_codes_follow_pack_over_static_background():
+    decoder = OpenCVDecoder(barcodes=False)
+    tracker = CodeTracker(enabled=True)
+    tracked = []
+    for frame in _get_pack_over_static_background_frames():
+        cascade = DecodeCascade(['raw'], expected_count=len(TEXTS), decoder=decoder)
+        visible = {code.data: code.rect for code in read_codes(frame, cascade=cascade)}
+
+        frame_index = tracker.advance(frame)
+        known = tracker.get_visible(frame_index, frame.shape)
+        cascade = DecodeCascade(['raw'], expected_count=1, decoder=decoder)
+        decoded = read_codes(frame, cascade=cascade, known=known, expected=(1, 0))
+        tracker.add(frame_index, decoded)
+        tracked += [code.data for code in decoded]
+
+        # области известных кодов не остаются на месте, закрывая ещё не прочитанные коды
+        assert set(visible) <= {code.data for code in known + decoded}
+        for code in known:
+            if code.data in visible:
+                x, y, w, h = visible[code.data]
+                known_x, known_y, known_w, known_h = code.rect
+                assert known_x < x + w and x < known_x + known_w
+                assert known_y < y + h and y < known_y + known_h
+    assert sorted(tracked) == TEXTS
@@ -0,0 +1,51 @@
+import asyncio
+
+from BarcodeQR_CamScanner.networking.codes_submission import CodepairRejected, CodepairsSubmitter, SendStatus
+
+
+def test_ordered_sends_one_by_one_and_stops_at_failure():
+    sent, active = [], []
+
+    async def send_codepair(qr_code: str, barcode: str) -> None:
+        active.append(qr_code)
+        assert len(active) == 1
+        await asyncio.sleep(0.001)
+        active.remove(qr_code)
+        if qr_code == 'q2':
+            raise RuntimeError('backend error')
+        sent.append(qr_code)
+
+    submitter = CodepairsSubmitter(send_codepair, max_in_flight=4, ordered=True)
+    codepairs = [(f'q{i}', f'b{i}') for i in range(5)]
+    results = asyncio.run(submitter.submit(codepairs))
+
+    assert results == [SendStatus.SENT] * 2 + [SendStatus.FAILED] + [SendStatus.SKIPPED] * 2
+    assert sent == ['q0', 'q1']
+    assert (submitter.sent, submitter.failed, submitter.queued, submitter.in_flight) == (2, 1, 0, 0)
+
+
+def test_unordered_respects_in_flight_window():
+    in_flight, max_seen = [0], [0]
+
+    async def send_codepair(qr_code: str, barcode: str) -> None:
+        in_flight[0] += 1
+        max_seen[0] = max(max_seen[0], in_flight[0])
+        await asyncio.sleep(0.001)
+        in_flight[0] -= 1
+
+    submitter = CodepairsSubmitter(send_codepair, max_in_flight=3, ordered=False)
+    results = asyncio.run(submitter.submit([(f'q{i}', f'b{i}') for i in range(10)]))
+
+    assert results == [SendStatus.SENT] * 10
+    assert max_seen[0] == 3
+
+
+def test_rejected_codepair_does_not_stop_ordered_pack():
+    async def send_codepair(qr_code: str, barcode: str) -> None:
+        if qr_code == 'q1':
+            raise CodepairRejected('400 Bad Request')
+
+    submitter = CodepairsSubmitter(send_codepair, ordered=True)
+    results = asyncio.run(submitter.submit([(f'q{i}', f'b{i}') for i in range(3)]))
+
+    assert results == [SendStatus.SENT, SendStatus.REJECTED, SendStatus.SENT]
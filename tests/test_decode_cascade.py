@@ -0,0 +1,69 @@
+import numpy as np
+
+from BarcodeQR_CamScanner.scanning.code_reading import DecodeCascade, read_codes
+from BarcodeQR_CamScanner.scanning.decoders import BaseCodesDecoder, CodeType, DecodedCode, OpenCVDecoder
+
+QR_1 = DecodedCode(CodeType.QR_CODE.value, 'qr-1', (10, 10, 20, 20))
+QR_2 = DecodedCode(CodeType.QR_CODE.value, 'qr-2', (60, 10, 20, 20))
+EAN_1 = DecodedCode(CodeType.BARCODE.value, '4600000000001', (10, 50, 40, 15))
+
+
+class SceneDecoder(BaseCodesDecoder):
+    """Возвращает коды сцены, области которых не закрашены белым"""
+    def __init__(self, codes):
+        self.codes = codes
+        self.calls = 0
+
+    def decode(self, grayscaled):
+        self.calls += 1
+        return [
+            code for code in self.codes
+            if (grayscaled[code.rect[1]:code.rect[1] + code.rect[3],
+                           code.rect[0]:code.rect[0] + code.rect[2]] != 255).any()
+        ]
+
+
+def _frame():
+    return np.zeros((80, 100, 3), dtype=np.uint8)
+
+
+def test_known_codes_do_not_stop_cascade():
+    decoder = SceneDecoder([QR_1, QR_2, EAN_1])
+    cascade = DecodeCascade(['raw', 'otsu'], expected_count=1, decoder=decoder)
+
+    decoded = read_codes(_frame(), cascade=cascade, known=[QR_1, EAN_1])
+
+    assert decoder.calls >= 1
+    assert decoded == [QR_2]
+
+
+def test_cascade_stops_when_expected_new_codes_found():
+    decoder = SceneDecoder([QR_1, EAN_1])
+    cascade = DecodeCascade(['raw', 'otsu'], expected_count=1, decoder=decoder)
+
+    decoded = read_codes(_frame(), cascade=cascade)
+
+    assert decoder.calls == 1
+    assert decoded == [QR_1, EAN_1]
+    assert cascade.stats['otsu'].attempts == 0
+
+
+def test_expected_overrides_cascade_count():
+    decoder = SceneDecoder([QR_1, QR_2, EAN_1])
+    cascade = DecodeCascade(['raw', 'otsu'], expected_count=1, decoder=decoder)
+
+    decoded = read_codes(_frame(), cascade=cascade, known=[QR_1], expected=(2, 1))
+
+    assert decoder.calls == 2
+    assert decoded == [QR_2, EAN_1]
+
+
+def test_cascade_reads_same_codes_as_single_variant(make_qr_frame):
+    decoder = OpenCVDecoder(barcodes=False)
+    for texts in (['pack-1', 'pack-2'], ['pack-3']):
+        frame = make_qr_frame(texts)
+        for variant in ('raw', 'fixed'):
+            single = read_codes(frame, cascade=DecodeCascade([variant], expected_count=2, decoder=decoder))
+            cascade = DecodeCascade(['raw', 'otsu'], expected_count=2, decoder=decoder)
+            assert sorted(read_codes(frame, cascade=cascade)) == sorted(single)
+            assert sorted(code.data for code in single) == texts
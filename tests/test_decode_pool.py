@@ -0,0 +1,29 @@
+from BarcodeQR_CamScanner.scanning.code_reading import DecodeCascade, read_codes
+from BarcodeQR_CamScanner.scanning.decode_pool import CodesDecodePool
+from BarcodeQR_CamScanner.scanning.decoders import OpenCVDecoder
+
+PACKS = [['pack-1', 'pack-2'], ['pack-3'], ['pack-4', 'pack-5'], ['pack-6', 'pack-7'], ['pack-8']]
+
+
+def _decode_with_pool(frames, workers):
+    cascade = DecodeCascade(['raw'], expected_count=2, decoder=OpenCVDecoder(barcodes=False))
+    pool = CodesDecodePool(workers=workers, max_pending=2, cascade=cascade)
+    try:
+        for i, frame in enumerate(frames):
+            pool.submit(frame, tag=i)
+        return pool.get_all()
+    finally:
+        pool.close()
+
+
+def test_pool_reads_same_codes_in_order_as_sequential_decoding(make_qr_frame):
+    frames = [make_qr_frame(texts) for texts in PACKS]
+    cascade = DecodeCascade(['raw'], expected_count=2, decoder=OpenCVDecoder(barcodes=False))
+    # порядок нескольких QR-кодов одного кадра у детектора OpenCV не определён
+    sequential = [sorted(read_codes(frame, cascade=cascade)) for frame in frames]
+
+    for workers in (1, 3):
+        decoded_frames = _decode_with_pool(frames, workers)
+        assert [decoded.tag for decoded in decoded_frames] == list(range(len(frames)))
+        assert [sorted(decoded.decoded) for decoded in decoded_frames] == sequential
+    assert [[code.data for code in codes] for codes in sequential] == PACKS
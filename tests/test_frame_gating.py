@@ -0,0 +1,42 @@
+import numpy as np
+
+from BarcodeQR_CamScanner.scanning.frame_gating import FrameChangeGate
+
+
+def _get_frame(value: int) -> np.ndarray:
+    frame = np.full((120, 160, 3), 100, dtype=np.uint8)
+    frame[40:80, 60:100] = value
+    return frame
+
+
+def test_identical_frames_are_gated():
+    gate = FrameChangeGate(threshold=0.01)
+
+    assert gate.is_changed(_get_frame(200))
+    assert not gate.is_changed(_get_frame(200))
+    assert not gate.is_changed(_get_frame(200))
+    assert (gate.checked, gate.skipped) == (3, 2)
+
+
+def test_changed_frame_passes():
+    gate = FrameChangeGate(threshold=0.01)
+
+    assert gate.is_changed(_get_frame(200))
+    assert gate.is_changed(_get_frame(0))
+    assert not gate.is_changed(_get_frame(0))
+
+
+def test_reset_clears_reference_frame():
+    gate = FrameChangeGate(threshold=0.01)
+    gate.is_changed(_get_frame(200))
+
+    gate.reset()
+
+    assert gate.is_changed(_get_frame(200))
+
+
+def test_zero_threshold_passes_all_frames():
+    gate = FrameChangeGate(threshold=0)
+
+    assert all(gate.is_changed(_get_frame(200)) for _ in range(3))
+    assert gate.skipped == 0
@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+
+from BarcodeQR_CamScanner.scanning.pack_recognition import recognizers
+
+
+class _SlowInterpreter:
+    """Интерпретатор TF-Lite, предсказывающий за ``INVOKE_SEC`` среднюю яркость входа"""
+    INVOKE_SEC = 0.02
+
+    def __init__(self, *, model_path: str, num_threads: int):
+        self._input = None
+
+    def allocate_tensors(self) -> None:
+        pass
+
+    def get_input_details(self) -> list[dict]:
+        return [{'shape': np.array([1, 8, 16, 3]), 'index': 0}]
+
+    def get_output_details(self) -> list[dict]:
+        return [{'index': 1}]
+
+    def set_tensor(self, index: int, value: np.ndarray) -> None:
+        self._input = value.copy()
+
+    def invoke(self) -> None:
+        time.sleep(self.INVOKE_SEC)
+
+    def get_tensor(self, index: int) -> np.ndarray:
+        return np.array([[self._input.mean()]])
+
+
+def _feed(recognizer, image: np.ndarray, duration_sec: float) -> int:
+    frames = 0
+    finish_time = time.monotonic() + duration_sec
+    while time.monotonic() < finish_time:
+        recognizer.is_recognized(image)
+        frames += 1
+        time.sleep(0.001)
+    return frames
+
+
+def test_frames_are_skipped_during_inference_and_interval(monkeypatch):
+    monkeypatch.setattr(recognizers, '_get_interpreter_class', lambda: _SlowInterpreter)
+    resized = []
+    original_resize = recognizers.cv2.resize
+    monkeypatch.setattr(recognizers.cv2, 'resize',
+                        lambda *args, **kwargs: resized.append(1) or original_resize(*args, **kwargs))
+    recognizer = recognizers.NeuronetPackRecognizer(model_path='', threshold_score=0.5, min_interval_sec=0.05)
+
+    frames = _feed(recognizer, np.full((80, 160, 3), 255, dtype=np.uint8), duration_sec=0.5)
+    time.sleep(0.1)
+
+    # не чаще раза в (предсказание + пауза), и уменьшаются только переданные нейросети кадры
+    assert 3 <= recognizer.inferences <= 0.5 / 0.07 + 1
+    assert len(resized) == recognizer.inferences
+    assert recognizer.skipped == frames - recognizer.inferences
+    assert recognizer.is_recognized(np.zeros((80, 160, 3), dtype=np.uint8))
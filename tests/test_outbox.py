@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from BarcodeQR_CamScanner.networking.codes_submission import SendStatus
+from BarcodeQR_CamScanner.networking.outbox import OutboxCodepair, SqliteCodesOutbox
+
+
+class _Backend:
+    """Отвечает на отправку пар по заданным результатам (по умолчанию - успешно)"""
+    def __init__(self, statuses: dict[str, list[SendStatus]] = None):
+        self.statuses = statuses or {}
+        self.calls: list[list[str]] = []
+
+    async def submit(self, codepairs: list[OutboxCodepair]) -> list[SendStatus]:
+        self.calls.append([codepair.qr_code for codepair in codepairs])
+        results = []
+        for codepair in codepairs:
+            planned = self.statuses.get(codepair.qr_code)
+            results.append(planned.pop(0) if planned else SendStatus.SENT)
+        return results
+
+
+def _get_outbox(tmp_path, **kwargs) -> SqliteCodesOutbox:
+    kwargs = {'backoff_base_sec': 0.01, 'backoff_max_sec': 0.01, 'stats_interval_sec': 0, **kwargs}
+    return SqliteCodesOutbox(path=str(tmp_path / 'outbox.sqlite3'), **kwargs)
+
+
+def _drain(outbox: SqliteCodesOutbox, backend: _Backend, timeout_sec: float = 0.3) -> None:
+    async def drain():
+        try:
+            await asyncio.wait_for(outbox.drain_forever(backend.submit), timeout_sec)
+        except asyncio.TimeoutError:
+            pass
+    asyncio.run(drain())
+
+
+def test_codepairs_survive_reopen(tmp_path):
+    outbox = _get_outbox(tmp_path)
+    outbox.put([('q1', 'b1'), ('q2', 'b2')])
+    outbox.close()
+
+    outbox = _get_outbox(tmp_path)
+    assert outbox.get_pending_count() == 2
+    backend = _Backend()
+    _drain(outbox, backend)
+    assert backend.calls == [['q1', 'q2']]
+    assert outbox.get_pending_count() == 0
+    outbox.close()
+
+
+def test_packs_are_sent_in_order_after_failure(tmp_path):
+    outbox = _get_outbox(tmp_path)
+    outbox.put([('q1', 'b1'), ('q2', 'b2')])
+    outbox.put([('q3', 'b3')])
+    backend = _Backend({'q2': [SendStatus.FAILED]})
+    _drain(outbox, backend)
+
+    # вторая пачка не обгоняет первую, пока та не отправлена
+    assert backend.calls == [['q1', 'q2'], ['q2'], ['q3']]
+    assert outbox.get_pending_count() == 0
+    outbox.close()
+
+
+def test_skipped_codepairs_keep_attempts(tmp_path):
+    outbox = _get_outbox(tmp_path, max_attempts=2)
+    outbox.put([('q1', 'b1'), ('q2', 'b2')])
+    backend = _Backend({'q1': [SendStatus.FAILED] * 2, 'q2': [SendStatus.SKIPPED] * 2})
+    _drain(outbox, backend)
+
+    # непереданная пара не тратит попытки и отправляется после переноса первой в dead_codepairs
+    assert backend.calls == [['q1', 'q2'], ['q1', 'q2'], ['q2']]
+    assert outbox.get_pending_count() == 0
+    assert outbox.get_dead_count() == 1
+    outbox.close()
+
+
+def test_backoff_delays_retry(tmp_path):
+    outbox = _get_outbox(tmp_path, backoff_base_sec=10, backoff_max_sec=10)
+    outbox.put([('q1', 'b1')])
+    backend = _Backend({'q1': [SendStatus.FAILED]})
+    _drain(outbox, backend, timeout_sec=0.2)
+
+    assert backend.calls == [['q1']]
+    assert outbox.get_pending_count() == 1
+    assert outbox._get_next_attempt_delay() == pytest.approx(10, abs=1)
+    outbox.close()
+
+
+def test_dead_letter_after_max_attempts_unblocks_queue(tmp_path):
+    outbox = _get_outbox(tmp_path, max_attempts=3)
+    outbox.put([('q1', 'b1')])
+    outbox.put([('q2', 'b2')])
+    backend = _Backend({'q1': [SendStatus.FAILED] * 10})
+    _drain(outbox, backend)
+
+    assert backend.calls == [['q1']] * 3 + [['q2']]
+    assert outbox.get_pending_count() == 0
+    assert outbox.get_dead_count() == 1
+    outbox.close()
+
+
+def test_rejected_codepair_is_not_retried(tmp_path):
+    outbox = _get_outbox(tmp_path)
+    outbox.put([('q1', 'b1'), ('q2', 'b2')])
+    backend = _Backend({'q1': [SendStatus.REJECTED]})
+    _drain(outbox, backend)
+
+    assert backend.calls == [['q1', 'q2']]
+    assert outbox.get_pending_count() == 0
+    assert outbox._db.execute('SELECT qr_code, reason, attempts FROM dead_codepairs').fetchall() == [
+        ('q1', 'rejected', 1),
+    ]
+    outbox.close()
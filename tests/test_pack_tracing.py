@@ -0,0 +1,35 @@
+from BarcodeQR_CamScanner.models import PackTrace
+from BarcodeQR_CamScanner.networking.pack_tracing import PackLatencyStats
+
+
+def _get_trace(**marks: float) -> PackTrace:
+    return PackTrace(marks=dict(marks))
+
+
+def test_hops_in_pipeline_order():
+    stats = PackLatencyStats()
+    stats.add(_get_trace(left_frame=0.0, decoded=0.1, queued=0.15, dequeued=0.2, validated=0.3, sent=0.5))
+
+    percentiles = stats.get_percentiles()
+    assert percentiles['decoded'][50] == 0.1
+    assert abs(percentiles['sent'][50] - 0.2) < 1e-9
+    assert percentiles['total'][50] == 0.5
+
+
+def test_drop_requested_before_send():
+    stats = PackLatencyStats()
+    stats.add(_get_trace(left_frame=0.0, validated=0.3, drop_requested=0.35, committed=0.4, sent=0.6))
+
+    percentiles = stats.get_percentiles()
+    latencies = {hop: values[50] for hop, values in percentiles.items()}
+    assert all(latency >= 0 for latency in latencies.values())
+    assert abs(latencies['drop_requested'] - 0.05) < 1e-9
+    assert abs(latencies['committed'] - 0.05) < 1e-9
+    assert abs(latencies['sent'] - 0.2) < 1e-9
+    assert latencies['total'] == 0.6
+
+
+def test_single_hop_is_ignored():
+    stats = PackLatencyStats()
+    stats.add(_get_trace(left_frame=0.0))
+    assert stats.get_percentiles() == {}
@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+from BarcodeQR_CamScanner.scanning.image_loggers import SegmentImagesSaver
+from BarcodeQR_CamScanner.scanning.segments import RAW_SEGMENT_EXTENSION, read_segment
+
+
+def _get_frame(value: int) -> np.ndarray:
+    return np.full((40, 60, 3), value, dtype=np.uint8)
+
+
+def test_packs_saved_in_one_second_are_kept(tmp_path):
+    saver = SegmentImagesSaver(str(tmp_path), sizer=0.5, queue_size=0)
+    for value in (10, 20):
+        saver.add(_get_frame(value), score=0.9)
+        saver.set_codes([f'code{value}'])
+        saver.save()
+
+    filenames = sorted(os.listdir(tmp_path))
+    assert len(filenames) == 2
+    segment = read_segment(str(tmp_path / filenames[0]))
+    assert filenames[0].endswith(RAW_SEGMENT_EXTENSION)
+    assert segment.codes == ['code10']
+    assert segment.sizer == 0.5
+    assert segment.frames[0].shape == (20, 30, 3)
+
+
+def test_frames_over_memory_budget_are_dropped(tmp_path):
+    frame_bytes = _get_frame(0).nbytes
+    saver = SegmentImagesSaver(str(tmp_path), sizer=1.0, queue_size=0,
+                               memory_budget_mb=2.5 * frame_bytes / 1024 / 1024)
+    for value in range(4):
+        saver.add(_get_frame(value))
+    saver.save()
+
+    assert (saver.saved, saver.dropped) == (2, 2)
+    # память освобождается после записи
+    saver.add(_get_frame(0))
+    assert saver.dropped == 2
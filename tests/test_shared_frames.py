@@ -0,0 +1,91 @@
+import threading
+import uuid
+from multiprocessing import resource_tracker
+
+import numpy as np
+import pytest
+
+from BarcodeQR_CamScanner.scanning.shared_frames import SharedFrameRing
+
+_SHAPE = (24, 32, 3)
+
+
+@pytest.fixture
+def rings():
+    name = f'test_ring_{uuid.uuid4().hex[:8]}'
+    writer = SharedFrameRing(name, slots=3, shape=_SHAPE, create=True)
+    reader = SharedFrameRing(name, slots=3, shape=_SHAPE)
+    # читатель снимает блок с учёта, а в тесте он в одном процессе с писателем
+    resource_tracker.register(writer._shm._name, 'shared_memory')
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def _get_frame(value: int) -> np.ndarray:
+    return np.full(_SHAPE, value, dtype=np.uint8)
+
+
+def test_latest_frame_is_acquired_and_overruns_counted(rings):
+    writer, reader = rings
+    assert reader.acquire_latest() is None
+
+    for value in (1, 2, 3, 4):
+        writer.write(_get_frame(value), grab_time=value)
+    seq, grab_time, frame = reader.acquire_latest()
+    assert (seq, grab_time) == (4, 4)
+    assert np.all(frame == 4)
+    assert reader.release()
+    assert reader.acquire_latest() is None
+
+    stats = reader.get_stats()
+    assert (stats.written, stats.read, stats.occupancy) == (4, 4, 0)
+    assert stats.overruns == 1
+
+
+def test_writer_skips_held_slot(rings):
+    writer, reader = rings
+    writer.write(_get_frame(1))
+    _, _, frame = reader.acquire_latest()
+    for value in range(2, 10):
+        writer.write(_get_frame(value))
+
+    assert np.all(frame == 1)
+    assert reader.release()
+
+
+def test_slot_rewritten_during_processing_is_detected(rings):
+    writer, reader = rings
+    writer.write(_get_frame(1))
+    seq, _, _ = reader.acquire_latest()
+    # писатель не увидел захват слота (нет барьеров памяти) и начал в него запись
+    writer._slot_seqs[writer._header[writer._LATEST_SLOT]] = -1
+
+    assert not reader.release()
+    assert reader.get_stats().torn == 1
+
+
+def test_concurrent_writer_never_gives_mixed_frames(rings):
+    writer, reader = rings
+    frames_count = 2000
+
+    def write_frames():
+        for value in range(1, frames_count + 1):
+            writer.write(_get_frame(value % 256), grab_time=value)
+        writer.finish()
+
+    thread = threading.Thread(target=write_frames)
+    thread.start()
+    last_seq = 0
+    while not (writer.is_finished and reader.get_stats().read == frames_count):
+        acquired = reader.acquire_latest()
+        if acquired is None:
+            continue
+        seq, grab_time, frame = acquired
+        is_uniform = bool(np.all(frame == seq % 256))
+        assert seq > last_seq
+        assert grab_time == seq
+        assert reader.release() and is_uniform
+        last_seq = seq
+    thread.join()
+    assert reader.get_stats().torn == 0
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('pysnmp.hlapi')
+
+from benchmarks._snmp_agent import SnmpAgentStub  # noqa: E402
+from BarcodeQR_CamScanner.snmp_client import SnmpClient, SnmpError  # noqa: E402
+
+OID = '1.3.6.1.4.1.40418.2.6.2.2.1.3.1.4'
+
+
+@pytest.fixture
+def agent():
+    with SnmpAgentStub(values={OID: 0}) as agent:
+        yield agent
+
+
+def _get_client(agent: SnmpAgentStub, **kwargs) -> SnmpClient:
+    return SnmpClient(host=agent.host, port=agent.port, **kwargs)
+
+
+def test_get_and_set(agent):
+    client = _get_client(agent)
+
+    async def set_and_get():
+        await client.set(OID, 1)
+        return await client.get(OID)
+
+    try:
+        assert asyncio.run(set_and_get()) == '1'
+    finally:
+        client.close()
+    assert agent.set_history == [(OID, 1)]
+    assert agent.get_value(OID) == 1
+
+
+def test_lost_requests_are_retried_until_timeout(agent):
+    agent.drop_rate = 1
+    client = _get_client(agent, timeout_sec=0.2, retries=1)
+    try:
+        with pytest.raises(SnmpError):
+            asyncio.run(client.get(OID))
+    finally:
+        client.close()
+    assert agent.requests == 2
+
+
+def test_get_nowait_does_not_block(agent):
+    agent.delay_sec = 0.3
+    client = _get_client(agent)
+    try:
+        start = time.monotonic()
+        future = client.get_nowait(OID)
+        assert time.monotonic() - start < 0.1
+        assert not future.done()
+        assert future.result(timeout=5) == '0'
+    finally:
+        client.close()
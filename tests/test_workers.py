@@ -0,0 +1,89 @@
+import asyncio
+import queue
+import socket
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from BarcodeQR_CamScanner.models import PackBadCodes, PackGoodCodes  # noqa: E402
+from BarcodeQR_CamScanner.networking.api_wrappers import BaseNetworkingApi  # noqa: E402
+from BarcodeQR_CamScanner.networking.codes_consolidation import BaseResultConsolidationQueue  # noqa: E402
+from BarcodeQR_CamScanner.networking.workers import AsyncMainWorker  # noqa: E402
+
+SEND_DELAY_SEC = 0.5
+
+
+class SlowApi(BaseNetworkingApi):
+    """Отправляет результаты по пачкам с задержкой недоступного бэкенда"""
+    def __init__(self):
+        self.sent = []
+        self.drop_times = []
+
+    async def notify_about_good_pack(self, pack):
+        await asyncio.sleep(SEND_DELAY_SEC)
+        self.sent.append(pack)
+
+    async def notify_about_bad_pack(self, pack):
+        await asyncio.sleep(SEND_DELAY_SEC)
+        self.sent.append(pack)
+
+    def drop_bad_pack(self, pack):
+        self.drop_times.append(time.monotonic())
+
+    async def get_workmode(self):
+        return None
+
+    async def get_expected_codes_count(self):
+        return None
+
+
+class ReadyPacks(BaseResultConsolidationQueue):
+    def __init__(self, packs):
+        self._packs = list(packs)
+
+    def enqueue(self, result):
+        pass
+
+    def get_processed_latest(self):
+        packs, self._packs = self._packs, []
+        return packs
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    for task in asyncio.all_tasks(loop):
+        task.cancel()
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+def test_bad_pack_drop_is_not_delayed_by_earlier_sends(loop):
+    api = SlowApi()
+    packs = [PackGoodCodes() for _ in range(4)] + [PackBadCodes()]
+    start_time = time.monotonic()
+    worker = AsyncMainWorker(api=api, queue=queue.Queue(), consolidator=ReadyPacks(packs))
+    loop.run_until_complete(asyncio.sleep(0.2))
+
+    assert len(api.drop_times) == 1
+    assert api.drop_times[0] - start_time < SEND_DELAY_SEC
+    assert api.sent == []
+    loop.run_until_complete(worker._on_stop())
+    assert api.sent == packs
+
+
+def test_metrics_server_port_is_released_on_stop(loop):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    worker = AsyncMainWorker(api=SlowApi(), queue=queue.Queue(), consolidator=ReadyPacks([]), metrics_port=port)
+    loop.run_until_complete(worker._on_start())
+    loop.run_until_complete(worker._on_stop())
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', port))